@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from arango import ArangoClient
+from arango.http import DefaultHTTPClient
+from langchain_community.graphs import ArangoGraph
+from pyArango.connection import Connection
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from omics_oracle.arango_session import ArangoSession, PooledArangoGraph  # noqa: E402
+from omics_oracle.schema_cache import SchemaCache  # noqa: E402
+
+# Local stand-in for ArangoDB: just enough of the HTTP API for both drivers and the
+# schema generation in ArangoGraph, with a fixed per-request delay standing in for the network
+COLLECTIONS = [(f"Node{i}", 2) for i in range(30)] + [(f"Edge{i}", 3) for i in range(15)]
+LATENCY = float(os.getenv('BENCH_LATENCY', '0.002'))
+NUM_RUNS = 10
+CONCURRENCY = int(os.getenv('BENCH_CONCURRENCY', '8'))
+CONCURRENT_QUERIES = 400
+REQUESTS = []
+CONNECTIONS = []
+SCHEMA_CACHE = None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        CONNECTIONS.append(self.client_address)
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, body, status=200):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        time.sleep(LATENCY)
+        path = self.path.split('?')[0]
+        REQUESTS.append(path)
+
+        if path.endswith('/_api/version'):
+            return self.reply({"server": "arango", "version": "3.11.0", "license": "community"})
+        if path.endswith('/database'):
+            return self.reply({"error": False, "code": 200, "result": {"spoke": "rw"}})
+        if path.endswith('/_api/collection'):
+            return self.reply({"error": False, "code": 200, "result": [
+                {"id": str(i), "name": name, "isSystem": False, "type": kind, "status": 3, "globallyUniqueId": name}
+                for i, (name, kind) in enumerate(COLLECTIONS)
+            ]})
+        match = re.search(r'/_api/collection/([^/]+)/count$', path)
+        if match:
+            return self.reply({"error": False, "code": 200, "count": 100, "name": match.group(1), "id": "1",
+                               "status": 3, "type": 2, "isSystem": False, "globallyUniqueId": match.group(1)})
+        match = re.search(r'/_api/collection/([^/]+)/revision$', path)
+        if match:
+            return self.reply({"error": False, "code": 200, "revision": "1", "name": match.group(1), "id": "1",
+                               "status": 3, "type": 2, "isSystem": False, "globallyUniqueId": match.group(1)})
+        if path.endswith('/_api/gharial'):
+            return self.reply({"error": False, "code": 200, "graphs": []})
+        if path.endswith('/_api/cursor'):
+            return self.reply({"error": False, "code": 201, "hasMore": False, "cached": False,
+                               "result": [{"_key": "1", "_id": "Node0/1", "name": "GENE1", "score": 0.5}],
+                               "extra": {"stats": {}, "warnings": []}}, 201)
+        self.reply({"error": True, "code": 404, "errorNum": 1203, "errorMessage": f"unknown path {path}"}, 404)
+
+    do_GET = do_POST = do_PUT = handle_request
+
+
+def before(url):
+    # SpokeWrapper and QueryManager each opened their own driver stack
+    conn = Connection(arangoURL=url, username="bench", password="bench")
+    conn["spoke"]
+    client = ArangoClient(hosts=url)
+    ArangoGraph(client.db("spoke", username="bench", password="bench"))
+
+
+def after(url):
+    session = ArangoSession(url, "spoke", "bench", "bench")
+    PooledArangoGraph(session)
+    return session
+
+
+def warm_start(url):
+    session = ArangoSession(url, "spoke", "bench", "bench")
+    PooledArangoGraph(session, schema_cache=SCHEMA_CACHE)
+    return session
+
+
+class SharedClientSession(ArangoSession):
+    """The previous setup: every pooled handle opened from one client, sharing its requests session."""
+
+    def open_database(self):
+        if not hasattr(self, '_shared_client'):
+            self._shared_client = ArangoClient(hosts=self.host, http_client=DefaultHTTPClient(
+                request_timeout=self.request_timeout, pool_connections=1, pool_maxsize=2))
+        return self._shared_client.db(self.db_name, username=self._username, password=self._password)
+
+    def close(self):
+        super().close()
+        self._shared_client.close()
+
+
+def concurrent_queries(session_class, url):
+    """Run queries from CONCURRENCY threads on one session; return the seconds taken and TCP connections opened."""
+    session = session_class(url, "spoke", "bench", "bench", pool_size=CONCURRENCY)
+
+    def query(_):
+        with session.connection() as db:
+            return list(db.aql.execute("FOR n IN Node0 RETURN n"))
+
+    with ThreadPoolExecutor(CONCURRENCY) as executor:
+        list(executor.map(query, range(CONCURRENCY)))
+        CONNECTIONS.clear()
+        start = time.perf_counter()
+        list(executor.map(query, range(CONCURRENT_QUERIES)))
+        elapsed = time.perf_counter() - start
+    session.close()
+    return elapsed, len(CONNECTIONS)
+
+
+def measure(func, url):
+    timings, request_counts = [], []
+    for _ in range(NUM_RUNS):
+        REQUESTS.clear()
+        start = time.perf_counter()
+        result = func(url)
+        timings.append(time.perf_counter() - start)
+        request_counts.append(len(REQUESTS))
+        if isinstance(result, ArangoSession):
+            result.close()
+    return timings, request_counts
+
+
+def report(label, timings, request_counts):
+    print(f"{label:<34} mean {statistics.mean(timings) * 1000:7.1f} ms   "
+          f"median {statistics.median(timings) * 1000:7.1f} ms   {request_counts[0]} requests")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"{len(COLLECTIONS)} collections, {LATENCY * 1000:.1f} ms per request, {NUM_RUNS} runs")
+    before_timings, before_requests = measure(before, url)
+    after_timings, after_requests = measure(after, url)
+    report("before (pyArango + ArangoClient)", before_timings, before_requests)
+    report("after (shared ArangoSession)", after_timings, after_requests)
+    print(f"speedup (mean): {statistics.mean(before_timings) / statistics.mean(after_timings):.2f}x")
+
+    # Warm start: the schema comes from disk and is verified in a background thread,
+    # which is not part of the startup time measured here
+    with tempfile.TemporaryDirectory() as cache_dir:
+        global SCHEMA_CACHE
+        SCHEMA_CACHE = SchemaCache(os.path.join(cache_dir, "schema.json"))
+        warm_start(url).close()
+        warm_timings, warm_requests = measure(warm_start, url)
+    report("warm start (cached schema)", warm_timings, warm_requests)
+    print(f"speedup over cold start (mean): {statistics.mean(after_timings) / statistics.mean(warm_timings):.2f}x")
+
+    # Pooled handles under load: with one shared client, handles share a requests session
+    # that keeps only two sockets alive, so the others are reconnected for every request
+    logging.getLogger("urllib3.connectionpool").setLevel(logging.ERROR)
+    print(f"{CONCURRENT_QUERIES} queries from {CONCURRENCY} threads")
+    for label, session_class in (("one client for all handles", SharedClientSession),
+                                 ("one client per handle", ArangoSession)):
+        elapsed, connections = concurrent_queries(session_class, url)
+        print(f"{label:<34} {elapsed * 1000:7.1f} ms   {connections} new TCP connections")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
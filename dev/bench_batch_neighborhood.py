@@ -0,0 +1,111 @@
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from omics_oracle.arango_session import ArangoSession  # noqa: E402
+from omics_oracle.spoke_wrapper import SpokeWrapper  # noqa: E402
+
+# Local stand-in for ArangoDB: every cursor request pays a fixed delay standing in for the
+# network round trip plus a small per-source cost standing in for the traversal itself
+NUM_SOURCES = int(os.getenv('BENCH_SOURCES', '200'))
+NEIGHBORS = 5
+LATENCY = float(os.getenv('BENCH_LATENCY', '0.002'))
+PER_SOURCE = float(os.getenv('BENCH_PER_SOURCE', '0.0001'))
+NUM_RUNS = 5
+REQUESTS = []
+
+
+def neighbors(source):
+    return [{"entity": {"_id": f"Gene/{source}-{n}"}, "edge": {"label": "INTERACTS"}} for n in range(NEIGHBORS)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, body, status=200):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def handle_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        path = self.path.split('?')[0]
+        REQUESTS.append(path)
+
+        if path.endswith('/_api/version'):
+            time.sleep(LATENCY)
+            return self.reply({"server": "arango", "version": "3.11.0", "license": "community"})
+        if path.endswith('/_api/cursor'):
+            bind_vars = body.get('bindVars', {})
+            if 'start_ids' in bind_vars:
+                sources = bind_vars['start_ids']
+                result = [{"source": s, "results": neighbors(s)} for s in sources]
+            else:
+                sources = [bind_vars['start_id']]
+                result = neighbors(bind_vars['start_id'])
+            time.sleep(LATENCY + PER_SOURCE * len(sources))
+            return self.reply({"error": False, "code": 201, "hasMore": False, "cached": False, "result": result,
+                               "extra": {"stats": {}, "warnings": []}}, 201)
+        self.reply({"error": True, "code": 404, "errorNum": 1203, "errorMessage": f"unknown path {path}"}, 404)
+
+    do_GET = do_POST = do_PUT = handle_request
+
+
+def looped(spoke, sources):
+    return {s: spoke.get_connected_entities(s, edge_label="INTERACTS") for s in sources}
+
+
+def batched(spoke, sources):
+    return spoke.get_connected_entities_batch(sources, edge_labels=["INTERACTS"])
+
+
+def measure(func, spoke, sources):
+    timings, request_counts, result = [], [], None
+    for _ in range(NUM_RUNS):
+        REQUESTS.clear()
+        start = time.perf_counter()
+        result = func(spoke, sources)
+        timings.append(time.perf_counter() - start)
+        request_counts.append(len(REQUESTS))
+    return timings, request_counts, result
+
+
+def report(label, timings, request_counts):
+    print(f"{label:<36} mean {statistics.mean(timings) * 1000:8.1f} ms   "
+          f"median {statistics.median(timings) * 1000:8.1f} ms   {request_counts[0]} requests")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    spoke = SpokeWrapper(session=ArangoSession(url, "spoke", "bench", "bench"))
+    sources = [f"Gene/{n}" for n in range(NUM_SOURCES)]
+
+    print(f"{NUM_SOURCES} sources, {LATENCY * 1000:.1f} ms per request, {NUM_RUNS} runs")
+    looped_timings, looped_requests, looped_result = measure(looped, spoke, sources)
+    batched_timings, batched_requests, batched_result = measure(batched, spoke, sources)
+    assert looped_result == batched_result
+    report("looped get_connected_entities", looped_timings, looped_requests)
+    report("get_connected_entities_batch", batched_timings, batched_requests)
+    print(f"speedup (mean): {statistics.mean(looped_timings) / statistics.mean(batched_timings):.2f}x")
+
+    spoke.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from omics_oracle.gemini_wrapper import GeminiWrapper  # noqa: E402
+
+# Local stand-in for the Gemini endpoint so the numbers only reflect client overhead
+RESPONSE_BODY = json.dumps({"choices": [{"message": {"content": "stub response"}}]}).encode()
+NUM_CALLS = 200
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE_BODY)))
+        self.end_headers()
+        self.wfile.write(RESPONSE_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def time_calls(func, num_calls: int) -> list:
+    timings = []
+    for _ in range(num_calls):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label: str, timings: list):
+    print(f"{label:<28} mean {statistics.mean(timings):7.3f} ms   "
+          f"median {statistics.median(timings):7.3f} ms   "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95)]:7.3f} ms")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+    headers = {"Authorization": "bench", "Content-Type": "application/json"}
+    payload = {"model": "gemini-pro", "messages": [{"role": "user", "content": "ping"}]}
+
+    with patch('omics_oracle.gemini_wrapper.load_dotenv', return_value=True), \
+         patch.dict('os.environ', {'GEMINI_AUTH': 'bench', 'GEMINI_URL': url}):
+        wrapper = GeminiWrapper()
+
+    # Warm up both paths once so imports and the first connection are not measured
+    requests.post(url, headers=headers, json=payload)
+    wrapper.send_query("ping")
+
+    before = time_calls(lambda: requests.post(url, headers=headers, json=payload), NUM_CALLS)
+    after = time_calls(lambda: wrapper.send_query("ping"), NUM_CALLS)
+
+    print(f"{NUM_CALLS} calls against local stub at {url}")
+    report("before (requests.post)", before)
+    report("after (pooled session)", after)
+    print(f"speedup (mean): {statistics.mean(before) / statistics.mean(after):.2f}x")
+
+    wrapper.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import json
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from omics_oracle.logger import DEBUG_PREVIEW_LENGTH, capped_repr  # noqa: E402
+
+# Shaped like a SPOKE result set: many rows of node documents
+RESULTS = [
+    {'_id': f"Gene/{i}", '_key': str(i), '_rev': f"_r{i}", 'name': f"GENE{i}",
+     'description': "protein coding gene " * 5, 'sources': ["Entrez", "Ensembl"]}
+    for i in range(5000)
+]
+NUM_CALLS = 20
+
+
+def eager(logger):
+    logger.debug(f"Query results: {RESULTS}")
+    logger.debug(f"Payload: {json.dumps(RESULTS, indent=2)}")
+
+
+def lazy(logger):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Query results: {capped_repr(RESULTS, DEBUG_PREVIEW_LENGTH)}")
+        logger.debug(f"Payload: {capped_repr(RESULTS, DEBUG_PREVIEW_LENGTH)}")
+
+
+def report(label, seconds):
+    print(f"{label:<32} {seconds / NUM_CALLS * 1000:9.3f} ms/call")
+
+
+def main():
+    logger = logging.getLogger("bench_lazy_logging")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    print(f"{len(RESULTS)} result rows, {NUM_CALLS} calls each")
+    for level in (logging.INFO, logging.DEBUG):
+        logger.setLevel(level)
+        name = logging.getLevelName(level)
+        report(f"eager, level {name}", timeit.timeit(lambda: eager(logger), number=NUM_CALLS))
+        report(f"lazy, level {name}", timeit.timeit(lambda: lazy(logger), number=NUM_CALLS))
+
+
+if __name__ == "__main__":
+    main()
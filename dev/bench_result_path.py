@@ -0,0 +1,85 @@
+import io
+import json
+import os
+import re
+import statistics
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from langchain_core.callbacks import CallbackManagerForChainRun, StdOutCallbackHandler
+
+# Compares how QueryManager used to recover AQL rows from the QA chain (print the result
+# verbosely, stringify it, strip ANSI codes, find the "AQL Result:" line, swap quotes and
+# re-parse it as JSON) with reading the chain's `aql_result` field directly
+NUM_ROWS = int(os.getenv('BENCH_ROWS', '20000'))
+NUM_RUNS = 5
+ANSI_ESCAPE = re.compile(r'\x1B[@-_][0-?]*[ -/]*[@-~]')
+
+
+def make_rows(n, apostrophes=False):
+    name = "Crohn's disease" if apostrophes else "Crohn disease"
+    return [{"gene": f"GENE{i}", "symbol": f"SYM{i}", "disease": name, "score": i / n,
+             "pathways": [f"PATHWAY{i % 97}", f"PATHWAY{i % 89}"], "description": "x" * 60} for i in range(n)]
+
+
+def chain_output(rows):
+    """What the chain printed with verbose=True, plus the str(result) QueryManager captured."""
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        run_manager = CallbackManagerForChainRun(run_id=None, handlers=[StdOutCallbackHandler()],
+                                                 inheritable_handlers=[])
+        run_manager.on_text("AQL Result:", end="\n", verbose=True)
+        run_manager.on_text(str(rows), color="green", end="\n", verbose=True)
+    result = {"result": "answer", "aql_query": "FOR g IN Genes RETURN g", "aql_result": rows}
+    return buffer.getvalue() + str(result)
+
+
+def legacy(rows):
+    output = chain_output(rows)
+    lines = ANSI_ESCAPE.sub('', output).splitlines()
+    for i, line in enumerate(lines):
+        if "AQL Result:" in line:
+            fixed = lines[i + 1].strip().replace("'", '"').replace('\\', '\\\\').replace('\n', '\\n')
+            try:
+                return json.loads(fixed)
+            except json.JSONDecodeError:
+                return []
+    return []
+
+
+def structured(rows):
+    result = {"result": "answer", "aql_query": "FOR g IN Genes RETURN g", "aql_result": rows}
+    return result.get('aql_result') or []
+
+
+def measure(func, rows):
+    timings = []
+    for _ in range(NUM_RUNS):
+        start = time.perf_counter()
+        func(rows)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak
+
+
+def main():
+    rows = make_rows(NUM_ROWS)
+    size = len(json.dumps(rows)) / 1e6
+    print(f"{NUM_ROWS} rows, {size:.1f} MB as JSON, {NUM_RUNS} runs")
+    assert legacy(rows) == structured(rows)
+    for label, func in (("stringify and re-parse", legacy), ("structured aql_result", structured)):
+        timings, peak = measure(func, rows)
+        print(f"{label:<24} mean {statistics.mean(timings) * 1000:9.3f} ms   "
+              f"median {statistics.median(timings) * 1000:9.3f} ms   peak {peak / 1e6:7.1f} MB")
+
+    quoted = make_rows(100, apostrophes=True)
+    print(f"rows recovered with apostrophes in values: stringify and re-parse {len(legacy(quoted))}/100, "
+          f"structured {len(structured(quoted))}/100")
+
+
+if __name__ == "__main__":
+    main()
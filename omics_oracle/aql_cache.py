@@ -0,0 +1,243 @@
+# omics_oracle/aql_cache.py
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+# String literals, quoted names, comments, whitespace, words (keywords, names, @bind
+# parameters, numbers) and single punctuation characters, in that order of precedence
+AQL_TOKEN_PATTERN = re.compile(r"""
+    (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<quoted>`(?:[^`\\]|\\.)*`|´(?:[^´\\]|\\.)*´)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<space>\s+)
+  | (?P<word>@{0,2}[A-Za-z0-9_$][A-Za-z0-9_$]*)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+AQL_KEYWORDS = {
+    'AGGREGATE', 'ALL', 'ALL_SHORTEST_PATHS', 'AND', 'ANY', 'ASC', 'AT', 'COLLECT', 'DESC', 'DISTINCT',
+    'FALSE', 'FILTER', 'FOR', 'GRAPH', 'IN', 'INBOUND', 'INSERT', 'INTO', 'K_PATHS', 'K_SHORTEST_PATHS',
+    'KEEP', 'LEAST', 'LET', 'LIKE', 'LIMIT', 'NONE', 'NOT', 'NULL', 'OPTIONS', 'OR', 'OUTBOUND', 'PRUNE',
+    'REMOVE', 'REPLACE', 'RETURN', 'SEARCH', 'SHORTEST_PATH', 'SORT', 'TRUE', 'UPDATE', 'UPSERT', 'WINDOW',
+    'WITH',
+}
+WRITE_KEYWORDS = {'INSERT', 'UPDATE', 'REPLACE', 'REMOVE', 'UPSERT'}
+# `aql.execute` options that change how a query runs but not the rows it returns
+EXECUTION_OPTIONS = {'max_runtime', 'memory_limit', 'batch_size', 'ttl', 'stream', 'profile'}
+
+
+def _tokens(query: str) -> List[str]:
+    """Split AQL into tokens with comments dropped and case-insensitive words upper-cased."""
+    matches = [(m.lastgroup, m.group()) for m in AQL_TOKEN_PATTERN.finditer(query)
+               if m.lastgroup not in ('comment', 'space')]
+    tokens = []
+    for index, (kind, text) in enumerate(matches):
+        if kind == 'word' and (not tokens or tokens[-1] != '.'):
+            following = matches[index + 1][1] if index + 1 < len(matches) else None
+            # Keywords and function names are case-insensitive; collection and attribute names are not
+            if text.upper() in AQL_KEYWORDS or following == '(':
+                text = text.upper()
+        tokens.append(text)
+    return tokens
+
+
+def normalize_aql(query: str) -> str:
+    """
+    Reduce an AQL query to a canonical form for use as a cache key.
+
+    Comments are removed, whitespace is collapsed (and dropped wherever it does not separate two
+    words), and keywords and function names are upper-cased. String literals, collection names,
+    attribute names and bind parameters are left untouched.
+
+    Args:
+        query (str): The AQL query.
+
+    Returns:
+        str: The normalized query.
+    """
+    parts = []
+    for token in _tokens(query):
+        if parts and _is_word(parts[-1][-1]) and _is_word(token[0]):
+            parts.append(' ')
+        parts.append(token)
+    return ''.join(parts)
+
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char in '_$@'
+
+
+def is_read_only(query: str) -> bool:
+    """Check whether an AQL query contains no data-modification operation."""
+    return not any(token in WRITE_KEYWORDS for token in _tokens(query))
+
+
+class AQLResultCache:
+    """
+    In-memory LRU cache of AQL query results, bounded by their total serialized size.
+
+    Entries are keyed on the normalized query plus canonicalized bind variables. Results are
+    stored as JSON text, so a hit hands every caller its own copy. When a `revision` callable
+    is configured it is polled at most every `revision_check_interval` seconds, and the whole
+    cache is dropped once the value it returns changes (e.g. after a SPOKE snapshot is restored).
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: Optional[float] = None,
+                 revision: Optional[Callable[[], Any]] = None, revision_check_interval: float = 60.0,
+                 max_entry_bytes: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes (int): Maximum total size of cached results, in bytes of JSON.
+            ttl (float, optional): Seconds an entry stays valid. Defaults to None (never expires).
+            revision (Callable[[], Any], optional): Returns a value that changes whenever the
+                database content changes. Defaults to None (no revision checks).
+            revision_check_interval (float): Minimum seconds between two revision checks.
+            max_entry_bytes (int, optional): Results larger than this are not cached.
+                Defaults to a quarter of `max_bytes`.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.revision = revision
+        self.revision_check_interval = revision_check_interval
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 4
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._revision_value = None
+        self._revision_checked = None
+        self._checking = False
+
+    @staticmethod
+    def make_key(query: str, bind_vars: Optional[Dict[str, Any]] = None, **options: Any) -> Optional[str]:
+        """
+        Build the cache key for a query.
+
+        Args:
+            query (str): The AQL query.
+            bind_vars (Dict[str, Any], optional): The query's bind variables.
+            **options: Anything else that changes the result, such as a row limit.
+
+        Returns:
+            Optional[str]: A hex digest, or None if the query modifies data and must not be cached.
+        """
+        if not is_read_only(query):
+            return None
+        raw = json.dumps([normalize_aql(query), bind_vars or {}, options], sort_keys=True,
+                         separators=(',', ':'), default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[List[Any]]:
+        """
+        Look up cached rows.
+
+        Args:
+            key (str): A key produced by `make_key`.
+
+        Returns:
+            Optional[List[Any]]: A fresh copy of the cached rows, or None on a miss.
+        """
+        if key is None:
+            return None
+        self._check_revision()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or now - entry[1] <= self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                raw = entry[0]
+            else:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+        return json.loads(raw)
+
+    def set(self, key: Optional[str], rows: List[Any]):
+        """
+        Store query rows.
+
+        Args:
+            key (str): A key produced by `make_key`.
+            rows (List[Any]): The JSON-serializable query results.
+        """
+        if key is None:
+            return
+        raw = json.dumps(rows, separators=(',', ':'))
+        size = len(raw)
+        if size > self.max_entry_bytes:
+            self.logger.debug(f"Not caching AQL result of {size} bytes")
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (raw, time.monotonic())
+            self._size += size
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        raw, _ = self._entries.pop(key)
+        self._size -= len(raw)
+
+    def _check_revision(self):
+        """Clear the cache if the database revision changed since the last check."""
+        if self.revision is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            due = self._revision_checked is None or now - self._revision_checked >= self.revision_check_interval
+            if not due or self._checking:
+                return
+            # Only one caller polls the database; the others keep using the cache meanwhile
+            self._checking = True
+        try:
+            revision = self.revision()
+        except Exception as e:
+            self.logger.warning(f"Could not check the database revision: {e}")
+            with self._lock:
+                self._checking = False
+            return
+        with self._lock:
+            if self._revision_checked is not None and revision != self._revision_value:
+                self.logger.info("Database revision changed, clearing the AQL result cache")
+                self._entries.clear()
+                self._size = 0
+                self.invalidations += 1
+            self._revision_value = revision
+            self._revision_checked = now
+            self._checking = False
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report cache usage.
+
+        Returns:
+            Dict[str, int]: Hits, misses, revision invalidations, entry count and total bytes.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._size,
+            }
@@ -0,0 +1,203 @@
+# omics_oracle/aql_guard.py
+
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from arango import AQLQueryExecuteError
+from arango.database import StandardDatabase
+
+from .aql_cache import AQL_TOKEN_PATTERN, is_read_only
+
+ALLOWED = 'allowed'
+CAPPED = 'capped'
+REJECTED = 'rejected'
+
+# Decisions made while a `record_decisions` block is active in the current context
+_decisions: ContextVar[Optional[List["GuardDecision"]]] = ContextVar('aql_guard_decisions', default=None)
+
+
+@dataclass
+class GuardDecision:
+    """The outcome of reviewing one AQL query, with the plan estimates it was based on."""
+    action: str
+    query: str
+    estimated_cost: Optional[float] = None
+    estimated_items: Optional[int] = None
+    capped_cost: Optional[float] = None
+    capped_items: Optional[int] = None
+    reason: Optional[str] = None
+
+
+class AQLGuardError(AQLQueryExecuteError):
+    """
+    Raised instead of running a rejected query.
+
+    It is an AQLQueryExecuteError so that ArangoGraphQAChain treats it like a failed query
+    and asks the LLM to fix it, with the rejection reason as the error message.
+    """
+
+    def __init__(self, decision: GuardDecision):
+        message = f"Query rejected before execution: {decision.reason}"
+        Exception.__init__(self, message)
+        self.message = message
+        self.error_message = message
+        self.error_code = None
+        self.http_code = None
+        self.decision = decision
+
+
+@contextmanager
+def record_decisions() -> Iterator[List[GuardDecision]]:
+    """Collect the decisions the guard makes in the current context (and contexts copied from it)."""
+    decisions: List[GuardDecision] = []
+    token = _decisions.set(decisions)
+    try:
+        yield decisions
+    finally:
+        _decisions.reset(token)
+
+
+def inject_limit(query: str, limit: int) -> Optional[str]:
+    """
+    Insert `LIMIT limit` before the final top-level RETURN of a query.
+
+    Args:
+        query (str): The AQL query.
+        limit (int): The row cap.
+
+    Returns:
+        Optional[str]: The capped query, or None if it has no top-level FOR loop to limit.
+    """
+    depth, has_loop, return_at = 0, False, None
+    for match in AQL_TOKEN_PATTERN.finditer(query):
+        text = match.group()
+        if match.lastgroup == 'other':
+            if text in '([{':
+                depth += 1
+            elif text in ')]}':
+                depth -= 1
+        elif match.lastgroup == 'word' and depth == 0:
+            keyword = text.upper()
+            if keyword == 'FOR':
+                has_loop = True
+            elif keyword == 'RETURN':
+                return_at = match.start()
+    if not has_loop or return_at is None:
+        return None
+    return f"{query[:return_at]}LIMIT {int(limit)}\n{query[return_at:]}"
+
+
+class AQLGuard:
+    """
+    Reviews LLM-generated AQL with EXPLAIN before it runs.
+
+    Queries whose estimated cost or row count exceed the budget are capped with an injected
+    LIMIT, or rejected if capping is disabled or does not bring the estimate within budget.
+    Data-modification queries are rejected outright. Queries that are allowed run with a
+    server-side runtime and memory limit.
+    """
+
+    def __init__(self, max_cost: float = 10_000_000, max_items: int = 1_000_000, cap_limit: Optional[int] = 1000,
+                 max_runtime: Optional[float] = 60.0, memory_limit: int = 1024 ** 3, allow_writes: bool = False):
+        """
+        Initialize the guard.
+
+        Args:
+            max_cost (float): The highest estimated plan cost allowed.
+            max_items (int): The highest estimated number of result rows allowed.
+            cap_limit (int, optional): The LIMIT injected into over-budget queries. Defaults to
+                1000; None rejects over-budget queries instead.
+            max_runtime (float, optional): Seconds after which the server aborts a query.
+            memory_limit (int): Bytes of memory a query may use on the server; 0 means no limit.
+            allow_writes (bool): Let data-modification queries through.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_cost = max_cost
+        self.max_items = max_items
+        self.cap_limit = cap_limit
+        self.max_runtime = max_runtime
+        self.memory_limit = memory_limit
+        self.allow_writes = allow_writes
+
+    def execution_options(self, **kwargs: Any) -> Dict[str, Any]:
+        """
+        Add the runtime and memory limits to the keyword arguments of `aql.execute`.
+
+        A `max_runtime` that is already set is only ever lowered.
+        """
+        options = dict(kwargs)
+        if self.max_runtime is not None:
+            options['max_runtime'] = min(options.get('max_runtime') or self.max_runtime, self.max_runtime)
+        if self.memory_limit:
+            options.setdefault('memory_limit', self.memory_limit)
+        return options
+
+    def review(self, db: StandardDatabase, query: str, bind_vars: Dict[str, Any] = None) -> GuardDecision:
+        """
+        Decide whether and how a query may run, and record the decision.
+
+        Args:
+            db (StandardDatabase): The database handle to explain the query on.
+            query (str): The AQL query.
+            bind_vars (Dict[str, Any], optional): The query's bind variables.
+
+        Returns:
+            GuardDecision: The decision; its `query` is what should be executed.
+        """
+        decision = self._decide(db, query, bind_vars)
+        if decision.action != ALLOWED:
+            self.logger.warning(f"AQL guard {decision.action} query: {decision.reason}")
+        recorded = _decisions.get()
+        if recorded is not None:
+            recorded.append(decision)
+        return decision
+
+    def _decide(self, db: StandardDatabase, query: str, bind_vars: Optional[Dict[str, Any]]) -> GuardDecision:
+        if not self.allow_writes and not is_read_only(query):
+            return GuardDecision(REJECTED, query, reason="data-modification queries are not allowed")
+        try:
+            cost, items = self._estimate(db, query, bind_vars)
+        except Exception as e:
+            # Let the query run; its execution error is what the QA chain needs to fix it
+            self.logger.debug(f"EXPLAIN failed: {e}")
+            return GuardDecision(ALLOWED, query, reason=f"EXPLAIN failed: {e}")
+
+        decision = GuardDecision(ALLOWED, query, estimated_cost=cost, estimated_items=items)
+        over_budget = self._over_budget(cost, items)
+        if over_budget is None:
+            return decision
+
+        capped_query = inject_limit(query, self.cap_limit) if self.cap_limit is not None else None
+        if capped_query is not None:
+            try:
+                decision.capped_cost, decision.capped_items = self._estimate(db, capped_query, bind_vars)
+            except Exception as e:
+                # The original query is known to be over budget, so it must not run uncapped
+                self.logger.debug(f"EXPLAIN of capped query failed: {e}")
+                decision.action = REJECTED
+                decision.reason = f"{over_budget}, and the query capped with LIMIT {self.cap_limit} failed to explain: {e}"
+                return decision
+            if self._over_budget(decision.capped_cost, decision.capped_items) is None:
+                decision.action, decision.query = CAPPED, capped_query
+                decision.reason = f"{over_budget}; capped with LIMIT {self.cap_limit}"
+                return decision
+        decision.action = REJECTED
+        decision.reason = (f"{over_budget}. Add filters on indexed attributes or a LIMIT "
+                           f"so that the query touches fewer documents")
+        return decision
+
+    def _over_budget(self, cost: float, items: int) -> Optional[str]:
+        """Describe how a plan exceeds the budget, or return None if it does not."""
+        if cost > self.max_cost:
+            return f"estimated cost {cost:.0f} exceeds the budget of {self.max_cost:.0f}"
+        if items > self.max_items:
+            return f"estimated {items} result rows exceed the budget of {self.max_items}"
+        return None
+
+    @staticmethod
+    def _estimate(db: StandardDatabase, query: str, bind_vars: Optional[Dict[str, Any]]) -> tuple:
+        plan = db.aql.explain(query, bind_vars=bind_vars)
+        return plan['estimatedCost'], plan['estimatedNrItems']
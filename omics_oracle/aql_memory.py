@@ -0,0 +1,366 @@
+# omics_oracle/aql_memory.py
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .aql_cache import AQL_TOKEN_PATTERN
+
+WORD_PATTERN = re.compile(r"[\w'-]+")
+
+
+@dataclass
+class MemoryEntry:
+    """A question together with AQL that answered it with a non-empty result."""
+    question: str
+    aql_query: str
+    result_rows: int
+    hits: int
+    created: float
+
+
+@dataclass
+class MemoryMatch:
+    """A stored question similar to a new one, and the AQL to use for the new question."""
+    question: str
+    aql_query: str
+    similarity: float
+    parametrized: bool = False
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case a question and drop its punctuation."""
+    return ' '.join(WORD_PATTERN.findall(question.lower()))
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (3, 5)) -> Counter:
+    """
+    Count the character n-grams of each word, padded with spaces (like scikit-learn's `char_wb`).
+
+    Args:
+        text (str): A normalized question.
+        ngram_range (Tuple[int, int]): The smallest and largest n-gram length.
+
+    Returns:
+        Counter: The n-gram counts.
+    """
+    low, high = ngram_range
+    counts: Counter = Counter()
+    for word in text.split():
+        padded = f" {word} "
+        for n in range(low, high + 1):
+            if len(padded) < n:
+                break
+            counts.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return counts
+
+
+def parametrize(stored_question: str, question: str, aql_query: str) -> Optional[str]:
+    """
+    Adapt stored AQL to a question that differs from the stored one in a single phrase.
+
+    The differing phrase of the stored question must occur as whole words in a string literal
+    of the AQL (e.g. a disease name in a FILTER); it is replaced there by the new question's
+    phrase. If it also occurs inside a word of a literal (e.g. '2' in 'DOID:9352'), the AQL
+    cannot be adapted safely.
+
+    Args:
+        stored_question (str): The question the AQL was validated for.
+        question (str): The new question.
+        aql_query (str): The stored AQL.
+
+    Returns:
+        Optional[str]: The AQL unchanged if the questions have the same words, the adapted
+        AQL, or None if the difference cannot be mapped onto a string literal.
+    """
+    old_words = WORD_PATTERN.findall(stored_question)
+    new_words = WORD_PATTERN.findall(question)
+    if [w.lower() for w in old_words] == [w.lower() for w in new_words]:
+        return aql_query
+    prefix = 0
+    while (prefix < min(len(old_words), len(new_words))
+           and old_words[prefix].lower() == new_words[prefix].lower()):
+        prefix += 1
+    suffix = 0
+    while (suffix < min(len(old_words), len(new_words)) - prefix
+           and old_words[-1 - suffix].lower() == new_words[-1 - suffix].lower()):
+        suffix += 1
+    old_phrase = ' '.join(old_words[prefix:len(old_words) - suffix])
+    new_phrase = ' '.join(new_words[prefix:len(new_words) - suffix])
+    if not old_phrase or not new_phrase:
+        return None
+
+    raw = re.compile(re.escape(old_phrase), re.IGNORECASE)
+    pattern = re.compile(r"(?<![\w'-])" + re.escape(old_phrase) + r"(?![\w'-])", re.IGNORECASE)
+    parts, replaced = [], 0
+    for match in AQL_TOKEN_PATTERN.finditer(aql_query):
+        text = match.group()
+        if match.lastgroup == 'string':
+            quote = text[0]
+            if len(raw.findall(text[1:-1])) != len(pattern.findall(text[1:-1])):
+                return None
+            body, count = pattern.subn(new_phrase.replace('\\', '\\\\').replace(quote, '\\' + quote), text[1:-1])
+            if count:
+                text = f"{quote}{body}{quote}"
+                replaced += count
+        parts.append(text)
+    return ''.join(parts) if replaced else None
+
+
+def adds_words(stored_question: str, question: str) -> bool:
+    """Tell whether the new question has words the stored one lacks (e.g. a negation or a qualifier)."""
+    return bool({w.lower() for w in WORD_PATTERN.findall(question)} -
+                {w.lower() for w in WORD_PATTERN.findall(stored_question)})
+
+
+def literals_mention_difference(stored_question: str, question: str, aql_query: str) -> bool:
+    """Tell whether a string literal of the AQL contains a word of the stored question missing from the new one."""
+    missing = {w.lower() for w in WORD_PATTERN.findall(stored_question)} - \
+        {w.lower() for w in WORD_PATTERN.findall(question)}
+    if not missing:
+        return False
+    literals = ' '.join(match.group()[1:-1].lower() for match in AQL_TOKEN_PATTERN.finditer(aql_query)
+                        if match.lastgroup == 'string')
+    literal_words = set(WORD_PATTERN.findall(literals))
+    return bool(missing & literal_words)
+
+
+class AQLMemory:
+    """
+    Question to validated-AQL store with a local TF-IDF similarity index.
+
+    Questions are indexed as TF-IDF vectors over character n-grams and compared by cosine
+    similarity, entirely in NumPy. A close match is reused (adapted to the new question
+    where it differs in a single phrase that the AQL filters on) so that AQL generation can
+    be skipped; moderately similar matches serve as few-shot examples for the LLM.
+
+    Entries are kept in memory and, with a `path`, in a SQLite file so they survive restarts.
+    """
+
+    def __init__(self, path: Optional[str] = None, reuse_threshold: float = 0.95,
+                 parametrize_threshold: float = 0.6, example_threshold: float = 0.4,
+                 max_entries: int = 10000, ngram_range: Tuple[int, int] = (3, 5)):
+        """
+        Initialize the memory.
+
+        Args:
+            path (str, optional): SQLite file the entries are stored in. Defaults to None (memory only).
+            reuse_threshold (float): Similarity from which stored AQL is reused unchanged.
+            parametrize_threshold (float): Similarity from which stored AQL is reused after
+                replacing the one phrase in which the questions differ.
+            example_threshold (float): Similarity from which matches are offered as few-shot examples.
+            max_entries (int): Entries kept; the least used ones are dropped beyond this.
+            ngram_range (Tuple[int, int]): The character n-gram lengths indexed.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.reuse_threshold = reuse_threshold
+        self.parametrize_threshold = parametrize_threshold
+        self.example_threshold = example_threshold
+        self.max_entries = max_entries
+        self.ngram_range = ngram_range
+        self._entries: Dict[str, MemoryEntry] = {}
+        self._lock = threading.Lock()
+        self._index = None
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS aql_memory ("
+                "question_key TEXT PRIMARY KEY, question TEXT NOT NULL, aql_query TEXT NOT NULL, "
+                "result_rows INTEGER NOT NULL, hits INTEGER NOT NULL, created REAL NOT NULL)"
+            )
+            self._conn.commit()
+            for key, question, aql_query, rows, hits, created in self._conn.execute(
+                    "SELECT question_key, question, aql_query, result_rows, hits, created FROM aql_memory"):
+                self._entries[key] = MemoryEntry(question, aql_query, rows, hits, created)
+        self.logger.info(f"AQLMemory initialized with {len(self._entries)} entries (disk: {path or 'disabled'})")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record(self, question: str, aql_query: str, result_rows: int):
+        """
+        Remember the AQL that answered a question, if it returned any rows.
+
+        Args:
+            question (str): The user's question.
+            aql_query (str): The AQL that was executed.
+            result_rows (int): The number of rows it returned.
+        """
+        if result_rows <= 0 or not aql_query or not aql_query.strip():
+            return
+        key = normalize_question(question)
+        with self._lock:
+            previous = self._entries.get(key)
+            entry = MemoryEntry(question, aql_query.strip(), result_rows, previous.hits if previous else 0, time.time())
+            self._entries[key] = entry
+            self._index = None
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO aql_memory VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, entry.question, entry.aql_query, entry.result_rows, entry.hits, entry.created)
+                )
+                self._conn.commit()
+            if len(self._entries) > self.max_entries:
+                self._evict()
+
+    def forget(self, question: str):
+        """Remove the entry of a question, e.g. after its AQL stopped returning rows."""
+        key = normalize_question(question)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._index = None
+                if self._conn is not None:
+                    self._conn.execute("DELETE FROM aql_memory WHERE question_key = ?", (key,))
+                    self._conn.commit()
+
+    def _evict(self):
+        """Drop the least used, oldest entries beyond `max_entries`. Called with the lock held."""
+        excess = len(self._entries) - self.max_entries
+        victims = sorted(self._entries, key=lambda k: (self._entries[k].hits, self._entries[k].created))[:excess]
+        for key in victims:
+            del self._entries[key]
+        if self._conn is not None:
+            self._conn.executemany("DELETE FROM aql_memory WHERE question_key = ?", [(key,) for key in victims])
+            self._conn.commit()
+
+    def search(self, question: str, k: int = 3) -> List[Tuple[MemoryEntry, float]]:
+        """
+        Find the stored questions most similar to a question.
+
+        Args:
+            question (str): The new question.
+            k (int): The maximum number of matches.
+
+        Returns:
+            List[Tuple[MemoryEntry, float]]: Entries and their cosine similarity, most similar first.
+        """
+        with self._lock:
+            if self._index is None:
+                self._index = self._build_index()
+            keys, vocabulary, idf, indptr, indices, data = self._index
+            entries = [self._entries[key] for key in keys]
+        if not keys:
+            return []
+
+        counts = char_ngrams(normalize_question(question), self.ngram_range)
+        query = np.zeros(len(vocabulary), dtype=np.float32)
+        # N-grams no stored question has still count toward the norm, so that words the stored
+        # questions lack lower the similarity instead of being ignored
+        unseen_idf = np.log(1 + len(keys)) + 1
+        unseen = 0.0
+        for gram, count in counts.items():
+            column = vocabulary.get(gram)
+            if column is None:
+                unseen += (count * unseen_idf) ** 2
+            else:
+                query[column] = count * idf[column]
+        norm = np.sqrt(np.dot(query, query) + unseen)
+        if norm == 0:
+            return []
+        query /= norm
+        # Row-wise sparse dot products: sum data * query[indices] over each row's slice
+        products = np.concatenate(([0.0], np.cumsum(data * query[indices], dtype=np.float64)))
+        similarities = products[indptr[1:]] - products[indptr[:-1]]
+        top = np.argsort(-similarities, kind='stable')[:k]
+        return [(entries[i], float(similarities[i])) for i in top if similarities[i] > 0]
+
+    def _build_index(self) -> tuple:
+        """Build the L2-normalized TF-IDF matrix of the stored questions in CSR form."""
+        keys = list(self._entries)
+        grams = [char_ngrams(key, self.ngram_range) for key in keys]
+        vocabulary: Dict[str, int] = {}
+        document_frequency: List[int] = []
+        for counts in grams:
+            for gram in counts:
+                column = vocabulary.setdefault(gram, len(vocabulary))
+                if column == len(document_frequency):
+                    document_frequency.append(0)
+                document_frequency[column] += 1
+        # Smoothed IDF, as in scikit-learn's TfidfVectorizer
+        idf = (np.log((1 + len(keys)) / (1 + np.asarray(document_frequency, dtype=np.float64))) + 1).astype(np.float32)
+
+        indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+        indices, data = [], []
+        for row, counts in enumerate(grams):
+            columns = np.fromiter((vocabulary[gram] for gram in counts), dtype=np.int64, count=len(counts))
+            weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts)) * idf[columns]
+            norm = np.linalg.norm(weights)
+            indices.append(columns)
+            data.append(weights / norm if norm else weights)
+            indptr[row + 1] = indptr[row] + len(counts)
+        indices_array = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+        data_array = np.concatenate(data) if data else np.zeros(0, dtype=np.float32)
+        return keys, vocabulary, idf, indptr, indices_array, data_array
+
+    def match(self, question: str) -> Optional[MemoryMatch]:
+        """
+        Find stored AQL that can answer a question without generating new AQL.
+
+        Stored AQL is reused unchanged from `reuse_threshold`, unless the new question adds words
+        or its string literals hold words the new question dropped, and adapted from
+        `parametrize_threshold` (see `parametrize`).
+
+        Args:
+            question (str): The new question.
+
+        Returns:
+            Optional[MemoryMatch]: The AQL to run, or None if no stored question is close enough.
+        """
+        for entry, similarity in self.search(question, k=3):
+            if similarity < self.parametrize_threshold:
+                break
+            aql_query = parametrize(entry.question, question, entry.aql_query)
+            if aql_query is None:
+                # Reusing AQL unchanged would still filter on what the stored question asked about
+                if similarity < self.reuse_threshold or adds_words(entry.question, question) or \
+                        literals_mention_difference(entry.question, question, entry.aql_query):
+                    continue
+                aql_query = entry.aql_query
+            return MemoryMatch(entry.question, aql_query, similarity, parametrized=aql_query != entry.aql_query)
+        return None
+
+    def examples(self, question: str, k: int = 3) -> List[MemoryMatch]:
+        """
+        Find stored question/AQL pairs similar enough to guide AQL generation for a question.
+
+        Args:
+            question (str): The new question.
+            k (int): The maximum number of examples.
+
+        Returns:
+            List[MemoryMatch]: The examples, most similar first.
+        """
+        return [MemoryMatch(entry.question, entry.aql_query, similarity)
+                for entry, similarity in self.search(question, k) if similarity >= self.example_threshold]
+
+    def mark_used(self, question: str):
+        """Count a reuse of a stored question's AQL, which keeps it from being evicted."""
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.hits += 1
+            if self._conn is not None:
+                self._conn.execute("UPDATE aql_memory SET hits = ? WHERE question_key = ?", (entry.hits, key))
+                self._conn.commit()
+
+    @staticmethod
+    def format_examples(examples: Sequence[MemoryMatch]) -> str:
+        """Render examples as text to add to the question given to the AQL generation chain."""
+        if not examples:
+            return ""
+        lines = ["", "", "AQL queries that answered similar questions before:"]
+        for example in examples:
+            lines.append(f"Question: {example.question}")
+            lines.append(f"AQL: {' '.join(example.aql_query.split())}")
+        return '\n'.join(lines)
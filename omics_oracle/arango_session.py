@@ -0,0 +1,316 @@
+# omics_oracle/arango_session.py
+
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from arango import ArangoClient
+from arango.database import StandardDatabase
+from arango.http import DefaultHTTPClient
+from dotenv import load_dotenv
+from langchain_community.graphs import ArangoGraph
+
+from .aql_cache import EXECUTION_OPTIONS, AQLResultCache
+from .aql_guard import AQLGuard, AQLGuardError, REJECTED
+from .connection_pool import ConnectionPool
+from .metrics import QueryMetrics
+from .query_profiler import QueryProfiler
+from .schema_cache import SchemaCache, database_fingerprint
+
+# Errors that may leave a database handle's HTTP session broken
+RECONNECT_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+class ArangoSession:
+    """
+    The one ArangoDB connection subsystem shared by SpokeWrapper and the LangChain graph.
+
+    Database handles are kept in a ConnectionPool and each is used by one thread at a time.
+    Handles opened from one python-arango client share that client's requests session, which
+    is not thread-safe and keeps only a few sockets alive, so each handle gets its own client.
+    A handle the pool discards after a connection error thus takes its HTTP session with it.
+    """
+
+    def __init__(self, host: str, db_name: str, username: str, password: str, pool_size: int = 4,
+                 pool_timeout: float = 30.0, request_timeout: float = 60.0):
+        """
+        Initialize the session and open its first database handle.
+
+        Args:
+            host (str): The ArangoDB URL.
+            db_name (str): The database to use.
+            username (str): The database user.
+            password (str): The user's password.
+            pool_size (int): Maximum number of database handles (and HTTP sessions) open at once.
+            pool_timeout (float): Seconds a caller waits for a free handle.
+            request_timeout (float): Seconds before an HTTP request to ArangoDB times out.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.host = host
+        self.db_name = db_name
+        self._username = username
+        self._password = password
+        self.request_timeout = request_timeout
+        # The client of each open handle, by the handle's id
+        self._clients: Dict[int, ArangoClient] = {}
+        self._clients_lock = threading.Lock()
+        self.pool = ConnectionPool(
+            self.open_database,
+            size=pool_size,
+            health_check=lambda db: db.version(),
+            close=self.close_database,
+            timeout=pool_timeout,
+            reconnect_errors=RECONNECT_ERRORS
+        )
+        # Open one handle up front and make a request on it, so bad credentials fail at startup
+        # (opening a handle alone does not contact the server)
+        try:
+            with self.pool.connection() as db:
+                db.version()
+        except Exception:
+            self.close()
+            raise
+        self.logger.info(f"ArangoSession connected to database: {db_name} (pool size {pool_size})")
+
+    @classmethod
+    def from_env(cls, pool_size: int = None, **kwargs: Any) -> "ArangoSession":
+        """
+        Create a session from the ARANGO_* variables in the project's .env file.
+
+        Args:
+            pool_size (int, optional): Maximum number of open handles. Defaults to the
+                ARANGO_POOL_SIZE environment variable, or 4.
+            **kwargs: Further keyword arguments for the constructor.
+
+        Returns:
+            ArangoSession: The connected session.
+
+        Raises:
+            ValueError: If the .env file cannot be loaded or a required variable is missing.
+        """
+        logger = logging.getLogger(__name__)
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        dotenv_path = os.path.join(current_dir, '..', '.env')
+        logger.info(f"Looking for .env file at: {dotenv_path}")
+
+        if load_dotenv(dotenv_path):
+            logger.info("Successfully loaded .env file")
+        else:
+            logger.error("Failed to load .env file")
+            raise ValueError("Failed to load .env file")
+
+        settings = {
+            'host': os.getenv('ARANGO_HOST'),
+            'db_name': os.getenv('ARANGO_DB'),
+            'username': os.getenv('ARANGO_USERNAME'),
+            'password': os.getenv('ARANGO_PASSWORD'),
+        }
+        if not all(settings.values()):
+            logger.error("Missing required environment variables")
+            raise ValueError("ARANGO_HOST, ARANGO_DB, ARANGO_USERNAME, and ARANGO_PASSWORD must be set in the .env file")
+        logger.info("All required environment variables loaded successfully")
+
+        return cls(pool_size=pool_size or int(os.getenv('ARANGO_POOL_SIZE', '4')), **settings, **kwargs)
+
+    def open_database(self) -> StandardDatabase:
+        """Open a new database handle with its own client and HTTP session, outside the pool.
+
+        The handle should be closed with `close_database` once it is no longer needed.
+        """
+        # Each handle is used by one thread at a time, so its session needs few sockets
+        client = ArangoClient(
+            hosts=self.host,
+            http_client=DefaultHTTPClient(request_timeout=self.request_timeout, pool_connections=1, pool_maxsize=2)
+        )
+        try:
+            db = client.db(self.db_name, username=self._username, password=self._password)
+        except Exception:
+            client.close()
+            raise
+        with self._clients_lock:
+            self._clients[id(db)] = client
+        return db
+
+    def close_database(self, db: StandardDatabase):
+        """Close the client, and with it the HTTP session, of a handle from `open_database`."""
+        with self._clients_lock:
+            client = self._clients.pop(id(db), None)
+        if client is not None:
+            client.close()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[StandardDatabase]:
+        """Borrow a pooled database handle for the duration of a `with` block."""
+        with self.pool.connection(timeout) as db:
+            yield db
+
+    def revision(self) -> tuple:
+        """
+        Fingerprint the database content.
+
+        Combines the id and revision of every non-system collection, so it changes when
+        documents are written and when collections are dropped and restored from a snapshot.
+
+        Returns:
+            tuple: Sorted (name, id, revision) triples.
+        """
+        with self.connection() as db:
+            return tuple(sorted(
+                (collection['name'], collection['id'], db.collection(collection['name']).revision())
+                for collection in db.collections() if not collection['system']
+            ))
+
+    def collection_revision(self, name: str) -> str:
+        """Return the current revision of a collection, which changes on every write to it."""
+        with self.connection() as db:
+            return db.collection(name).revision()
+
+    def close(self):
+        """Close the pooled handles and the clients of any handles still open outside the pool."""
+        self.pool.close()
+        with self._clients_lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+
+class PooledArangoGraph(ArangoGraph):
+    """
+    ArangoGraph whose queries run on pooled handles from an ArangoSession.
+
+    The schema is generated once, on a dedicated handle, while the graph is created;
+    queries from concurrent requests each borrow their own handle from the pool. With a
+    result cache, repeated queries (such as AQL generated for popular questions) are
+    answered without a database round trip.
+
+    With a guard, every query is reviewed with EXPLAIN and runs with server-side runtime and
+    memory limits; rejected queries raise AQLGuardError. With a profiler, queries run with
+    profiling enabled and slow ones are logged with the question they were generated for.
+    With metrics, the duration and row count of every query are recorded.
+
+    With a schema cache, a previously generated schema is used straight away and checked
+    against the database fingerprint in a background thread, which regenerates it only if
+    the database has changed.
+    """
+
+    _pending_schema = None
+
+    def __init__(self, session: ArangoSession, result_cache: AQLResultCache = None,
+                 schema_cache: SchemaCache = None, guard: AQLGuard = None, profiler: QueryProfiler = None,
+                 metrics: QueryMetrics = None):
+        self.logger = logging.getLogger(__name__)
+        self.session = session
+        self.result_cache = result_cache
+        self.guard = guard
+        self.profiler = profiler
+        self.metrics = metrics
+        self.schema_cache = schema_cache
+        self.schema_refresh: Optional[threading.Thread] = None
+        self._schema_key = f"{session.host}/{session.db_name}"
+        if schema_cache is None:
+            # ArangoGraph.__init__ generates the schema twice (once in set_db, once more
+            # in set_schema); set_db on its own is enough.
+            self.set_db(session.open_database())
+            return
+
+        cached = schema_cache.load(self._schema_key)
+        if cached is None:
+            # Fingerprint before generating, so changes made meanwhile trigger a refresh next time
+            fingerprint = self.fingerprint()
+            self.set_db(session.open_database())
+            schema_cache.save(self._schema_key, fingerprint, self.schema)
+            return
+
+        self.logger.info(f"Using cached ArangoDB schema from {schema_cache.path}")
+        self._pending_schema = cached.schema
+        self.set_db(session.open_database())
+        self.schema_refresh = threading.Thread(target=self.refresh_schema, args=(cached.fingerprint,),
+                                               name="arango-schema-refresh", daemon=True)
+        self.schema_refresh.start()
+
+    def set_schema(self, schema: Optional[Dict[str, Any]] = None) -> None:
+        """Set the schema, using the cached one instead of generating it while the graph is created."""
+        if schema is None and self._pending_schema is not None:
+            schema, self._pending_schema = self._pending_schema, None
+        super().set_schema(schema)
+
+    def fingerprint(self) -> str:
+        """Fingerprint the database on a pooled handle (see `database_fingerprint`)."""
+        with self.session.connection() as db:
+            return database_fingerprint(db)
+
+    def refresh_schema(self, cached_fingerprint: Optional[str] = None):
+        """
+        Regenerate and cache the schema if the database fingerprint no longer matches.
+
+        Args:
+            cached_fingerprint (str, optional): The fingerprint the current schema was generated from.
+        """
+        try:
+            fingerprint = self.fingerprint()
+            if fingerprint == cached_fingerprint:
+                self.logger.info("Cached ArangoDB schema is up to date")
+                return
+            self.logger.info("ArangoDB fingerprint changed, regenerating the schema")
+            schema = self.generate_schema()
+            self.set_schema(schema)
+            if self.schema_cache is not None:
+                self.schema_cache.save(self._schema_key, fingerprint, schema)
+        except Exception as e:
+            self.logger.warning(f"Failed to refresh the ArangoDB schema: {e}")
+
+    def query(self, query: str, top_k: Optional[int] = None, **kwargs: Any) -> List[Dict[str, Any]]:
+        """
+        Query the ArangoDB database on a pooled handle, deleting the cursor if rows are left over.
+
+        Raises:
+            AQLGuardError: If the guard rejects the query.
+        """
+        cache_key = None
+        if self.result_cache is not None:
+            # Execution-only options such as the speculative path's deadline would make every key unique
+            options = {k: v for k, v in kwargs.items() if k != 'bind_vars' and k not in EXECUTION_OPTIONS}
+            cache_key = self.result_cache.make_key(query, kwargs.get('bind_vars'), top_k=top_k, **options)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if top_k:
+            kwargs.setdefault('batch_size', top_k)
+        if self.metrics is None:
+            rows = self._execute(query, top_k, **kwargs)
+        else:
+            with self.metrics.stage('aql_execution'):
+                rows = self._execute(query, top_k, **kwargs)
+            self.metrics.result_rows.observe(len(rows))
+        if cache_key is not None:
+            self.result_cache.set(cache_key, rows)
+        return rows
+
+    def _execute(self, query: str, top_k: Optional[int], **kwargs: Any) -> List[Dict[str, Any]]:
+        """Review (if guarded), run and (if profiled) profile a query on a pooled handle."""
+        with self.session.connection() as db:
+            if self.guard is not None:
+                decision = self.guard.review(db, query, kwargs.get('bind_vars'))
+                if decision.action == REJECTED:
+                    raise AQLGuardError(decision)
+                query = decision.query
+                kwargs = self.guard.execution_options(**kwargs)
+            if self.profiler is not None:
+                kwargs = self.profiler.execution_options(**kwargs)
+            start = time.perf_counter()
+            cursor = db.aql.execute(query, **kwargs)
+            try:
+                rows = list(itertools.islice(cursor, top_k))
+            finally:
+                if cursor.has_more():
+                    cursor.close(ignore_missing=True)
+            if self.profiler is not None:
+                self.profiler.record(db, query, kwargs.get('bind_vars'), cursor, len(rows),
+                                     time.perf_counter() - start, source='graph')
+        return rows
@@ -0,0 +1,87 @@
+# omics_oracle/concurrency.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Coroutine, Iterable, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+async def gather_bounded(factories: Iterable[Callable[[], Awaitable[T]]], max_concurrency: int,
+                         return_exceptions: bool = False) -> List[T]:
+    """
+    Await coroutines with at most `max_concurrency` of them in flight at once.
+
+    Args:
+        factories (Iterable[Callable[[], Awaitable[T]]]): Zero-argument callables that create the coroutines.
+            Coroutines are only created once a slot is free, so large batches stay cheap.
+        max_concurrency (int): The maximum number of coroutines running concurrently.
+        return_exceptions (bool): Return exceptions in place of results instead of raising the first one.
+
+    Returns:
+        List[T]: The results in the same order as `factories`.
+
+    Raises:
+        ValueError: If `max_concurrency` is smaller than 1.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(factory: Callable[[], Awaitable[T]]) -> T:
+        async with semaphore:
+            return await factory()
+
+    tasks = [asyncio.ensure_future(run(factory)) for factory in factories]
+    try:
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+    except BaseException:
+        # One failure (or our own cancellation) abandons the batch, so stop the rest
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def close_on_loop(close: Callable[[], Coroutine[Any, Any, Any]],
+                  loop: Optional[asyncio.AbstractEventLoop]) -> bool:
+    """
+    Close an async client that belongs to another event loop, on that loop.
+
+    Async HTTP connections are bound to the loop that opened them, so a client replaced
+    for a new loop has to be closed by its own loop to release its connection pool.
+
+    Args:
+        close (Callable[[], Coroutine]): Creates the coroutine that closes the client.
+        loop (asyncio.AbstractEventLoop, optional): The loop the client was created on.
+
+    Returns:
+        bool: True if the close was scheduled; False if that loop is no longer running,
+        in which case nothing can await the close any more and the client is left to be
+        garbage collected.
+    """
+    if loop is None or loop.is_closed() or not loop.is_running():
+        return False
+    asyncio.run_coroutine_threadsafe(close(), loop)
+    return True
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    Run a coroutine to completion from synchronous code.
+
+    Args:
+        coro (Coroutine[Any, Any, T]): The coroutine to run.
+
+    Returns:
+        T: The coroutine's result.
+
+    Raises:
+        RuntimeError: If called from inside a running event loop; await the async variant instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    coro.close()
+    raise RuntimeError("Cannot block inside a running event loop; await the async variant instead")
@@ -0,0 +1,224 @@
+# omics_oracle/connection_pool.py
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Generic, Iterator, Optional, Tuple, Type, TypeVar
+
+T = TypeVar('T')
+
+
+class PoolTimeoutError(TimeoutError):
+    """Raised when no connection becomes available within the pool timeout."""
+
+
+class ConnectionPool(Generic[T]):
+    """
+    Thread-safe pool of database connections.
+
+    Connections are created lazily up to `size` and handed to one caller at a time.
+    A connection that has been idle for longer than `check_interval` is health-checked
+    before it is handed out, and a connection that fails its check (or raised a
+    connection-level error and then fails its check) is closed and replaced on the next acquire.
+    """
+
+    def __init__(self, factory: Callable[[], T], size: int = 4,
+                 health_check: Optional[Callable[[T], Any]] = None,
+                 close: Optional[Callable[[T], Any]] = None, timeout: float = 30.0,
+                 check_interval: float = 30.0,
+                 reconnect_errors: Tuple[Type[BaseException], ...] = (OSError,)):
+        """
+        Initialize the pool.
+
+        Args:
+            factory (Callable[[], T]): Opens a new connection.
+            size (int): The maximum number of open connections.
+            health_check (Callable[[T], Any], optional): Returns a falsy value or raises if a
+                connection is no longer usable. Defaults to None (connections are trusted).
+            close (Callable[[T], Any], optional): Closes a connection that leaves the pool.
+            timeout (float): Seconds to wait for a free connection before giving up.
+            check_interval (float): Seconds a connection may sit idle before it is re-checked.
+            reconnect_errors (Tuple[Type[BaseException], ...]): Errors that may mean the
+                connection is broken, after which it is health-checked before reuse. Other
+                errors (such as a failed query) hand the connection straight back.
+
+        Raises:
+            ValueError: If `size` is smaller than 1.
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.logger = logging.getLogger(__name__)
+        self.factory = factory
+        self.size = size
+        self.health_check = health_check
+        self._close = close
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.reconnect_errors = reconnect_errors
+        # Reuse the most recently released connection first, so surplus ones go idle and get re-checked
+        self._idle: "deque[tuple]" = deque()
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._open = 0
+        self._closed = False
+        self.created = 0
+        self.discarded = 0
+
+    def acquire(self, timeout: Optional[float] = None) -> T:
+        """
+        Take a connection out of the pool, opening one if the pool is not full yet.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a free connection. Defaults to the pool timeout.
+
+        Returns:
+            T: A connection that must be handed back with `release`.
+
+        Raises:
+            PoolTimeoutError: If no connection became free in time.
+            RuntimeError: If the pool has been closed.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            with self._available:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+                    if self._idle:
+                        conn, released_at = self._idle.pop()
+                        break
+                    if self._open < self.size:
+                        # Reserve the slot, then connect outside the lock
+                        self._open += 1
+                        conn, released_at = None, None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(f"No database connection available after {self.timeout}s")
+                    self._available.wait(remaining)
+
+            if conn is None:
+                return self._connect()
+            if time.monotonic() - released_at < self.check_interval or self._healthy(conn):
+                return conn
+            self.logger.warning("Discarding pooled database connection that failed its health check")
+            self._discard(conn)
+
+    def release(self, conn: T, discard: bool = False):
+        """
+        Hand a connection back to the pool.
+
+        Args:
+            conn (T): A connection obtained from `acquire`.
+            discard (bool): Close the connection instead of reusing it.
+        """
+        if discard or self._closed:
+            self._discard(conn)
+            return
+        with self._available:
+            self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[T]:
+        """
+        Borrow a connection for the duration of a `with` block.
+
+        If the block raises one of the `reconnect_errors`, the connection is health-checked
+        and dropped when it is broken, so the next caller gets a fresh one.
+        """
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except self.reconnect_errors:
+            self.release(conn, discard=not self._healthy(conn))
+            raise
+        except BaseException:
+            # Query errors, cancellation and early generator exits leave the connection intact
+            self.release(conn)
+            raise
+        self.release(conn)
+
+    @asynccontextmanager
+    async def aconnection(self, timeout: Optional[float] = None) -> AsyncIterator[T]:
+        """
+        Borrow a connection from async code without blocking the event loop while waiting for one.
+
+        The connection itself is synchronous; run blocking calls on it with `asyncio.to_thread`.
+        """
+        conn = await asyncio.to_thread(self.acquire, timeout)
+        try:
+            yield conn
+        except self.reconnect_errors:
+            healthy = await asyncio.to_thread(self._healthy, conn)
+            self.release(conn, discard=not healthy)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        self.release(conn)
+
+    def close(self):
+        """Close every idle connection; connections still in use are closed when released."""
+        with self._available:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._available.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report pool usage.
+
+        Returns:
+            Dict[str, int]: Open, idle and in-use connection counts, plus lifetime created/discarded totals.
+        """
+        with self._lock:
+            open_connections = self._open
+            idle = len(self._idle)
+        return {
+            'open': open_connections,
+            'idle': idle,
+            'in_use': open_connections - idle,
+            'created': self.created,
+            'discarded': self.discarded,
+        }
+
+    def _connect(self) -> T:
+        try:
+            conn = self.factory()
+        except BaseException:
+            with self._available:
+                self._open -= 1
+                self._available.notify()
+            raise
+        with self._lock:
+            self.created += 1
+        self.logger.debug(f"Opened pooled database connection ({self._open}/{self.size})")
+        return conn
+
+    def _healthy(self, conn: T) -> bool:
+        if self.health_check is None:
+            return True
+        try:
+            return bool(self.health_check(conn))
+        except Exception as e:
+            self.logger.debug(f"Database connection health check failed: {e}")
+            return False
+
+    def _discard(self, conn: T):
+        with self._available:
+            self._open -= 1
+            self.discarded += 1
+            # The freed slot lets a waiting caller open a replacement connection
+            self._available.notify()
+        if self._close is not None:
+            try:
+                self._close(conn)
+            except Exception as e:
+                self.logger.debug(f"Error closing database connection: {e}")
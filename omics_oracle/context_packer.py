@@ -0,0 +1,275 @@
+# omics_oracle/context_packer.py
+
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# ArangoDB bookkeeping fields that carry no meaning for the LLM
+DROPPED_FIELDS = {'_rev', '_key', '_oldRev'}
+WORD_PATTERN = re.compile(r"[a-z0-9][a-z0-9_\-]{2,}")
+# Stop scanning for rows that still fit after this many consecutive rows did not
+MAX_CONSECUTIVE_MISSES = 50
+
+
+@lru_cache(maxsize=None)
+def _load_encoder(model: str) -> Optional[Callable[[str], List[int]]]:
+    """Load the tiktoken encoder for a model once per process, or None if it is unavailable."""
+    try:
+        encoding_name = tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        # Models without a published tokenizer (e.g. Gemini) are measured with cl100k_base
+        encoding_name = "cl100k_base"
+    try:
+        return tiktoken.get_encoding(encoding_name).encode
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use, which fails without network access
+        logger.warning(f"tiktoken encoder for {model} unavailable, estimating tokens from length: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    Count the tokens in `text` for a model.
+
+    Args:
+        text (str): The text to measure.
+        model (str): The model whose tokenizer is used.
+
+    Returns:
+        int: The token count (estimated at four characters per token without tiktoken data).
+    """
+    encode = _load_encoder(model)
+    if encode is None:
+        return len(text) // 4 + 1
+    return len(encode(text))
+
+
+class ResultChunks(list):
+    """
+    The parts `ContextPacker.chunk` splits results into, with what was left out.
+
+    Attributes:
+        omitted (int): Distinct rows left out, because they did not fit or were beyond `max_chunks`.
+        total (int): Distinct rows in the results.
+    """
+
+    def __init__(self, chunks: List[str] = (), omitted: int = 0, total: int = 0):
+        super().__init__(chunks)
+        self.omitted = omitted
+        self.total = total
+
+
+class ContextPacker:
+    """
+    Fits query results into a fixed token budget for an LLM prompt.
+
+    Documents that repeat across rows (nodes and edges carrying an `_id`) are emitted once
+    in a document table and referenced by short aliases. Bookkeeping keys and empty values
+    are dropped, rows are ranked by overlap with the question, and rows are then added in
+    rank order until the budget is spent.
+    """
+
+    def __init__(self, max_tokens: int = 3000, model: str = "gpt-4o"):
+        """
+        Initialize the packer.
+
+        Args:
+            max_tokens (int): The token budget for the packed results.
+            model (str): The model whose tokenizer is used to count tokens.
+        """
+        self.max_tokens = max_tokens
+        self.model = model
+
+    def count_tokens(self, text: str) -> int:
+        """Count the tokens in `text` for the configured model."""
+        return count_tokens(text, self.model)
+
+    def pack(self, results: Any, query: str = None) -> str:
+        """
+        Render results as compact text that fits within the token budget.
+
+        Args:
+            results (Any): The query results, usually a list of rows.
+            query (str, optional): The user question, used to rank rows by relevance.
+
+        Returns:
+            str: The packed results, with a note when rows were left out.
+        """
+        rows = results if isinstance(results, list) else [results]
+        if not rows:
+            return "[]"
+
+        documents: Dict[str, Tuple[str, str]] = {}
+        compact_rows = self._dedupe_rows([self._compact(row, documents) for row in rows])
+        ranked = self._rank(compact_rows, documents, query)
+
+        budget = self.max_tokens
+        # Insertion-ordered, so membership checks stay O(1) on large results
+        used_ids: Dict[str, None] = {}
+        kept_rows: List[str] = []
+        misses = 0
+        for row_text, doc_ids in ranked:
+            new_ids = [doc_id for doc_id in doc_ids if doc_id not in used_ids]
+            cost = self.count_tokens(row_text) + sum(self.count_tokens(documents[d][1]) for d in new_ids)
+            if cost > budget:
+                misses += 1
+                if misses >= MAX_CONSECUTIVE_MISSES:
+                    break
+                continue
+            misses = 0
+            budget -= cost
+            kept_rows.append(row_text)
+            used_ids.update(dict.fromkeys(new_ids))
+
+        lines = []
+        if used_ids:
+            lines.append("Documents:")
+            lines.extend(documents[doc_id][1] for doc_id in used_ids)
+            lines.append("Rows:")
+        lines.extend(kept_rows)
+        omitted = len(compact_rows) - len(kept_rows)
+        if omitted:
+            lines.append(f"({omitted} of {len(compact_rows)} distinct rows omitted to fit the context budget)")
+        logger.debug(f"Packed {len(kept_rows)} of {len(rows)} rows into {self.max_tokens - budget} tokens")
+        return "\n".join(lines)
+
+    def chunk(self, results: Any, query: str = None, chunk_tokens: int = None,
+              max_chunks: int = None) -> ResultChunks:
+        """
+        Split results into self-contained parts that each fit a token budget.
+
+        Rows are compacted and ranked as in `pack`, then assigned in rank order to parts of
+        at most `chunk_tokens` tokens. Each part carries the documents its rows reference.
+
+        Args:
+            results (Any): The query results, usually a list of rows.
+            query (str, optional): The user question, used to rank rows by relevance.
+            chunk_tokens (int, optional): The token budget of each part. Defaults to `max_tokens`.
+            max_chunks (int, optional): The most parts returned; the least relevant rows
+                beyond them are left out. Defaults to no limit.
+
+        Returns:
+            ResultChunks: The parts, most relevant rows first; the last one notes omitted rows.
+        """
+        rows = results if isinstance(results, list) else [results]
+        if not rows:
+            return ResultChunks()
+        chunk_tokens = chunk_tokens or self.max_tokens
+
+        documents: Dict[str, Tuple[str, str]] = {}
+        compact_rows = self._dedupe_rows([self._compact(row, documents) for row in rows])
+        ranked = self._rank(compact_rows, documents, query)
+
+        parts: List[Tuple[Dict[str, None], List[str]]] = []
+        kept_rows: List[str] = []
+        used_ids: Dict[str, None] = {}
+        budget = chunk_tokens
+        kept = 0
+        for row_text, doc_ids in ranked:
+            new_ids = [doc_id for doc_id in doc_ids if doc_id not in used_ids]
+            cost = self.count_tokens(row_text) + sum(self.count_tokens(documents[d][1]) for d in new_ids)
+            if cost > budget and kept_rows:
+                parts.append((used_ids, kept_rows))
+                if max_chunks is not None and len(parts) >= max_chunks:
+                    kept_rows, used_ids = [], {}
+                    break
+                kept_rows, used_ids, budget = [], {}, chunk_tokens
+                new_ids = list(dict.fromkeys(doc_ids))
+                cost = self.count_tokens(row_text) + sum(self.count_tokens(documents[d][1]) for d in new_ids)
+            if cost > budget:
+                # A single row larger than a whole part
+                continue
+            budget -= cost
+            kept_rows.append(row_text)
+            used_ids.update(dict.fromkeys(new_ids))
+            kept += 1
+        if kept_rows:
+            parts.append((used_ids, kept_rows))
+
+        chunks = []
+        for doc_ids, part_rows in parts:
+            lines = []
+            if doc_ids:
+                lines.append("Documents:")
+                lines.extend(documents[doc_id][1] for doc_id in doc_ids)
+                lines.append("Rows:")
+            lines.extend(part_rows)
+            chunks.append("\n".join(lines))
+        omitted = len(compact_rows) - kept
+        if omitted and chunks:
+            chunks[-1] += f"\n({omitted} of {len(compact_rows)} distinct rows omitted to fit the context budget)"
+        logger.debug(f"Split {kept} of {len(rows)} rows into {len(chunks)} parts of up to {chunk_tokens} tokens")
+        return ResultChunks(chunks, omitted=omitted, total=len(compact_rows))
+
+    def _compact(self, value: Any, documents: Dict[str, Tuple[str, str]]) -> Any:
+        """Strip noise from a value and replace embedded documents with aliases."""
+        if isinstance(value, dict):
+            compact = {
+                key: self._compact(item, documents)
+                for key, item in value.items()
+                if key not in DROPPED_FIELDS and item not in (None, "", [], {})
+            }
+            doc_id = value.get('_id')
+            if isinstance(doc_id, str):
+                return self._register(doc_id, compact, documents)
+            return compact
+        if isinstance(value, list):
+            return [self._compact(item, documents) for item in value]
+        return value
+
+    def _register(self, doc_id: str, compact: Dict[str, Any], documents: Dict[str, Tuple[str, str]]) -> str:
+        """Record a document once and return its alias."""
+        if doc_id not in documents:
+            prefix = "e" if '_from' in compact else "n"
+            alias = f"{prefix}{len(documents) + 1}"
+            compact.pop('_id', None)
+            for endpoint in ('_from', '_to'):
+                if compact.get(endpoint) in documents:
+                    compact[endpoint] = documents[compact[endpoint]][0]
+            documents[doc_id] = (alias, f"{alias}={self._dumps(compact)}")
+        return documents[doc_id][0]
+
+    def _dedupe_rows(self, rows: List[Any]) -> List[str]:
+        seen = set()
+        unique = []
+        for row in rows:
+            text = self._dumps(row)
+            if text not in seen:
+                seen.add(text)
+                unique.append(text)
+        return unique
+
+    def _rank(self, rows: List[str], documents: Dict[str, Tuple[str, str]],
+              query: Optional[str]) -> List[Tuple[str, List[str]]]:
+        """Order rows by how many question terms they (and the documents they reference) mention."""
+        by_alias = {alias: text for alias, text in documents.values()}
+        alias_pattern = re.compile(r'"([ne]\d+)"')
+        terms = set(WORD_PATTERN.findall(query.lower())) if query else set()
+
+        scored = []
+        for position, row_text in enumerate(rows):
+            aliases = [a for a in dict.fromkeys(alias_pattern.findall(row_text)) if a in by_alias]
+            # Pull in documents referenced from other documents (edge endpoints)
+            for alias in list(aliases):
+                for nested in alias_pattern.findall(by_alias[alias]):
+                    if nested in by_alias and nested not in aliases:
+                        aliases.insert(0, nested)
+            score = 0
+            if terms:
+                text = " ".join([row_text] + [by_alias[a] for a in aliases]).lower()
+                score = sum(1 for term in terms if term in text)
+            scored.append((-score, position, row_text, aliases))
+
+        scored.sort(key=lambda item: (item[0], item[1]))
+        alias_to_id = {alias: doc_id for doc_id, (alias, _) in documents.items()}
+        return [(row_text, [alias_to_id[a] for a in aliases]) for _, _, row_text, aliases in scored]
+
+    @staticmethod
+    def _dumps(value: Any) -> str:
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
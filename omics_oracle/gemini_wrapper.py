@@ -1,20 +1,54 @@
 # omics_oracle/gemini_wrapper.py
 
+import asyncio
 import os
 import requests
+import httpx
 import json
 from typing import Dict, Any, List
 import logging
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from .concurrency import close_on_loop, gather_bounded, run_sync
+from .llm_cache import LLMCache
+from .context_packer import ContextPacker, count_tokens
+from .rate_limiter import RateLimiter
+from .logger import DEBUG_PREVIEW_LENGTH, capped_repr
 
 class GeminiWrapper:
-    def __init__(self):
+    def __init__(self, connect_timeout: float = 5.0, read_timeout: float = 60.0,
+                 pool_connections: int = 10, pool_maxsize: int = 10, http2: bool = False,
+                 cache: LLMCache = None, context_packer: ContextPacker = None,
+                 rate_limiter: RateLimiter = None):
+        """
+        Initialize the wrapper and its pooled, keep-alive HTTP client.
+
+        Args:
+            connect_timeout (float): Seconds to wait for a connection to the Gemini API.
+            read_timeout (float): Seconds to wait for the Gemini API to send a response.
+            pool_connections (int): Number of host pools to cache.
+            pool_maxsize (int): Maximum number of keep-alive connections per host.
+            http2 (bool): Use an HTTP/2 capable httpx client instead of a requests session.
+            cache (LLMCache, optional): Response cache shared with the other model clients.
+            context_packer (ContextPacker, optional): Fits SPOKE results into the prompt's token budget.
+            rate_limiter (RateLimiter, optional): Request/token limits, possibly shared with other clients.
+        """
         self.logger = logging.getLogger(__name__)
         self._load_environment()
         self.headers = {
             "Authorization": self.api_key,
             "Content-Type": "application/json"
         }
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.http2 = http2
+        self.cache = cache
+        self.context_packer = context_packer or ContextPacker(model="gemini-pro")
+        self.rate_limiter = rate_limiter
+        self.session = self._create_session()
+        self._async_client = None
+        self._async_loop = None
 
     def _load_environment(self):
         """Load environment variables from .env file."""
@@ -34,6 +68,115 @@ class GeminiWrapper:
         if not self.api_key or not self.base_url:
             raise ValueError("GEMINI_AUTH and GEMINI_URL must be set in the .env file")
 
+    def _create_session(self):
+        """
+        Create the HTTP client shared by every request made through this wrapper.
+
+        Returns:
+            requests.Session or httpx.Client: A client that keeps connections alive between calls.
+        """
+        if self.http2:
+            connect_timeout, read_timeout = self.timeout
+            try:
+                client = httpx.Client(
+                    http2=True,
+                    headers=self.headers,
+                    timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                    limits=httpx.Limits(max_connections=self.pool_maxsize,
+                                        max_keepalive_connections=self.pool_maxsize)
+                )
+                self.logger.info("Created HTTP/2 client for Gemini API")
+                return client
+            except ImportError as e:
+                self.logger.warning(f"HTTP/2 unavailable, falling back to HTTP/1.1 session: {e}")
+                self.http2 = False
+
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.logger.info("Created pooled HTTP session for Gemini API")
+        return session
+
+    def _post(self, payload: Dict[str, Any]):
+        """Post a payload to the Gemini API, within the rate limits when a limiter is configured."""
+        if self.rate_limiter is None:
+            return self._post_once(payload)
+        return self.rate_limiter.call(self._post_once, payload, raise_on_429=True,
+                                      tokens=self._estimate_tokens(payload))
+
+    def _post_once(self, payload: Dict[str, Any], raise_on_429: bool = False):
+        """Post a payload to the Gemini API over the pooled client."""
+        if self.http2:
+            response = self.session.post(self.base_url, json=payload)
+        else:
+            response = self.session.post(self.base_url, json=payload, timeout=self.timeout)
+        if raise_on_429 and response.status_code == 429:
+            response.raise_for_status()
+        return response
+
+    async def _apost(self, payload: Dict[str, Any]):
+        """Asynchronously post a payload to the Gemini API, within the rate limits when a limiter is configured."""
+        if self.rate_limiter is None:
+            return await self._apost_once(payload)
+        return await self.rate_limiter.acall(self._apost_once, payload, raise_on_429=True,
+                                             tokens=self._estimate_tokens(payload))
+
+    async def _apost_once(self, payload: Dict[str, Any], raise_on_429: bool = False):
+        """Asynchronously post a payload to the Gemini API over the pooled async client."""
+        response = await self._get_async_client().post(self.base_url, json=payload)
+        if raise_on_429 and response.status_code == 429:
+            response.raise_for_status()
+        return response
+
+    def _estimate_tokens(self, payload: Dict[str, Any]) -> int:
+        """Estimate the prompt tokens a payload spends against the tokens-per-minute budget."""
+        return sum(count_tokens(message["content"], payload["model"]) for message in payload["messages"])
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """
+        Return the pooled async client for the running event loop.
+
+        httpx async connections are bound to the loop that opened them, so a new
+        client is created whenever the wrapper is used from a different loop, and the
+        previous one is closed on its own loop if that loop is still running.
+
+        Returns:
+            httpx.AsyncClient: A keep-alive client sharing this wrapper's timeouts and pool size.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            if self._async_client is not None and not close_on_loop(self._async_client.aclose, self._async_loop):
+                self.logger.debug("Dropping async HTTP client of an event loop that is no longer running")
+            connect_timeout, read_timeout = self.timeout
+            self._async_client = httpx.AsyncClient(
+                http2=self.http2,
+                headers=self.headers,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_maxsize,
+                                    max_keepalive_connections=self.pool_maxsize)
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    def close(self):
+        """Close the pooled HTTP client and release its connections."""
+        self.session.close()
+
+    async def aclose(self):
+        """Close the pooled async HTTP client, if one was created."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_loop = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
     def send_query(self, query: str, context: str = "general") -> Dict[str, Any]:
         """
         Send a query to the Gemini API and return the response.
@@ -47,31 +190,108 @@ class GeminiWrapper:
 
         Raises:
             requests.RequestException: If there's an error with the API request.
+            httpx.HTTPError: If there's an error with the API request made over HTTP/2.
         """
-        prompt = self._generate_prompt(query, context)
-        payload = {
-            "model": "gemini-pro",
-            "messages": [{"role": "user", "content": prompt}]
-        }
+        payload = self._build_payload(query, context)
+        cached = self._cache_lookup(payload)
+        if cached is not None:
+            return cached
 
         self.logger.info("Sending request to Gemini API")
-        self.logger.debug(f"Headers: {json.dumps(self.headers, indent=2)}")
-        self.logger.debug(f"Payload: {json.dumps(payload, indent=2)}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Headers: {json.dumps(self.headers, indent=2)}")
+            self.logger.debug(f"Payload: {capped_repr(payload, DEBUG_PREVIEW_LENGTH)}")
 
         try:
-            response = requests.post(self.base_url, headers=self.headers, json=payload)
+            response = self._post(payload)
             self.logger.info("Received response from Gemini API")
-            self.logger.debug(f"Response status code: {response.status_code}")
-            self.logger.debug(f"Response headers: {json.dumps(dict(response.headers), indent=2)}")
-            self.logger.debug(f"Response content: {response.text}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Response status code: {response.status_code}")
+                self.logger.debug(f"Response headers: {json.dumps(dict(response.headers), indent=2)}")
+                self.logger.debug(f"Response content: {capped_repr(response.text, DEBUG_PREVIEW_LENGTH)}")
             response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
+            result = response.json()
+            self._cache_store(payload, result)
+            return result
+        except (requests.RequestException, httpx.HTTPError) as e:
             self.logger.error(f"Error sending query to Gemini API: {e}")
             if hasattr(e, 'response') and e.response is not None:
                 self.logger.error(f"Error response content: {e.response.text}")
             raise
 
+    async def asend_query(self, query: str, context: str = "general") -> Dict[str, Any]:
+        """
+        Asynchronously send a query to the Gemini API and return the response.
+
+        Args:
+            query (str): The natural language query to send to the API.
+            context (str): The context of the query (e.g., "general", "biomedical", "aql_generation").
+
+        Returns:
+            Dict[str, Any]: The API response as a dictionary.
+
+        Raises:
+            httpx.HTTPError: If there's an error with the API request.
+        """
+        payload = self._build_payload(query, context)
+        cached = self._cache_lookup(payload)
+        if cached is not None:
+            return cached
+
+        self.logger.info("Sending async request to Gemini API")
+        try:
+            response = await self._apost(payload)
+            self.logger.info("Received async response from Gemini API")
+            self.logger.debug(f"Response status code: {response.status_code}")
+            response.raise_for_status()
+            result = response.json()
+            self._cache_store(payload, result)
+            return result
+        except httpx.HTTPError as e:
+            self.logger.error(f"Error sending async query to Gemini API: {e}")
+            if isinstance(e, httpx.HTTPStatusError):
+                self.logger.error(f"Error response content: {e.response.text}")
+            raise
+
+    async def asend_queries(self, queries: List[str], context: str = "general",
+                            max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Send many queries concurrently, with at most `max_concurrency` requests in flight.
+
+        Args:
+            queries (List[str]): The natural language queries to send to the API.
+            context (str): The context shared by all queries.
+            max_concurrency (int): The maximum number of concurrent requests.
+
+        Returns:
+            List[Dict[str, Any]]: The API responses, in the same order as `queries`.
+        """
+        return await gather_bounded(
+            [lambda q=q: self.asend_query(q, context=context) for q in queries],
+            max_concurrency
+        )
+
+    def send_queries(self, queries: List[str], context: str = "general",
+                     max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Synchronous entry point for `asend_queries`.
+
+        Args:
+            queries (List[str]): The natural language queries to send to the API.
+            context (str): The context shared by all queries.
+            max_concurrency (int): The maximum number of concurrent requests.
+
+        Returns:
+            List[Dict[str, Any]]: The API responses, in the same order as `queries`.
+        """
+        async def run():
+            try:
+                return await self.asend_queries(queries, context=context, max_concurrency=max_concurrency)
+            finally:
+                await self.aclose()
+
+        return run_sync(run())
+
     def interpret_response(self, response: Dict[str, Any]) -> str:
         """
         Interpret the Gemini API response and extract the relevant content.
@@ -93,6 +313,37 @@ class GeminiWrapper:
             self.logger.error(f"Unexpected error interpreting Gemini API response: {e}")
             return "Error: An unexpected error occurred"
 
+    def _build_payload(self, query: str, context: str) -> Dict[str, Any]:
+        """
+        Build the request payload for a query.
+
+        Args:
+            query (str): The original user query.
+            context (str): The context of the query.
+
+        Returns:
+            Dict[str, Any]: The JSON payload for the Gemini API.
+        """
+        prompt = self._generate_prompt(query, context)
+        return {
+            "model": "gemini-pro",
+            "messages": [{"role": "user", "content": prompt}]
+        }
+
+    def _cache_lookup(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a cached API response for this payload, if the cache has one."""
+        if self.cache is None:
+            return None
+        cached = self.cache.get(LLMCache.make_key(payload["model"], payload["messages"]))
+        if cached is not None:
+            self.logger.info("Gemini API response served from cache")
+        return cached
+
+    def _cache_store(self, payload: Dict[str, Any], response: Dict[str, Any]):
+        """Store an API response in the cache, if one is configured."""
+        if self.cache is not None:
+            self.cache.set(LLMCache.make_key(payload["model"], payload["messages"]), response)
+
     def _generate_prompt(self, query: str, context: str) -> str:
         """
         Generate a specialized prompt based on the query context.
@@ -130,6 +381,20 @@ class GeminiWrapper:
         aql_query = self._extract_aql_query(interpreted_response)
         return aql_query
 
+    async def agenerate_aql_query(self, biomedical_query: str) -> str:
+        """
+        Asynchronously generate an AQL query based on a biomedical question.
+
+        Args:
+            biomedical_query (str): The biomedical question.
+
+        Returns:
+            str: The generated AQL query.
+        """
+        response = await self.asend_query(biomedical_query, context="aql_generation")
+        interpreted_response = self.interpret_response(response)
+        return self._extract_aql_query(interpreted_response)
+
     def _extract_aql_query(self, response: str) -> str:
         """
         Extract the AQL query from the Gemini response.
@@ -159,6 +424,26 @@ class GeminiWrapper:
         Returns:
             str: An interpretation of the SPOKE results.
         """
-        interpretation_prompt = f"Based on the original biomedical query '{original_query}' and the following results from the SPOKE knowledge graph: {spoke_results}, provide a concise interpretation of the findings, highlighting key biomedical insights."
+        interpretation_prompt = self._interpretation_prompt(spoke_results, original_query)
         response = self.send_query(interpretation_prompt, context="biomedical")
-        return self.interpret_response(response)
\ No newline at end of file
+        return self.interpret_response(response)
+
+    async def ainterpret_spoke_results(self, spoke_results: List[Dict[str, Any]], original_query: str) -> str:
+        """
+        Asynchronously interpret the SPOKE results in the context of the original query.
+
+        Args:
+            spoke_results (List[Dict[str, Any]]): The results from the SPOKE knowledge graph.
+            original_query (str): The original biomedical query.
+
+        Returns:
+            str: An interpretation of the SPOKE results.
+        """
+        interpretation_prompt = self._interpretation_prompt(spoke_results, original_query)
+        response = await self.asend_query(interpretation_prompt, context="biomedical")
+        return self.interpret_response(response)
+
+    def _interpretation_prompt(self, spoke_results: List[Dict[str, Any]], original_query: str) -> str:
+        """Build the prompt used to interpret SPOKE results, packed into the context budget."""
+        packed_results = self.context_packer.pack(spoke_results, query=original_query)
+        return f"Based on the original biomedical query '{original_query}' and the following results from the SPOKE knowledge graph:\n{packed_results}\nprovide a concise interpretation of the findings, highlighting key biomedical insights."
@@ -2,45 +2,91 @@ import gradio as gr
 from omics_oracle.query_manager import QueryManager
 from omics_oracle.openai_wrapper import OpenAIWrapper
 from omics_oracle.spoke_wrapper import SpokeWrapper
+from omics_oracle.logger import DEBUG_PREVIEW_LENGTH, capped_repr
 import logging
 import traceback
 import json
+from typing import AsyncIterator, Iterator
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG, filename='error.log')
 logger = logging.getLogger(__name__)
 
-def process_query(query: str, query_manager: QueryManager) -> str:
+def process_query(query: str, query_manager: QueryManager) -> Iterator[str]:
+    """
+    Process a query and stream progressively more complete responses to the UI.
+
+    Yields a progress message straight away, then a formatted response every time
+    the QueryManager streams more of the interpretation.
+    """
     logger.debug(f"Submit button clicked with query: {query}")
     logger.debug(f"Received query: {query}")
     if not query.strip():
         logger.error("Empty query received")
-        return "Error: Query cannot be empty. Please enter a valid query."
+        yield "Error: Query cannot be empty. Please enter a valid query."
+        return
     
     try:
         logger.debug("Starting to process the query with QueryManager...")
-        response = query_manager.process_query(query)
-        logger.debug(f"QueryManager returned response: {response}")
+        yield "Generating and executing the AQL query..."
+        response = None
+        for response in query_manager.stream_query(query):
+            yield _render_response(response)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"QueryManager returned response: {capped_repr(response, DEBUG_PREVIEW_LENGTH)}")
 
         formatted_response = format_response(response)
-        logger.debug(f"Formatted response: {formatted_response}")
-        return formatted_response
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Formatted response: {capped_repr(formatted_response, DEBUG_PREVIEW_LENGTH)}")
+        yield formatted_response
     except ValueError as ve:
         logger.error(f"ValueError while processing query: {ve}\n\n{traceback.format_exc()}")
-        return f"An error occurred: {str(ve)}"
+        yield f"An error occurred: {str(ve)}"
     except Exception as e:
         logger.error(f"Exception while processing query: {e}\n\n{traceback.format_exc()}")
-        return f"An unexpected error occurred. Please try again later. If the problem persists, contact support. Details: {str(e)}"
+        yield f"An unexpected error occurred. Please try again later. If the problem persists, contact support. Details: {str(e)}"
+
+async def aprocess_query(query: str, query_manager: QueryManager) -> AsyncIterator[str]:
+    """
+    Process a query like `process_query` on the event loop.
+
+    Gradio closes the generator when the client disconnects, which cancels the
+    QueryManager's pipeline for this question.
+    """
+    logger.debug(f"Received query: {query}")
+    if not query.strip():
+        logger.error("Empty query received")
+        yield "Error: Query cannot be empty. Please enter a valid query."
+        return
+
+    try:
+        yield "Generating and executing the AQL query..."
+        response = None
+        async for response in query_manager.astream_query(query):
+            yield _render_response(response)
+        yield format_response(response)
+    except ValueError as ve:
+        logger.error(f"ValueError while processing query: {ve}\n\n{traceback.format_exc()}")
+        yield f"An error occurred: {str(ve)}"
+    except Exception as e:
+        logger.error(f"Exception while processing query: {e}\n\n{traceback.format_exc()}")
+        yield f"An unexpected error occurred. Please try again later. If the problem persists, contact support. Details: {str(e)}"
 
 def format_response(response: dict) -> str:
-    logger.debug(f"Formatting response: {response}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Formatting response: {capped_repr(response, DEBUG_PREVIEW_LENGTH)}")
+    formatted = _render_response(response)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Formatted response: {capped_repr(formatted, DEBUG_PREVIEW_LENGTH)}")
+    return formatted
+
+def _render_response(response: dict) -> str:
     formatted = f"Original Query: {response['original_query']}\n\n"
     formatted += f"AQL Query: {response.get('aql_query', 'No AQL query generated')}\n\n"
     formatted += f"SPOKE Results: {json.dumps(response.get('spoke_results', []), indent=2)}\n\n"
     formatted += f"Interpretation: {response['interpretation']}\n\n"
     if 'attempt_count' in response:
         formatted += f"Attempt Count: {response['attempt_count']}"
-    logger.debug(f"Formatted response: {formatted}")
     return formatted
 
 custom_css = """
@@ -140,10 +186,16 @@ def create_styled_interface(query_manager: QueryManager):
             
             gr.Markdown("Enter a biomedical query, and the system will provide an answer based on the available data.")
             
+            async def stream_response(q):
+                async for update in aprocess_query(q, query_manager):
+                    yield update
+
+            # QueryManager limits how many questions run at once, so Gradio does not have to
             submit_button.click(
-                lambda q: process_query(q, query_manager),
+                stream_response,
                 inputs=query_input,
-                outputs=response_output
+                outputs=response_output,
+                concurrency_limit=None
             )
 
     logger.debug("Styled Gradio interface created successfully")
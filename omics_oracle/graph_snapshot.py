@@ -0,0 +1,258 @@
+# omics_oracle/graph_snapshot.py
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .arango_session import ArangoSession
+
+SNAPSHOT_ARRAYS = ('vertices', 'offsets', 'targets', 'labels')
+METADATA_FILE = 'metadata.json'
+EXPORT_BATCH_SIZE = 100000
+
+
+class GraphSnapshot:
+    """
+    Read-only CSR adjacency of an ArangoDB edge collection, memory-mapped from disk.
+
+    Vertex ids are stored sorted, so a vertex is found with a binary search. The outgoing
+    edges of vertex `i` are `targets[offsets[i]:offsets[i + 1]]` (indexes into `vertices`),
+    and their labels are the `label_names` entries at the same positions in `labels`.
+
+    A snapshot records the revision of the edge collection it was exported from. When a
+    `revision` callable is set, it is polled at most every `check_interval` seconds and the
+    snapshot reports itself stale once the collection has changed.
+    """
+
+    def __init__(self, path: str, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any],
+                 revision: Optional[Callable[[], Any]] = None, check_interval: float = 60.0,
+                 max_age: Optional[float] = None):
+        """
+        Initialize a snapshot from its arrays. Use `build` or `load` to create one.
+
+        Args:
+            path (str): The snapshot directory.
+            arrays (Dict[str, np.ndarray]): The CSR arrays, keyed by SNAPSHOT_ARRAYS.
+            metadata (Dict[str, Any]): The contents of the snapshot's metadata file.
+            revision (Callable[[], Any], optional): Returns the current revision of the edge
+                collection. Defaults to None (the snapshot is never checked for staleness).
+            check_interval (float): Minimum seconds between two revision checks.
+            max_age (float, optional): Seconds after its export at which the snapshot counts as
+                stale regardless of the revision. Defaults to None (no age limit).
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.vertices = arrays['vertices']
+        self.offsets = arrays['offsets']
+        self.targets = arrays['targets']
+        self.labels = arrays['labels']
+        self.metadata = metadata
+        self.edge_collection = metadata['edge_collection']
+        self.label_names: List[Optional[str]] = metadata['label_names']
+        self._label_ids = {name: label_id for label_id, name in enumerate(self.label_names)}
+        self.revision = revision
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._fresh = True
+        self._checked = None
+        self._checking = False
+
+    @classmethod
+    def build(cls, session: ArangoSession, path: str, edge_collection: str = 'Edges',
+              batch_size: int = EXPORT_BATCH_SIZE, **kwargs: Any) -> "GraphSnapshot":
+        """
+        Export an edge collection to a snapshot directory and load it.
+
+        Args:
+            session (ArangoSession): The session to export from.
+            path (str): The directory to write the snapshot to.
+            edge_collection (str): The edge collection to export.
+            batch_size (int): Edges fetched per cursor batch.
+            **kwargs: Further keyword arguments for `load`.
+
+        Returns:
+            GraphSnapshot: The memory-mapped snapshot.
+        """
+        logger = logging.getLogger(__name__)
+        # Read the revision first: writes during the export make the snapshot stale, not silently incomplete
+        revision = session.collection_revision(edge_collection)
+        logger.info(f"Exporting edge collection {edge_collection} (revision {revision}) to {path}")
+        start = time.perf_counter()
+        sources, targets, labels = [], [], []
+        with session.connection() as db:
+            cursor = db.aql.execute("FOR e IN @@edge_collection RETURN [e._from, e._to, e.label]",
+                                    bind_vars={'@edge_collection': edge_collection},
+                                    batch_size=batch_size, stream=True)
+            for source, target, label in cursor:
+                sources.append(source)
+                targets.append(target)
+                labels.append(label)
+
+        edge_count = len(sources)
+        vertices, endpoints = np.unique(np.array(sources + targets, dtype=np.bytes_), return_inverse=True)
+        del sources, targets
+        source_index, target_index = endpoints[:edge_count], endpoints[edge_count:]
+        order = np.argsort(source_index, kind='stable')
+        offsets = np.zeros(len(vertices) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(source_index, minlength=len(vertices)), out=offsets[1:])
+
+        label_names = sorted(set(labels), key=lambda name: (name is None, name or ''))
+        label_ids = {name: label_id for label_id, name in enumerate(label_names)}
+        label_array = np.array([label_ids[label] for label in labels],
+                               dtype=np.uint16 if len(label_names) <= np.iinfo(np.uint16).max else np.int32)
+
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            'vertices': vertices,
+            'offsets': offsets,
+            'targets': target_index[order].astype(np.int32 if len(vertices) <= np.iinfo(np.int32).max else np.int64),
+            'labels': label_array[order],
+        }
+        # Files are replaced rather than overwritten, so processes that have the previous
+        # snapshot memory-mapped keep reading the old data
+        for name, array in arrays.items():
+            array_path = os.path.join(path, f"{name}.npy")
+            with open(array_path + '.tmp', 'wb') as f:
+                np.save(f, array)
+            os.replace(array_path + '.tmp', array_path)
+        metadata = {
+            'edge_collection': edge_collection,
+            'revision': revision,
+            'created': time.time(),
+            'vertex_count': int(len(vertices)),
+            'edge_count': edge_count,
+            'label_names': label_names,
+        }
+        # The metadata file is written last, so a partial export is never loaded
+        metadata_path = os.path.join(path, METADATA_FILE)
+        with open(metadata_path + '.tmp', 'w') as f:
+            json.dump(metadata, f)
+        os.replace(metadata_path + '.tmp', metadata_path)
+        logger.info(f"Exported {edge_count} edges between {len(vertices)} vertices "
+                    f"in {time.perf_counter() - start:.1f}s")
+        return cls.load(path, **kwargs)
+
+    @classmethod
+    def load(cls, path: str, **kwargs: Any) -> "GraphSnapshot":
+        """
+        Memory-map a snapshot directory written by `build`.
+
+        Args:
+            path (str): The snapshot directory.
+            **kwargs: Further keyword arguments for the constructor (revision, check_interval, max_age).
+
+        Returns:
+            GraphSnapshot: The snapshot.
+
+        Raises:
+            FileNotFoundError: If the directory holds no complete snapshot.
+        """
+        with open(os.path.join(path, METADATA_FILE)) as f:
+            metadata = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in SNAPSHOT_ARRAYS}
+        snapshot = cls(path, arrays, metadata, **kwargs)
+        snapshot.logger.info(f"Loaded graph snapshot of {metadata['edge_collection']} from {path}: "
+                             f"{metadata['vertex_count']} vertices, {metadata['edge_count']} edges")
+        return snapshot
+
+    def index(self, vertex_id: str) -> Optional[int]:
+        """Return the position of a vertex id in `vertices`, or None if it has no edges in the snapshot."""
+        key = vertex_id.encode()
+        position = int(np.searchsorted(self.vertices, key))
+        if position < len(self.vertices) and self.vertices[position] == key:
+            return position
+        return None
+
+    def neighbors(self, vertex_id: str, edge_labels: Iterable[str] = None,
+                  limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        List the outgoing edges of a vertex.
+
+        Args:
+            vertex_id (str): The `_id` of the vertex.
+            edge_labels (Iterable[str], optional): Only return edges with one of these labels.
+                Defaults to None (all edges).
+            limit (int, optional): The maximum number of edges returned. Defaults to None.
+
+        Returns:
+            List[Dict[str, Any]]: The `id`, `key` and edge `label` of each neighbor.
+        """
+        position = self.index(vertex_id)
+        if position is None:
+            return []
+        start, end = self.offsets[position], self.offsets[position + 1]
+        targets, labels = self.targets[start:end], self.labels[start:end]
+        if edge_labels is not None:
+            wanted = [self._label_ids[name] for name in edge_labels if name in self._label_ids]
+            mask = np.isin(labels, wanted)
+            targets, labels = targets[mask], labels[mask]
+        if limit is not None:
+            targets, labels = targets[:limit], labels[:limit]
+        neighbors = []
+        for target, label in zip(self.vertices[targets].tolist(), labels.tolist()):
+            target_id = target.decode()
+            neighbors.append({'id': target_id, 'key': target_id.split('/', 1)[-1], 'label': self.label_names[label]})
+        return neighbors
+
+    def neighbor_lists(self, vertex_ids: Sequence[str], edge_labels: Iterable[str] = None,
+                       limit: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """List the outgoing edges of several vertices, keyed by vertex id (see `neighbors`)."""
+        labels = list(edge_labels) if edge_labels is not None else None
+        return {vertex_id: self.neighbors(vertex_id, labels, limit) for vertex_id in dict.fromkeys(vertex_ids)}
+
+    def is_fresh(self) -> bool:
+        """
+        Check whether the snapshot still matches the edge collection.
+
+        Returns:
+            bool: False once the snapshot is older than `max_age` or the collection revision
+            has changed. If the revision cannot be read, the last known answer is kept.
+        """
+        if self.max_age is not None and time.time() - self.metadata['created'] > self.max_age:
+            return False
+        if self.revision is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            due = self._checked is None or now - self._checked >= self.check_interval
+            if not due or self._checking:
+                return self._fresh
+            # Only one caller polls the database; the others use the last answer meanwhile
+            self._checking = True
+        fresh = self._fresh
+        try:
+            fresh = self.revision() == self.metadata['revision']
+        except Exception as e:
+            self.logger.warning(f"Could not check the revision of {self.edge_collection}: {e}")
+        with self._lock:
+            if self._fresh and not fresh:
+                self.logger.warning(f"Graph snapshot at {self.path} is stale, falling back to ArangoDB")
+            self._fresh = fresh
+            self._checked = now
+            self._checking = False
+        return fresh
+
+
+def main(argv: List[str] = None):
+    """Export the SPOKE edge collection to a snapshot directory, using the ARANGO_* settings in .env."""
+    parser = argparse.ArgumentParser(description="Export an ArangoDB edge collection to a CSR graph snapshot.")
+    parser.add_argument('path', help="Directory to write the snapshot to")
+    parser.add_argument('--edge-collection', default='Edges', help="Edge collection to export")
+    args = parser.parse_args(argv)
+
+    session = ArangoSession.from_env(pool_size=1)
+    try:
+        GraphSnapshot.build(session, args.path, args.edge_collection)
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
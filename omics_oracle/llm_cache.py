@@ -0,0 +1,222 @@
+# omics_oracle/llm_cache.py
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.load import dumps, loads
+
+
+class LLMCache:
+    """
+    Two-tier cache for LLM responses shared by every model client.
+
+    Entries are keyed on (model, messages, temperature, max_tokens). Lookups hit an
+    in-memory LRU first and fall back to an optional SQLite file, so responses survive
+    restarts and are shared between worker processes pointing at the same file.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_memory_entries: int = 1024,
+                 max_disk_bytes: int = 256 * 1024 * 1024, ttl: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            path (str, optional): SQLite file for the on-disk tier. Defaults to None (memory only).
+            max_memory_entries (int): Maximum number of entries kept in the in-memory LRU.
+            max_disk_bytes (int): Maximum total size of cached values on disk before the
+                least recently used entries are evicted.
+            ttl (float, optional): Seconds an entry stays valid. Defaults to None (never expires).
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.bypass = False
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+            self._conn.commit()
+        self.logger.info(f"LLMCache initialized (disk tier: {path or 'disabled'})")
+
+    @staticmethod
+    def make_key(model: str, messages: Any, temperature: Optional[float] = None,
+                 max_tokens: Optional[int] = None) -> str:
+        """
+        Build the cache key for a completion request.
+
+        Args:
+            model (str): The model name (or serialized model configuration).
+            messages (Any): The prompt or chat messages, in any JSON-serializable form.
+            temperature (float, optional): The sampling temperature.
+            max_tokens (int, optional): The completion token limit.
+
+        Returns:
+            str: A stable hex digest identifying the request.
+        """
+        raw = json.dumps([model, messages, temperature, max_tokens], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            key (str): A key produced by `make_key`.
+
+        Returns:
+            Optional[Any]: The cached value, or None on a miss or when the cache is bypassed.
+        """
+        if self.bypass:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    raw, created = row
+                    if not self._expired(created, now):
+                        self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+                        self._conn.commit()
+                        value = json.loads(raw)
+                        self._remember(key, value, created)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        """
+        Store a JSON-serializable value under `key`.
+
+        Args:
+            key (str): A key produced by `make_key`.
+            value (Any): The value to cache.
+        """
+        if self.bypass or value is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._conn is not None:
+                raw = json.dumps(value)
+                if len(raw) > self.max_disk_bytes:
+                    return
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, raw, len(raw), now, now)
+                )
+                self._evict_disk()
+                self._conn.commit()
+
+    def _remember(self, key: str, value: Any, created: float):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """Drop expired entries, then least recently used ones until the size budget is met."""
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self.logger.debug(f"Evicted {evicted} entries from the on-disk LLM cache")
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_cache")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report hit/miss counters.
+
+        Returns:
+            Dict[str, int]: Hits, misses, and the split of hits between the two tiers.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'memory_entries': len(self._memory),
+        }
+
+    def close(self):
+        """Close the on-disk tier."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class LangChainLLMCache(BaseCache):
+    """Adapter that lets LangChain chat models such as ChatOpenAI read and write an LLMCache."""
+
+    def __init__(self, cache: LLMCache):
+        self.cache = cache
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        # llm_string is LangChain's serialized model configuration (model name,
+        # temperature, max_tokens, ...), so it stands in for those key components.
+        return LLMCache.make_key(llm_string, prompt)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        cached = self.cache.get(self._key(prompt, llm_string))
+        return loads(cached) if cached is not None else None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.cache.set(self._key(prompt, llm_string), dumps(list(return_val)))
+
+    def clear(self, **kwargs: Any) -> None:
+        self.cache.clear()
+
@@ -1,9 +1,18 @@
 import logging
+import os
 import sys
+from typing import Any
 
-def setup_logger(name):
+# Upper bound for payloads and results rendered into debug messages
+DEBUG_PREVIEW_LENGTH = 2000
+
+def setup_logger(name, level=None):
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(level or os.getenv('OMICS_ORACLE_LOG_LEVEL', 'INFO').upper())
+
+    # Handlers are only attached once, no matter how many components ask for the logger
+    if logger.handlers:
+        return logger
 
     # Create handlers
     c_handler = logging.StreamHandler(sys.stdout)
@@ -21,4 +30,86 @@ def setup_logger(name):
     logger.addHandler(c_handler)
     logger.addHandler(f_handler)
 
-    return logger
\ No newline at end of file
+    return logger
+
+
+class _CapReached(Exception):
+    pass
+
+
+def capped_repr(obj: Any, max_length: int = 100) -> str:
+    """
+    Render `obj` for a log message, stopping as soon as `max_length` characters are produced.
+
+    The output matches `str(obj)` cut to `max_length` characters plus "...", but dicts,
+    lists, tuples and strings are rendered piece by piece, so a large result is never
+    turned into one big string just to be sliced.
+
+    Args:
+        obj (Any): The object to render.
+        max_length (int): The maximum number of characters to keep.
+
+    Returns:
+        str: The rendered object, ending in "..." if it was cut.
+    """
+    parts = []
+    size = 0
+    limit = max_length + 1
+    active = set()
+
+    def emit(text):
+        nonlocal size
+        parts.append(text)
+        size += len(text)
+        if size >= limit:
+            raise _CapReached
+
+    def walk(value, top):
+        kind = type(value)
+        if kind is str:
+            room = limit - size
+            if top:
+                emit(value[:room])
+            elif len(value) <= room:
+                emit(repr(value))
+            else:
+                # repr() picks its quotes from the whole string, which the prefix may not show
+                quote = '"' if "'" in value and '"' not in value else "'"
+                text = repr(value[:room])
+                if text[0] != quote:
+                    inner = text[1:-1] if quote == '"' else text[1:-1].replace("'", "\\'")
+                    text = quote + inner + quote
+                emit(text)
+        elif kind in (dict, list, tuple):
+            if id(value) in active:
+                emit('{...}' if kind is dict else '[...]' if kind is list else '(...)')
+                return
+            active.add(id(value))
+            if kind is dict:
+                emit('{')
+                for i, (key, item) in enumerate(value.items()):
+                    if i:
+                        emit(', ')
+                    walk(key, False)
+                    emit(': ')
+                    walk(item, False)
+                emit('}')
+            else:
+                emit('[' if kind is list else '(')
+                for i, item in enumerate(value):
+                    if i:
+                        emit(', ')
+                    walk(item, False)
+                if kind is tuple and len(value) == 1:
+                    emit(',')
+                emit(']' if kind is list else ')')
+            active.discard(id(value))
+        else:
+            emit(str(value) if top else repr(value))
+
+    try:
+        walk(obj, True)
+    except _CapReached:
+        pass
+    text = ''.join(parts)
+    return text[:max_length] + "..." if len(text) > max_length else text
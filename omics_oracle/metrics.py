@@ -0,0 +1,324 @@
+# omics_oracle/metrics.py
+
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+ATTEMPT_BUCKETS = (1, 2, 3, 4, 5)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Durations of the stages nested in the current stage, subtracted from its own duration
+_nested: ContextVar[Optional[List[float]]] = ContextVar('metrics_nested_stages', default=None)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A monotonically increasing count per label combination."""
+    type_name = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        """Add `amount` (which must not be negative) to the count of a label combination."""
+        if amount < 0:
+            raise ValueError("Counters can only be increased")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        """Return the count of a label combination."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets per label combination, with their sum and count."""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets)) + (math.inf,)
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any):
+        """Record one observation."""
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, [[0] * len(self.buckets), 0.0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key][1] = total + value
+
+    def count(self, **labels: Any) -> int:
+        """Return the number of observations of a label combination."""
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Return the counter called `name`, creating it on first use."""
+        return self._register(Counter, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        """Return the histogram called `name`, creating it on first use."""
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def _register(self, cls, name: str, help_text: str, labelnames: Sequence[str], **kwargs: Any):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered with a different type or labels")
+            return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def nested_stages() -> Iterator[List[float]]:
+    """
+    Collect the durations of the stages timed inside the block.
+
+    The durations are passed on to the enclosing stage as well, so it still excludes them.
+
+    Yields:
+        List[float]: The durations, filled in as the nested stages finish.
+    """
+    nested: List[float] = []
+    token = _nested.set(nested)
+    try:
+        yield nested
+    finally:
+        _nested.reset(token)
+        parent = _nested.get()
+        if parent is not None:
+            parent.extend(nested)
+
+
+class QueryMetrics:
+    """
+    The metrics of the question-answering pipeline.
+
+    Stages (AQL generation, AQL execution, interpretation) are timed with `stage`. Stages
+    can nest, and a stage's duration excludes the stages nested inside it, so the AQL
+    generation time does not include executing the queries the chain generated.
+    """
+
+    def __init__(self, registry: MetricsRegistry = None):
+        """
+        Initialize the metrics.
+
+        Args:
+            registry (MetricsRegistry, optional): The registry to add the metrics to.
+                Defaults to a new registry.
+        """
+        self.registry = registry or MetricsRegistry()
+        self.stage_seconds = self.registry.histogram(
+            'omics_oracle_stage_duration_seconds', "Duration of each pipeline stage.", ('stage', 'outcome'))
+        self.stage_errors = self.registry.counter(
+            'omics_oracle_stage_errors_total', "Errors raised in each pipeline stage.", ('stage', 'error'))
+        self.request_seconds = self.registry.histogram(
+            'omics_oracle_request_duration_seconds', "End-to-end duration of a question.", ('outcome',))
+        self.attempts = self.registry.histogram(
+            'omics_oracle_query_attempts', "AQL generation attempts per question.", buckets=ATTEMPT_BUCKETS)
+        self.memory_lookups = self.registry.counter(
+            'omics_oracle_aql_memory_lookups_total',
+            "Question memory lookups: AQL reused, stale, examples given, or no match.", ('outcome',))
+        self.result_rows = self.registry.histogram(
+            'omics_oracle_aql_result_rows', "Rows returned per AQL query.", buckets=ROW_BUCKETS)
+        self.llm_seconds = self.registry.histogram(
+            'omics_oracle_llm_call_duration_seconds', "Duration of each LLM call.", ('stage', 'model', 'outcome'))
+        self.llm_tokens = self.registry.counter(
+            'omics_oracle_llm_tokens_total', "LLM tokens used.", ('stage', 'model', 'type'))
+        self.llm_cost = self.registry.counter(
+            'omics_oracle_llm_cost_usd_total', "Estimated LLM spend in USD.", ('stage', 'model'))
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a pipeline stage, counting an exception it raises as an error."""
+        nested: List[float] = []
+        token = _nested.set(nested)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _nested.reset(token)
+            parent = _nested.get()
+            if parent is not None:
+                parent.append(elapsed)
+            self.observe_stage(name, max(0.0, elapsed - sum(nested)), error)
+
+    def observe_stage(self, name: str, seconds: float, error: Optional[BaseException] = None):
+        """Record a stage timed by the caller, e.g. one spread over the items of a stream."""
+        self.stage_seconds.observe(seconds, stage=name, outcome='ok' if error is None else 'error')
+        if error is not None:
+            self.stage_errors.inc(stage=name, error=type(error).__name__)
+
+    def observe_llm_call(self, stage: str, model: str, seconds: float, outcome: str, prompt_tokens: int = 0,
+                         completion_tokens: int = 0, cost: float = 0.0):
+        """Record the latency, token usage and cost of one LLM call."""
+        self.llm_seconds.observe(seconds, stage=stage, model=model, outcome=outcome)
+        if prompt_tokens:
+            self.llm_tokens.inc(prompt_tokens, stage=stage, model=model, type='prompt')
+        if completion_tokens:
+            self.llm_tokens.inc(completion_tokens, stage=stage, model=model, type='completion')
+        if cost:
+            self.llm_cost.inc(cost, stage=stage, model=model)
+
+    def observe_request(self, response: Dict[str, Any], seconds: float):
+        """Record the duration, outcome and attempt count of an answered question."""
+        if 'error' in response:
+            outcome = 'error'
+        else:
+            outcome = 'ok' if response.get('aql_result') else 'empty'
+        self.request_seconds.observe(seconds, outcome=outcome)
+        if 'attempt_count' in response:
+            self.attempts.observe(response['attempt_count'])
+
+
+class MetricsServer:
+    """Serves a registry at /metrics over HTTP from a background thread, for Prometheus to scrape."""
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = '127.0.0.1'):
+        """
+        Initialize the server; call `start` to begin serving.
+
+        Args:
+            registry (MetricsRegistry): The metrics to serve.
+            port (int): The port to listen on; 0 picks a free port.
+            host (str): The address to listen on.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.registry = registry
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        """The port the server listens on."""
+        return self.server.server_address[1]
+
+    def start(self) -> "MetricsServer":
+        """Start serving in a daemon thread."""
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+        self.logger.info(f"Serving metrics at http://{self.server.server_address[0]}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any):
+        # Scrapes every few seconds would flood the application log
+        pass
@@ -0,0 +1,242 @@
+# omics_oracle/model_router.py
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_community.callbacks import get_openai_callback
+
+from .metrics import QueryMetrics, nested_stages
+
+# Models tried in order for each pipeline stage; the last one is the fallback of record
+DEFAULT_CASCADES = {
+    'aql_generation': ['gpt-4o-mini', 'gpt-4o'],
+    'interpretation': ['gpt-4o'],
+}
+
+# USD per million (prompt, completion) tokens, used to report what each stage spent and saved
+MODEL_PRICING = {
+    'gpt-4o': (5.00, 15.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4-turbo': (10.00, 30.00),
+    'gpt-3.5-turbo': (0.50, 1.50),
+}
+
+
+def model_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Price a model call from its token usage.
+
+    Args:
+        model (str): The model name.
+        prompt_tokens (int): Tokens sent to the model.
+        completion_tokens (int): Tokens generated by the model.
+
+    Returns:
+        float: The cost in USD, or 0.0 for models missing from MODEL_PRICING.
+    """
+    prompt_price, completion_price = MODEL_PRICING.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+@dataclass
+class RoutingDecision:
+    """One model call made while routing a pipeline stage."""
+    stage: str
+    model: str
+    attempt: int
+    outcome: str
+    latency: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    reason: Optional[str] = None
+
+
+class ModelRouter:
+    """
+    Picks the model for each pipeline stage and escalates through a cascade.
+
+    A stage is run with its cheapest model first. When the caller rejects the result
+    (it raised, failed validation, or came back empty) the next model in the cascade is
+    tried, up to the last one. Every call is recorded as a RoutingDecision so the latency
+    and cost saved by resolving stages on the cheap model can be reported. The latency
+    recorded leaves out the stages QueryMetrics times inside the call, such as running the
+    generated AQL, so it covers the model calls.
+    """
+
+    def __init__(self, cascades: Dict[str, List[str]] = None, history_size: int = 1000,
+                 metrics: QueryMetrics = None):
+        """
+        Initialize the router.
+
+        Args:
+            cascades (Dict[str, List[str]], optional): Models to try per stage, cheapest first.
+                Stages missing here fall back to DEFAULT_CASCADES.
+            history_size (int): Number of routing decisions kept for reporting.
+            metrics (QueryMetrics, optional): Also records the latency, tokens and cost of every call.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.cascades = dict(DEFAULT_CASCADES)
+        self.cascades.update(cascades or {})
+        self.decisions: "deque[RoutingDecision]" = deque(maxlen=history_size)
+        self.metrics = metrics
+        self._lock = threading.Lock()
+
+    def models(self, stage: str) -> List[str]:
+        """
+        Return the cascade for a stage.
+
+        Raises:
+            KeyError: If the stage has no cascade configured.
+        """
+        models = self.cascades[stage]
+        if not models:
+            raise KeyError(f"No models configured for stage {stage}")
+        return models
+
+    def primary_model(self, stage: str) -> str:
+        """Return the model a stage ends up on when every cheaper model is rejected."""
+        return self.models(stage)[-1]
+
+    def run(self, stage: str, call: Callable[[str], Any],
+            check: Callable[[Any], Optional[str]] = None) -> Any:
+        """
+        Run a stage through its cascade.
+
+        Args:
+            stage (str): The pipeline stage, a key of `cascades`.
+            call (Callable[[str], Any]): Runs the stage with the given model name.
+            check (Callable[[Any], Optional[str]], optional): Returns a reason to escalate
+                (e.g. "empty") for an unacceptable result, or None to accept it.
+
+        Returns:
+            Any: The first accepted result, or the last model's result if none was accepted.
+
+        Raises:
+            Exception: Whatever the last model in the cascade raised.
+        """
+        models = self.models(stage)
+        for attempt, model in enumerate(models, start=1):
+            final = attempt == len(models)
+            start = time.perf_counter()
+            with get_openai_callback() as usage, nested_stages() as nested:
+                try:
+                    result = call(model)
+                except Exception as e:
+                    self._record(stage, model, attempt, 'error', start, nested, usage, str(e))
+                    if final:
+                        raise
+                    self.logger.warning(f"Stage {stage} failed on {model}, escalating: {e}")
+                    continue
+            reason = check(result) if check is not None else None
+            self._record(stage, model, attempt, 'rejected' if reason else 'accepted', start, nested, usage,
+                         reason)
+            if reason is None or final:
+                return result
+            self.logger.info(f"Stage {stage} rejected result from {model} ({reason}), escalating")
+
+    async def arun(self, stage: str, call: Callable[[str], Awaitable[Any]],
+                   check: Callable[[Any], Optional[str]] = None) -> Any:
+        """
+        Run a stage through its cascade without blocking the event loop (see `run`).
+
+        Args:
+            stage (str): The pipeline stage, a key of `cascades`.
+            call (Callable[[str], Awaitable[Any]]): Runs the stage with the given model name.
+            check (Callable[[Any], Optional[str]], optional): Returns a reason to escalate, or None.
+
+        Returns:
+            Any: The first accepted result, or the last model's result if none was accepted.
+
+        Raises:
+            Exception: Whatever the last model in the cascade raised.
+        """
+        models = self.models(stage)
+        for attempt, model in enumerate(models, start=1):
+            final = attempt == len(models)
+            start = time.perf_counter()
+            with get_openai_callback() as usage, nested_stages() as nested:
+                try:
+                    result = await call(model)
+                except Exception as e:
+                    self._record(stage, model, attempt, 'error', start, nested, usage, str(e))
+                    if final:
+                        raise
+                    self.logger.warning(f"Stage {stage} failed on {model}, escalating: {e}")
+                    continue
+            reason = check(result) if check is not None else None
+            self._record(stage, model, attempt, 'rejected' if reason else 'accepted', start, nested, usage,
+                         reason)
+            if reason is None or final:
+                return result
+            self.logger.info(f"Stage {stage} rejected result from {model} ({reason}), escalating")
+
+    def _record(self, stage: str, model: str, attempt: int, outcome: str, start: float, nested: List[float],
+                usage: Any, reason: Optional[str]):
+        decision = RoutingDecision(
+            stage=stage,
+            model=model,
+            attempt=attempt,
+            outcome=outcome,
+            latency=max(0.0, time.perf_counter() - start - sum(nested)),
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cost=model_cost(model, usage.prompt_tokens, usage.completion_tokens),
+            reason=reason,
+        )
+        with self._lock:
+            self.decisions.append(decision)
+        if self.metrics is not None:
+            self.metrics.observe_llm_call(stage, model, decision.latency, outcome, decision.prompt_tokens,
+                                          decision.completion_tokens, decision.cost)
+        self.logger.debug(f"Routing decision: {asdict(decision)}")
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Summarize the recorded decisions per stage.
+
+        Savings are estimated against sending every request straight to the stage's primary
+        model: its cost is the same token usage at the primary model's price, and its latency
+        is the mean latency observed for the primary model.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per stage, the number of requests, how many were resolved
+            without escalating, the cost and latency spent, and the estimated savings.
+        """
+        with self._lock:
+            decisions = list(self.decisions)
+
+        report = {}
+        for stage in dict.fromkeys(d.stage for d in decisions):
+            stage_decisions = [d for d in decisions if d.stage == stage]
+            primary = self.primary_model(stage)
+            primary_latencies = [d.latency for d in stage_decisions if d.model == primary]
+            primary_latency = sum(primary_latencies) / len(primary_latencies) if primary_latencies else None
+
+            requests = sum(1 for d in stage_decisions if d.attempt == 1)
+            resolved_early = [d for d in stage_decisions if d.outcome == 'accepted' and d.model != primary]
+            cost_saved = sum(model_cost(primary, d.prompt_tokens, d.completion_tokens) - d.cost
+                             for d in resolved_early)
+            # Escalated requests paid for the cheaper attempts on top of the primary model
+            cost_saved -= sum(d.cost for d in stage_decisions if d.model != primary and d.outcome != 'accepted')
+            latency_saved = None
+            if primary_latency is not None:
+                latency_saved = sum(primary_latency - d.latency for d in resolved_early)
+                latency_saved -= sum(d.latency for d in stage_decisions
+                                     if d.model != primary and d.outcome != 'accepted')
+
+            report[stage] = {
+                'requests': requests,
+                'resolved_without_escalation': sum(1 for d in stage_decisions
+                                                   if d.attempt == 1 and d.outcome == 'accepted'),
+                'escalations': sum(1 for d in stage_decisions if d.attempt > 1),
+                'cost': sum(d.cost for d in stage_decisions),
+                'latency': sum(d.latency for d in stage_decisions),
+                'cost_saved': cost_saved,
+                'latency_saved': latency_saved,
+            }
+        return report
@@ -1,17 +1,33 @@
 import os
+import asyncio
 import logging
 import traceback
+from typing import Iterator, List
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from omics_oracle.prompts import base_prompt as default_base_prompt
+from omics_oracle.concurrency import close_on_loop, gather_bounded, run_sync
+from omics_oracle.llm_cache import LLMCache
+from omics_oracle.context_packer import count_tokens
+from omics_oracle.rate_limiter import RateLimiter
+from omics_oracle.logger import DEBUG_PREVIEW_LENGTH, capped_repr
 
 class OpenAIWrapper:
-    def __init__(self, base_prompt=default_base_prompt):
+    def __init__(self, base_prompt=default_base_prompt, cache: LLMCache = None, rate_limiter: RateLimiter = None,
+                 model: str = "gpt-4o"):
         self.logger = logging.getLogger(__name__)
         self._load_environment()
-        self.client = OpenAI(api_key=self.api_key)
-        self.model = "gpt-4o"
+        self.rate_limiter = rate_limiter
+        if rate_limiter is None:
+            self.client = OpenAI(api_key=self.api_key)
+        else:
+            # The limiter owns retries so that 429s back off across every client sharing it
+            self.client = OpenAI(api_key=self.api_key, max_retries=0)
+        self.model = model
         self.base_prompt = base_prompt
+        self.cache = cache
+        self._async_client = None
+        self._async_loop = None
         self.logger.info("OpenAIWrapper initialized successfully")
 
     def _load_environment(self):
@@ -38,30 +54,172 @@ class OpenAIWrapper:
             self.logger.error(f"Error loading environment: {e}\n\n{traceback.format_exc()}")
             raise
 
+    def _get_async_client(self) -> AsyncOpenAI:
+        """Return the async client for the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            if self._async_client is not None and not close_on_loop(self._async_client.close, self._async_loop):
+                self.logger.debug("Dropping async OpenAI client of an event loop that is no longer running")
+            if self.rate_limiter is None:
+                self._async_client = AsyncOpenAI(api_key=self.api_key)
+            else:
+                self._async_client = AsyncOpenAI(api_key=self.api_key, max_retries=0)
+            self._async_loop = loop
+        return self._async_client
+
+    async def aclose(self):
+        """Close the async client, if one was created."""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+            self._async_loop = None
+
+    def _build_messages(self, query: str) -> list:
+        """Build the chat messages sent for a query."""
+        return [
+            {"role": "system", "content": self.base_prompt},
+            {"role": "user", "content": query}
+        ]
+
+    def _cache_lookup(self, messages: list) -> str:
+        """Return a cached completion for these messages, if the cache has one."""
+        if self.cache is None:
+            return None
+        cached = self.cache.get(LLMCache.make_key(self.model, messages))
+        if cached is not None:
+            self.logger.debug("OpenAI response served from cache")
+        return cached
+
+    def _cache_store(self, messages: list, content: str):
+        """Store a completion in the cache, if one is configured."""
+        if self.cache is not None:
+            self.cache.set(LLMCache.make_key(self.model, messages), content)
+
+    def _create_completion(self, **kwargs):
+        """Create a chat completion, within the rate limits when a limiter is configured."""
+        if self.rate_limiter is None:
+            return self.client.chat.completions.create(**kwargs)
+        return self.rate_limiter.call(self.client.chat.completions.create,
+                                      tokens=self._estimate_tokens(kwargs["messages"]), **kwargs)
+
+    async def _acreate_completion(self, **kwargs):
+        """Asynchronously create a chat completion, within the rate limits when a limiter is configured."""
+        client = self._get_async_client()
+        if self.rate_limiter is None:
+            return await client.chat.completions.create(**kwargs)
+        return await self.rate_limiter.acall(client.chat.completions.create,
+                                             tokens=self._estimate_tokens(kwargs["messages"]), **kwargs)
+
+    def _estimate_tokens(self, messages: list) -> int:
+        """Estimate the prompt tokens a request spends against the tokens-per-minute budget."""
+        return sum(count_tokens(message["content"], self.model) for message in messages)
+
     def send_query(self, query: str) -> str:
         """Send a query to the OpenAI API and return the response."""
-        self.logger.debug(f"Sending query to OpenAI: {query}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Sending query to OpenAI: {capped_repr(query, DEBUG_PREVIEW_LENGTH)}")
+        messages = self._build_messages(query)
+        cached = self._cache_lookup(messages)
+        if cached is not None:
+            return cached
         try:
-            response = self.client.chat.completions.create(
+            response = self._create_completion(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": self.base_prompt},
-                    {"role": "user", "content": query}
-                ]
+                messages=messages
             )
-            self.logger.debug(f"OpenAI response received: {response.choices[0].message.content}")
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"OpenAI response received: {capped_repr(content, DEBUG_PREVIEW_LENGTH)}")
+            self._cache_store(messages, content)
+            return content
         except Exception as e:
             self.logger.error(f"Error in OpenAI API call: {e}\n\n{traceback.format_exc()}")
             return None
 
+    def stream_query(self, query: str) -> Iterator[str]:
+        """Send a query to the OpenAI API and yield the response text as it arrives.
+
+        Errors are logged and re-raised, even after some text was yielded, so a
+        stream cut short is never mistaken for a complete answer.
+        """
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Streaming query to OpenAI: {capped_repr(query, DEBUG_PREVIEW_LENGTH)}")
+        messages = self._build_messages(query)
+        cached = self._cache_lookup(messages)
+        if cached is not None:
+            yield cached
+            return
+        try:
+            stream = self._create_completion(
+                model=self.model,
+                messages=messages,
+                stream=True
+            )
+            parts = []
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            self.logger.debug(f"OpenAI stream completed with {len(parts)} chunks")
+            self._cache_store(messages, "".join(parts))
+        except Exception as e:
+            self.logger.error(f"Error in OpenAI streaming API call: {e}\n\n{traceback.format_exc()}")
+            raise
+
     def generate_aql(self, query: str) -> str:
         """Generate an AQL query based on the natural language query."""
-        self.logger.debug(f"Generating AQL for query: {query}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Generating AQL for query: {capped_repr(query, DEBUG_PREVIEW_LENGTH)}")
         try:
             aql = self.send_query(query)
-            self.logger.debug(f"Generated AQL: {aql}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Generated AQL: {capped_repr(aql, DEBUG_PREVIEW_LENGTH)}")
             return aql
         except Exception as e:
             self.logger.error(f"Error generating AQL: {e}\n\n{traceback.format_exc()}")
-            return None
\ No newline at end of file
+            return None
+
+    async def asend_query(self, query: str) -> str:
+        """Asynchronously send a query to the OpenAI API and return the response."""
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Sending async query to OpenAI: {capped_repr(query, DEBUG_PREVIEW_LENGTH)}")
+        messages = self._build_messages(query)
+        cached = self._cache_lookup(messages)
+        if cached is not None:
+            return cached
+        try:
+            response = await self._acreate_completion(
+                model=self.model,
+                messages=messages
+            )
+            content = response.choices[0].message.content
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"OpenAI async response received: {capped_repr(content, DEBUG_PREVIEW_LENGTH)}")
+            self._cache_store(messages, content)
+            return content
+        except Exception as e:
+            self.logger.error(f"Error in async OpenAI API call: {e}\n\n{traceback.format_exc()}")
+            return None
+
+    async def agenerate_aql(self, query: str) -> str:
+        """Asynchronously generate an AQL query based on the natural language query."""
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Generating AQL asynchronously for query: {capped_repr(query, DEBUG_PREVIEW_LENGTH)}")
+        aql = await self.asend_query(query)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Generated AQL: {capped_repr(aql, DEBUG_PREVIEW_LENGTH)}")
+        return aql
+
+    async def asend_queries(self, queries: List[str], max_concurrency: int = 8) -> List[str]:
+        """Send many queries concurrently with at most `max_concurrency` in flight, keeping their order."""
+        return await gather_bounded([lambda q=q: self.asend_query(q) for q in queries], max_concurrency)
+
+    def send_queries(self, queries: List[str], max_concurrency: int = 8) -> List[str]:
+        """Synchronous entry point for `asend_queries`."""
+        async def run():
+            try:
+                return await self.asend_queries(queries, max_concurrency=max_concurrency)
+            finally:
+                await self.aclose()
+
+        return run_sync(run())
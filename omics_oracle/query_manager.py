@@ -1,27 +1,124 @@
 # omics_oracle/query_manager.py
 
+import asyncio
+import contextvars
 import json
-import io
+import logging
 import re
+import time
 import traceback
-from contextlib import redirect_stdout
-from typing import Dict, List, Any
-from arango import ArangoClient
-from langchain_community.graphs import ArangoGraph
+import uuid
+from dataclasses import asdict, dataclass, field
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from typing import AsyncIterator, Dict, Iterator, List, Any, Optional
+from arango import AQLQueryExecuteError
+from langchain_community.callbacks import get_openai_callback
 from langchain_openai import ChatOpenAI
 from langchain.chains import ArangoGraphQAChain
-from .logger import setup_logger
+from .logger import capped_repr, setup_logger
 from .spoke_wrapper import SpokeWrapper
+from .arango_session import PooledArangoGraph
+from .aql_guard import AQLGuard, GuardDecision, record_decisions
+from .aql_memory import AQLMemory, MemoryMatch
+from .schema_cache import SchemaCache
+from .query_profiler import question_context
 from .prompts import base_prompt
 from .openai_wrapper import OpenAIWrapper
+from .llm_cache import LLMCache, LangChainLLMCache
+from .rate_limiter import LangChainRateLimiter, RateLimiter
+from .context_packer import ContextPacker, ResultChunks
+from .model_router import ModelRouter, model_cost
+from .metrics import QueryMetrics
+
+# Same extraction ArangoGraphQAChain applies to a generated answer
+AQL_BLOCK_PATTERN = re.compile(r"```(?i:aql)?(.*?)```", re.DOTALL)
+SPECULATIVE_TEMPERATURE = 0.7
+MAX_ATTEMPTS = 3
+FAILURE_MESSAGE = ("The prior AQL query failed to return results. "
+                   "Please think this through step by step and refine your AQL statement. "
+                   "The original question is as follows:")
+INTERPRETATION_INSTRUCTIONS = ("provide a detailed and comprehensive scientific story "
+                               "that explains the associations between the genes and pathways")
 
 def truncate(text: str, max_length: int = 100) -> str:
     return text[:max_length] + "..." if len(text) > max_length else text
 
+@dataclass
+class AQLExecution:
+    """The outcome of generating and running AQL for one question."""
+    aql_query: Optional[str] = None
+    aql_result: List[Any] = field(default_factory=list)
+    guard_decisions: List[GuardDecision] = field(default_factory=list)
+    error: Optional[str] = None
+
+@dataclass
+class QueryContext:
+    """The state of one question in the async pipeline, owned by the task processing it."""
+    question: str
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    started: float = field(default_factory=time.monotonic)
+    attempt_count: int = 0
+    aql_query: Optional[str] = None
+    aql_result: List[Any] = field(default_factory=list)
+    guard_decisions: List[GuardDecision] = field(default_factory=list)
+
+    def elapsed(self) -> float:
+        """Seconds since the question was received."""
+        return time.monotonic() - self.started
+
+    def response(self, interpretation: Optional[str] = None) -> Dict[str, Any]:
+        """Build the response `process_query` would return for this question."""
+        result = {
+            "original_query": self.question,
+            "aql_result": self.aql_result,
+            "interpretation": interpretation or "No interpretation available.",
+            "attempt_count": self.attempt_count
+        }
+        if self.aql_query is not None:
+            result["aql_query"] = self.aql_query
+        if self.guard_decisions:
+            result["aql_guard"] = [asdict(d) for d in self.guard_decisions]
+        return result
+
 class QueryManager:
-    def __init__(self, spoke_wrapper: SpokeWrapper, openai_wrapper: OpenAIWrapper):
+    def __init__(self, spoke_wrapper: SpokeWrapper, openai_wrapper: OpenAIWrapper, llm_cache: LLMCache = None,
+                 context_packer: ContextPacker = None, model_router: ModelRouter = None,
+                 speculative_candidates: int = 1, speculative_time_budget: float = 60.0,
+                 schema_cache: SchemaCache = None, aql_guard: AQLGuard = None, max_concurrent_queries: int = 8,
+                 metrics: QueryMetrics = None, aql_memory: AQLMemory = None, aql_top_k: int = 10,
+                 interpretation_chunk_tokens: Optional[int] = None, interpretation_max_concurrency: int = 4,
+                 interpretation_token_budget: int = 24000, rate_limiter: RateLimiter = None):
         self.spoke = spoke_wrapper
         self.openai_wrapper = openai_wrapper
+        self.llm_cache = llm_cache
+        # Requests-per-second and tokens-per-minute limits for every chat model built here
+        self.rate_limiter = rate_limiter
+        self.router = model_router or ModelRouter()
+        # Per-stage latency, attempts, result rows, token usage and errors
+        self.metrics = metrics or QueryMetrics()
+        if self.router.metrics is None:
+            self.router.metrics = self.metrics
+        # With more than one candidate, AQL is generated speculatively instead of retried in sequence
+        self.speculative_candidates = speculative_candidates
+        self.speculative_time_budget = speculative_time_budget
+        self._speculative_llm = None
+        self.context_packer = context_packer or ContextPacker(model=self.router.primary_model('interpretation'))
+        # Results larger than the packer's budget are summarized in parts of this many tokens
+        # (map) and the summaries merged into the story (reduce); None packs them into one prompt
+        self.interpretation_chunk_tokens = interpretation_chunk_tokens
+        self.interpretation_max_concurrency = interpretation_max_concurrency
+        self.interpretation_token_budget = interpretation_token_budget
+        # LLM-generated AQL is reviewed with EXPLAIN and runs with runtime and memory limits
+        self.aql_guard = aql_guard or AQLGuard()
+        # AQL that answered earlier questions, reused for repeats and given as examples for similar ones
+        self.aql_memory = aql_memory
+        # Rows kept from each generated query; results only reach the map-reduce interpretation
+        # above this many rows
+        self.aql_top_k = aql_top_k
+        # Questions processed at once by the async pipeline, per event loop
+        self.max_concurrent_queries = max_concurrent_queries
+        self._query_slots = None
+        self._query_slots_loop = None
         
         # Initialize the logger
         self.logger = setup_logger(__name__)
@@ -30,149 +127,524 @@ class QueryManager:
         self.logger.info("QueryManager initialized successfully")
         
         # Initialize ChatOpenAI
+        self._llms = {}
         try:
-            self.llm = ChatOpenAI(temperature=0, model='gpt-4o', openai_api_key=self.openai_wrapper.api_key)
+            self.llm = self._llm_for(self.router.primary_model('interpretation'))
             self.logger.info("ChatOpenAI initialization successful!")
         except Exception as e:
             self.logger.error(f"ChatOpenAI initialization failed: {e}\n\n{truncate(traceback.format_exc())}")
             raise
 
-        # Initialize the ArangoDB client and connect to the database
-        try:
-            self.client = ArangoClient(hosts='http://127.0.0.1:8529')
-            self.db = self.client.db('spoke23_human', username='root', password='ph')
-            self.logger.info("ArangoDB connection successful!")
-        except Exception as e:
-            self.logger.error(f"ArangoDB connection failed: {e}\n\n{truncate(traceback.format_exc())}")
-            raise
+        # Share the SpokeWrapper's ArangoDB session instead of opening a second client
+        self.session = self.spoke.session
 
         # Fetch the existing graph from the database
         try:
-            self.graph = ArangoGraph(self.db)
+            self.graph = PooledArangoGraph(self.session, result_cache=getattr(self.spoke, 'result_cache', None),
+                                           schema_cache=schema_cache, guard=self.aql_guard,
+                                           profiler=getattr(self.spoke, 'profiler', None), metrics=self.metrics)
             self.logger.info("ArangoGraph initialization successful!")
         except Exception as e:
             self.logger.error(f"ArangoGraph initialization failed: {e}\n\n{truncate(traceback.format_exc())}")
             raise
 
-        # Instantiate ArangoGraphQAChain
+        # Instantiate one ArangoGraphQAChain per model in the AQL generation cascade
         try:
-            self.qa_chain = ArangoGraphQAChain.from_llm(
-                self.llm, 
-                graph=self.graph, 
-                verbose=True, 
-                return_aql_query=True, 
-                return_aql_result=True
-            )
+            aql_models = self.router.models('aql_generation')
+            self.qa_chains = {}
+            for model in aql_models:
+                # Cheaper models get a single attempt; fixing their AQL is left to the next model
+                attempts = {} if model == aql_models[-1] else {'max_aql_generation_attempts': 1}
+                self.qa_chains[model] = ArangoGraphQAChain.from_llm(
+                    self._llm_for(model),
+                    graph=self.graph,
+                    return_aql_query=True,
+                    return_aql_result=True,
+                    top_k=self.aql_top_k,
+                    **attempts
+                )
+            self.qa_chain = self.qa_chains[aql_models[-1]]
             self.logger.info("ArangoGraphQAChain initialization successful!")
         except Exception as e:
             self.logger.error(f"ArangoGraphQAChain initialization failed: {e}\n\n{truncate(traceback.format_exc())}")
             raise
 
-    def capture_stdout(self, func, *args, **kwargs) -> str:
-        f = io.StringIO()
-        with redirect_stdout(f):
-            func(*args, **kwargs)
-        captured_output = f.getvalue()
-        return captured_output
+    def _llm_for(self, model: str) -> ChatOpenAI:
+        """Return the chat model for a model name, creating it on first use."""
+        if model not in self._llms:
+            self._llms[model] = ChatOpenAI(
+                temperature=0,
+                model=model,
+                openai_api_key=self.openai_wrapper.api_key,
+                cache=LangChainLLMCache(self.llm_cache) if self.llm_cache is not None else None,
+                callbacks=self._rate_limit_callbacks(model)
+            )
+        return self._llms[model]
+
+    def _rate_limit_callbacks(self, model: str) -> Optional[list]:
+        """Return the callbacks that hold a chat model to the rate limiter, if one is configured."""
+        if self.rate_limiter is None:
+            return None
+        return [LangChainRateLimiter(self.rate_limiter, model)]
 
-    def execute_aql(self, query: str) -> Dict[str, str]:
+    def execute_aql(self, query: str) -> AQLExecution:
+        """
+        Generate AQL for a question with the QA chain's prompts and run it.
+
+        The rows are used as they came from the database instead of being parsed back out of
+        the chain's output.
+
+        Returns:
+            AQLExecution: The query, its rows and the guard's decisions, or the error.
+        """
         self.logger.debug(f"Attempting to execute AQL query: {truncate(query)}")
-        try:
-            result = self.qa_chain.invoke({self.qa_chain.input_key: query})
-            captured_output = str(result)
-            self.logger.debug(f"AQL query execution output: {truncate(captured_output)}")
-            return {'captured_output': captured_output}
-        except Exception as e:
-            error_message = f"Error executing AQL query: {e}"
-            self.logger.error(truncate(error_message))
-            return {'error': error_message}
+        with record_decisions() as decisions:
+            try:
+                # The queries the chain runs are timed as their own stage
+                with self.metrics.stage('aql_generation'):
+                    result = self.router.run(
+                        'aql_generation',
+                        lambda model: self._generate_and_run(self.qa_chains[model], query),
+                        check=self._check_aql_result
+                    )
+            except Exception as e:
+                error_message = f"Error executing AQL query: {e}"
+                self.logger.error(truncate(error_message))
+                return AQLExecution(error=error_message, guard_decisions=list(decisions))
+        execution = AQLExecution(aql_query=result['aql_query'], aql_result=result['aql_result'] or [],
+                                 guard_decisions=list(decisions))
+        self.logger.debug(f"AQL query returned {len(execution.aql_result)} rows: {truncate(execution.aql_query)}")
+        return execution
 
-    def clean_output(self, output: str) -> str:
-        ansi_escape = re.compile(r'\x1B[@-_][0-?]*[ -/]*[@-~]')
-        cleaned_output = ansi_escape.sub('', output)
-        return cleaned_output
-
-    def fix_json_format(self, aql_result_line: str) -> str:
-        fixed_json = aql_result_line.replace("'", '"').replace('\\', '\\\\').replace('\n', '\\n')
-        return fixed_json
-
-    def extract_aql_result(self, captured_output: str) -> Dict[str, list]:
-        self.logger.debug("Extracting AQL result from captured output")
-        cleaned_output = self.clean_output(captured_output)
-        lines = cleaned_output.splitlines()
-        aql_result_line = None
-        for i, line in enumerate(lines):
-            if "AQL Result:" in line:
-                if i + 1 < len(lines):
-                    aql_result_line = lines[i + 1].strip()
-                break
+    def _generate_and_run(self, chain: ArangoGraphQAChain, question: str) -> Dict[str, Any]:
+        """
+        Generate, run and fix AQL the way ArangoGraphQAChain does, without its answer step.
+
+        The chain would also have its LLM answer the question from the rows. That answer is not
+        used, since the interpretation is written separately, and with a large `top_k` the rows
+        would not fit in the model's context. It follows the chain's flow in langchain-community
+        0.2.6, as pinned in requirements.txt; a test runs both on a real chain to catch drift.
 
-        if aql_result_line:
+        Raises:
+            ValueError: If the model's response holds no AQL query.
+            AQLQueryExecuteError: If the query still fails after the chain's last fix attempt.
+        """
+        generation = chain.aql_generation_chain
+        output = generation.invoke({
+            "adb_schema": self.graph.schema,
+            "aql_examples": chain.aql_examples,
+            "user_input": question,
+        })[generation.output_key]
+        for attempt in range(1, chain.max_aql_generation_attempts + 1):
+            matches = AQL_BLOCK_PATTERN.findall(output)
+            if not matches:
+                raise ValueError(f"Response is Invalid: {output}")
+            aql_query = matches[0]
             try:
-                fixed_json = self.fix_json_format(aql_result_line)
-                aql_result = json.loads(fixed_json)
-                self.logger.debug(f"Extracted AQL result: {truncate(str(aql_result))}")
-                return {'aql_result': aql_result}
-            except json.JSONDecodeError:
-                self.logger.error(f"Failed to parse AQL result JSON: {truncate(aql_result_line)}")
-        else:
-            self.logger.debug("No AQL result found in captured output")
-        return {'aql_result': []}
+                return {'aql_query': aql_query, 'aql_result': self.graph.query(aql_query, chain.top_k)}
+            except AQLQueryExecuteError as e:
+                if attempt == chain.max_aql_generation_attempts:
+                    raise
+                fix = chain.aql_fix_chain
+                output = fix.invoke({
+                    "adb_schema": self.graph.schema,
+                    "aql_query": aql_query,
+                    "aql_error": e.error_message,
+                })[fix.output_key]
 
-    def interpret_aql_result(self, aql_result: List[Dict[str, Any]]) -> str:
-        self.logger.debug("Interpreting AQL result")
-        prompt = (
-            "Based on the following AQL results, provide a detailed and comprehensive scientific story "
-            "that explains the associations between the genes and pathways:\n\n"
-            f"AQL Results: {truncate(str(aql_result))}\n\n"
+    @staticmethod
+    def _check_aql_result(result: Dict[str, Any]) -> str:
+        """Return why a chain result should be escalated to the next model, or None to accept it."""
+        if not result.get('aql_result'):
+            return "empty result"
+        return None
+
+    def _interpretation_prompt(self, aql_result: List[Dict[str, Any]], question: str = None) -> str:
+        """Build the interpretation prompt, summarizing the parts of a large result first."""
+        chunks = self._result_chunks(aql_result, question)
+        if chunks is None:
+            return self._single_pass_prompt(aql_result, question)
+        outputs = self.llm.batch([self._map_prompt(chunk, i, len(chunks), question) for i, chunk in enumerate(chunks)],
+                                 config={'max_concurrency': self.interpretation_max_concurrency},
+                                 return_exceptions=True)
+        return self._reduce_prompt(outputs, question, chunks)
+
+    async def _ainterpretation_prompt(self, aql_result: List[Dict[str, Any]], question: str = None) -> str:
+        """Build the interpretation prompt like `_interpretation_prompt`, without blocking the event loop."""
+        chunks = self._result_chunks(aql_result, question)
+        if chunks is None:
+            return self._single_pass_prompt(aql_result, question)
+        outputs = await self.llm.abatch(
+            [self._map_prompt(chunk, i, len(chunks), question) for i, chunk in enumerate(chunks)],
+            config={'max_concurrency': self.interpretation_max_concurrency},
+            return_exceptions=True
+        )
+        return self._reduce_prompt(outputs, question, chunks)
+
+    def _single_pass_prompt(self, aql_result: List[Dict[str, Any]], question: str = None) -> str:
+        return (
+            f"Based on the following AQL results, {INTERPRETATION_INSTRUCTIONS}:\n\n"
+            f"AQL Results:\n{self.context_packer.pack(aql_result, query=question)}\n\n"
         )
+
+    def _result_chunks(self, aql_result: List[Dict[str, Any]], question: str = None) -> Optional[ResultChunks]:
+        """
+        Split a result too large for one prompt into parts for map-reduce interpretation.
+
+        Returns:
+            Optional[ResultChunks]: The parts, or None if map-reduce is disabled or the result
+            fits within the packer's budget.
+        """
+        if not self.interpretation_chunk_tokens:
+            return None
+        # Four characters per token is enough to tell results that fit apart, without tokenizing them twice
+        if len(json.dumps(aql_result, default=str)) // 4 <= self.context_packer.max_tokens:
+            return None
+        max_chunks = max(1, self.interpretation_token_budget // self.interpretation_chunk_tokens)
+        chunks = self.context_packer.chunk(aql_result, query=question, chunk_tokens=self.interpretation_chunk_tokens,
+                                           max_chunks=max_chunks)
+        if len(chunks) < 2:
+            return None
+        self.logger.debug(f"Interpreting {len(aql_result)} rows in {len(chunks)} parts")
+        if chunks.omitted:
+            self.logger.warning(f"{chunks.omitted} of {chunks.total} distinct result rows left out of the "
+                                f"interpretation to fit its budget of {self.interpretation_token_budget} tokens")
+        return chunks
+
+    @staticmethod
+    def _map_prompt(chunk: str, index: int, total: int, question: str = None) -> str:
+        focus = f" that bear on the question: {question}" if question else ""
+        return (
+            f"The following is part {index + 1} of {total} of the results of an AQL query. Summarize the genes, "
+            f"pathways, diseases and associations in it{focus}. Keep identifiers and scores that matter, "
+            "use at most 200 words, and do not speculate beyond the data:\n\n"
+            f"AQL Results:\n{chunk}\n\n"
+        )
+
+    def _reduce_prompt(self, outputs: List[Any], question: str = None, chunks: ResultChunks = None) -> str:
+        """
+        Combine the part summaries into the final interpretation prompt.
+
+        When rows were left out of the parts, the prompt says so, so that the story does not
+        present a partial result as the whole one.
+
+        Raises:
+            Exception: The first error, if no part could be summarized.
+        """
+        summaries = [output.content for output in outputs if not isinstance(output, Exception)]
+        errors = [output for output in outputs if isinstance(output, Exception)]
+        if not summaries:
+            raise errors[0]
+        if errors:
+            self.logger.warning(f"{len(errors)} of {len(outputs)} result parts could not be summarized: {errors[0]}")
+        parts = "\n\n".join(f"Part {i + 1}:\n{summary}" for i, summary in enumerate(summaries))
+        focus = f"The question was: {question}\n\n" if question else ""
+        omitted = ""
+        if chunks is not None and chunks.omitted:
+            omitted = (f"{chunks.omitted} of the {chunks.total} distinct rows, the least relevant ones, did not fit "
+                       "and were left out; say that the interpretation covers only part of the results. ")
+        return (
+            f"{focus}The AQL results were too large to read at once, so each part was summarized. {omitted}"
+            f"Based on the following summaries of the AQL results, {INTERPRETATION_INSTRUCTIONS}:\n\n"
+            f"Summaries:\n{parts}\n\n"
+        )
+
+    def interpret_aql_result(self, aql_result: List[Dict[str, Any]], question: str = None) -> str:
+        self.logger.debug("Interpreting AQL result")
+        start = time.perf_counter()
+        with get_openai_callback() as usage:
+            try:
+                response = self.llm.invoke(self._interpretation_prompt(aql_result, question))
+            except Exception as e:
+                self._observe_interpretation(start, usage, e)
+                error_message = f"Error interpreting AQL result: {e}"
+                self.logger.error(truncate(error_message))
+                return "Error interpreting results."
+        self._observe_interpretation(start, usage)
+        interpretation = response.content
+        self.logger.debug(f"LLM interpretation: {truncate(interpretation)}")
+        return interpretation
+
+    def _observe_interpretation(self, start: float, usage: Any = None, error: Exception = None):
+        elapsed = time.perf_counter() - start
+        self.metrics.observe_stage('interpretation', elapsed, error)
+        model = self.router.primary_model('interpretation')
+        prompt_tokens = getattr(usage, 'prompt_tokens', 0)
+        completion_tokens = getattr(usage, 'completion_tokens', 0)
+        self.metrics.observe_llm_call('interpretation', model, elapsed, 'error' if error else 'accepted',
+                                      prompt_tokens, completion_tokens,
+                                      model_cost(model, prompt_tokens, completion_tokens))
+
+    def stream_interpretation(self, aql_result: List[Dict[str, Any]], question: str = None) -> Iterator[str]:
+        self.logger.debug("Streaming interpretation of AQL result")
+        # Includes the time the consumer spends between chunks
+        start = time.perf_counter()
         try:
-            response = self.llm.invoke(prompt)
-            interpretation = response.content
-            self.logger.debug(f"LLM interpretation: {truncate(interpretation)}")
-            return interpretation
+            for chunk in self.llm.stream(self._interpretation_prompt(aql_result, question)):
+                if chunk.content:
+                    yield chunk.content
         except Exception as e:
+            self._observe_interpretation(start, error=e)
             error_message = f"Error interpreting AQL result: {e}"
             self.logger.error(truncate(error_message))
-            return "Error interpreting results."
+            yield "Error interpreting results."
+            return
+        self._observe_interpretation(start)
 
-    def sequential_chain(self, query: str) -> Dict[str, Any]:
+    def sequential_chain(self, query: str, interpret: bool = True, question: str = None) -> Dict[str, Any]:
         self.logger.debug(f"Starting sequential chain for query: {truncate(query)}")
-        response = self.execute_aql(query)
-        if 'error' in response:
-            self.logger.error(f"Error in sequential chain: {truncate(response['error'])}")
-            return {'error': response['error']}
-        
-        captured_output = response['captured_output']
-        final_response = self.extract_aql_result(captured_output)
-        
+        execution = self.execute_aql(query)
+        if execution.error is not None:
+            self.logger.error(f"Error in sequential chain: {truncate(execution.error)}")
+            return {'error': execution.error}
+
+        final_response = {'aql_result': execution.aql_result}
+        if execution.aql_query is not None:
+            final_response['aql_query'] = execution.aql_query
+        if execution.guard_decisions:
+            final_response['aql_guard'] = [asdict(d) for d in execution.guard_decisions]
+
         aql_result = final_response.get('aql_result', [])
-        if aql_result:
-            self.logger.debug(f"Attempt - AQL Result: {truncate(str(aql_result))}")
-            scientific_story = self.interpret_aql_result(aql_result)
+        if aql_result and interpret:
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Attempt - AQL Result: {capped_repr(aql_result)}")
+            scientific_story = self.interpret_aql_result(aql_result, question or query)
             self.logger.debug(f"LLM Interpretation: {truncate(scientific_story)}")
             final_response['scientific_story'] = scientific_story
-        else:
+        elif not aql_result:
             self.logger.debug("Attempt - No AQL result found.")
 
-        self.logger.debug(f"Sequential chain completed. Final response: {truncate(str(final_response))}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Sequential chain completed. Final response: {capped_repr(final_response)}")
+        return final_response
+
+    def generate_aql_candidates(self, query: str, k: int) -> List[str]:
+        """
+        Sample up to `k` distinct AQL queries for a question with a single completion request.
+
+        Args:
+            query (str): The question, including the base prompt.
+            k (int): The number of completions to request.
+
+        Returns:
+            List[str]: The distinct AQL queries found in the completions, in completion order.
+        """
+        if self._speculative_llm is None or self._speculative_llm.n != k:
+            self._speculative_llm = ChatOpenAI(
+                temperature=SPECULATIVE_TEMPERATURE,
+                n=k,
+                model=self.router.primary_model('aql_generation'),
+                openai_api_key=self.openai_wrapper.api_key,
+                callbacks=self._rate_limit_callbacks(self.router.primary_model('aql_generation'))
+            )
+        prompt = self.qa_chain.aql_generation_chain.prompt.format_prompt(
+            adb_schema=self.graph.schema,
+            aql_examples=self.qa_chain.aql_examples,
+            user_input=query
+        )
+        generations = self._speculative_llm.generate_prompt([prompt]).generations[0]
+
+        candidates = {}
+        for generation in generations:
+            matches = AQL_BLOCK_PATTERN.findall(generation.text)
+            if matches and matches[0].strip():
+                candidates.setdefault(" ".join(matches[0].split()), matches[0].strip())
+        self.logger.debug(f"Generated {len(candidates)} distinct AQL candidates from {len(generations)} completions")
+        return list(candidates.values())
+
+    def _run_candidate(self, aql_query: str, deadline: float) -> List[Dict[str, Any]]:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return []
+        # max_runtime makes the server abort candidates that are still running when the budget ends
+        return self.graph.query(aql_query, self.qa_chain.top_k, max_runtime=remaining)
+
+    def speculative_chain(self, query: str, interpret: bool = True, question: str = None) -> Dict[str, Any]:
+        """
+        Run several AQL candidates concurrently and keep the first one that returns rows.
+
+        Candidates still queued when a winner is found are cancelled; queries already running
+        are abandoned and stopped by the server once the time budget runs out.
+        """
+        self.logger.debug(f"Starting speculative chain for query: {truncate(query)}")
+        deadline = time.monotonic() + self.speculative_time_budget
+        try:
+            with self.metrics.stage('aql_generation'):
+                candidates = self.generate_aql_candidates(query, self.speculative_candidates)
+        except Exception as e:
+            error_message = f"Error generating AQL candidates: {e}"
+            self.logger.error(truncate(error_message))
+            return {'error': error_message}
+
+        final_response = {'aql_result': [], 'candidate_count': len(candidates)}
+        if not candidates:
+            self.logger.warning("No AQL candidates could be extracted from the completions")
+            return final_response
+
+        executor = ThreadPoolExecutor(max_workers=len(candidates))
+        with record_decisions() as decisions:
+            # Each candidate runs in a copy of this context, so the guard's decisions are collected here
+            futures = {executor.submit(contextvars.copy_context().run, self._run_candidate, aql_query, deadline): aql_query
+                       for aql_query in candidates}
+        try:
+            for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+                try:
+                    aql_result = future.result()
+                except Exception as e:
+                    self.logger.debug(f"AQL candidate failed: {truncate(str(e))}")
+                    continue
+                if aql_result:
+                    final_response['aql_query'] = futures[future]
+                    final_response['aql_result'] = aql_result
+                    break
+        except FuturesTimeoutError:
+            self.logger.warning(f"No AQL candidate returned results within {self.speculative_time_budget}s")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if decisions:
+            final_response['aql_guard'] = [asdict(d) for d in list(decisions)]
+        aql_result = final_response['aql_result']
+        if aql_result and interpret:
+            final_response['scientific_story'] = self.interpret_aql_result(aql_result, question or query)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Speculative chain completed. Final response: {capped_repr(final_response)}")
         return final_response
 
     def process_query(self, user_query: str) -> Dict[str, Any]:
-        self.logger.debug(f"Starting to process user query: {truncate(user_query)}")
+        return self._resolve(user_query, interpret=True)
+
+    def _resolve(self, user_query: str, interpret: bool) -> Dict[str, Any]:
+        start = time.perf_counter()
+        # Profiled queries are attributed to the question they were generated for
+        with question_context(user_query):
+            context = QueryContext(user_query)
+            match = self._recall(context)
+            if match is not None:
+                interpretation = self.interpret_aql_result(context.aql_result, user_query) if interpret else None
+                response = self._recalled_response(context, match, interpretation)
+            elif self.speculative_candidates > 1:
+                response = self._run_speculative(user_query, interpret)
+            else:
+                response = self._run_attempts(user_query, interpret)
+        self._remember(user_query, response)
+        self.metrics.observe_request(response, time.perf_counter() - start)
+        return response
+
+    def _recall(self, context: QueryContext) -> Optional[MemoryMatch]:
+        """
+        Answer a question with the AQL remembered for it or for a near-duplicate, skipping generation.
+
+        Args:
+            context (QueryContext): The question; its AQL, rows and guard decisions are filled
+                in when the remembered AQL returns rows.
+
+        Returns:
+            Optional[MemoryMatch]: The match that was used, or None if the AQL has to be generated.
+        """
+        if self.aql_memory is None:
+            return None
+        match = self.aql_memory.match(context.question)
+        if match is None:
+            self.metrics.memory_lookups.inc(outcome='miss')
+            return None
+        with record_decisions() as decisions:
+            try:
+                aql_result = self.graph.query(match.aql_query, self.qa_chain.top_k)
+            except Exception as e:
+                self.logger.warning(truncate(f"Remembered AQL failed, generating new AQL: {e}"))
+                aql_result = []
+        if not aql_result:
+            self.metrics.memory_lookups.inc(outcome='stale')
+            self.logger.debug(f"Remembered AQL for {truncate(match.question)} returned no rows")
+            if not match.parametrized and match.similarity >= self.aql_memory.reuse_threshold:
+                # The data changed under the stored query; let the next successful AQL replace it
+                self.aql_memory.forget(match.question)
+            return None
+        self.metrics.memory_lookups.inc(outcome='reused')
+        self.aql_memory.mark_used(match.question)
+        context.aql_query, context.aql_result = match.aql_query, aql_result
+        context.guard_decisions.extend(decisions)
+        self.logger.debug(f"Reused AQL of {truncate(match.question)} (similarity {match.similarity:.2f}, "
+                          f"parametrized: {match.parametrized}), {len(aql_result)} rows")
+        return match
+
+    @staticmethod
+    def _recalled_response(context: QueryContext, match: MemoryMatch, interpretation: Optional[str]) -> Dict[str, Any]:
+        response = context.response(interpretation)
+        response["aql_memory"] = {"question": match.question, "similarity": round(match.similarity, 4),
+                                  "parametrized": match.parametrized}
+        return response
+
+    def _remember(self, user_query: str, response: Dict[str, Any]):
+        """Store the AQL that answered a question, if it returned rows."""
+        if self.aql_memory is None or 'error' in response or 'aql_memory' in response:
+            return
+        if response.get('aql_query') and response.get('aql_result'):
+            try:
+                self.aql_memory.record(user_query, response['aql_query'], len(response['aql_result']))
+            except Exception as e:
+                self.logger.warning(f"Failed to remember AQL: {e}")
+
+    def _generation_input(self, user_query: str) -> str:
+        """The question and base prompt, followed by remembered AQL of similar questions as examples."""
         full_query = user_query + base_prompt
+        if self.aql_memory is not None:
+            examples = self.aql_memory.examples(user_query)
+            if examples:
+                self.metrics.memory_lookups.inc(outcome='examples')
+                full_query += self.aql_memory.format_examples(examples)
+        return full_query
+
+    def _run_speculative(self, user_query: str, interpret: bool) -> Dict[str, Any]:
+        full_query = self._generation_input(user_query)
+        response = self.speculative_chain(full_query, interpret=interpret, question=user_query)
+        if 'error' in response:
+            return {"error": f"An error occurred: {response['error']}"}
+        result = {
+            "original_query": user_query,
+            "aql_result": response['aql_result'],
+            "interpretation": response.get('scientific_story', "No interpretation available."),
+            "attempt_count": 1
+        }
+        if 'aql_query' in response:
+            result["aql_query"] = response['aql_query']
+        if response.get('aql_guard'):
+            result["aql_guard"] = response['aql_guard']
+        return result
+
+    def stream_query(self, user_query: str) -> Iterator[Dict[str, Any]]:
+        """
+        Process a query like `process_query`, streaming the scientific story as it is generated.
+
+        Yields:
+            Dict[str, Any]: Snapshots of the response; each one carries the interpretation
+            generated so far, and the last one is the complete response.
+        """
+        response = self._resolve(user_query, interpret=False)
+        if 'error' in response or not response['aql_result']:
+            yield response
+            return
+
+        response['interpretation'] = ""
+        yield dict(response)
+        for token in self.stream_interpretation(response['aql_result'], user_query):
+            response['interpretation'] += token
+            yield dict(response)
+        self.logger.debug(f"Streamed interpretation: {truncate(response['interpretation'])}")
+
+    def _run_attempts(self, user_query: str, interpret: bool) -> Dict[str, Any]:
+        self.logger.debug(f"Starting to process user query: {truncate(user_query)}")
+        full_query = self._generation_input(user_query)
         self.logger.debug(f"Full query: {truncate(full_query)}")
 
-        max_attempts = 3
+        max_attempts = MAX_ATTEMPTS
         attempt = 1
         success = False
-        failure_message = ("The prior AQL query failed to return results. "
-                           "Please think this through step by step and refine your AQL statement. "
-                           "The original question is as follows:")
 
         while attempt <= max_attempts and not success:
             self.logger.debug(f"Attempt {attempt}: Executing query...")
-            response = self.sequential_chain(full_query)
+            response = self.sequential_chain(full_query, interpret=interpret, question=user_query)
             
             if 'error' in response:
                 error_message = f"Error in attempt {attempt}: {response['error']}"
@@ -180,7 +652,8 @@ class QueryManager:
                 return {"error": f"An error occurred: {error_message}"}
             
             aql_result = response.get('aql_result', [])
-            self.logger.debug(f"Attempt {attempt} - AQL Result: {truncate(str(aql_result))}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Attempt {attempt} - AQL Result: {capped_repr(aql_result)}")
 
             if aql_result:
                 success = True
@@ -188,19 +661,214 @@ class QueryManager:
             else:
                 self.logger.debug(f"Attempt {attempt} - No AQL result found.")
                 if attempt < max_attempts:
-                    full_query = f"{failure_message} {full_query}"
+                    full_query = f"{FAILURE_MESSAGE} {full_query}"
                     self.logger.debug(f"Refined query for next attempt: {truncate(full_query)}")
                 else:
                     self.logger.warning(f"No result found after {max_attempts} tries.")
 
             attempt += 1
 
-        return {
+        result = {
             "original_query": user_query,
             "aql_result": aql_result,
             "interpretation": response.get('scientific_story', "No interpretation available."),
             "attempt_count": attempt - 1
         }
+        if 'aql_query' in response:
+            result["aql_query"] = response['aql_query']
+        if response.get('aql_guard'):
+            result["aql_guard"] = response['aql_guard']
+        return result
+
+    def _slots(self) -> asyncio.Semaphore:
+        """Return the concurrency limit of the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        if self._query_slots is None or self._query_slots_loop is not loop:
+            self._query_slots = asyncio.Semaphore(self.max_concurrent_queries)
+            self._query_slots_loop = loop
+        return self._query_slots
+
+    async def aprocess_query(self, user_query: str) -> Dict[str, Any]:
+        """
+        Process a query like `process_query` without blocking the event loop.
+
+        At most `max_concurrent_queries` questions are processed at once; the others wait for
+        a slot. Cancelling the task (e.g. when the client disconnects) stops the pipeline at
+        its next await: pending LLM requests are abandoned, and an AQL query that is already
+        running finishes in its worker thread, bounded by the guard's `max_runtime`.
+
+        Args:
+            user_query (str): The user's question.
+
+        Returns:
+            Dict[str, Any]: The same response as `process_query`.
+        """
+        context = QueryContext(user_query)
+        try:
+            async with self._slots():
+                self.logger.debug(f"Request {context.request_id} started after {context.elapsed():.2f}s in the queue")
+                with question_context(user_query):
+                    response = await self._aresolve(context, interpret=True)
+                self.logger.debug(f"Request {context.request_id} completed in {context.elapsed():.2f}s")
+                return response
+        except asyncio.CancelledError:
+            self.metrics.request_seconds.observe(context.elapsed(), outcome='cancelled')
+            self.logger.info(f"Request {context.request_id} cancelled after {context.elapsed():.2f}s")
+            raise
+
+    async def astream_query(self, user_query: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a query like `aprocess_query`, streaming the scientific story as it is generated.
+
+        The request keeps its concurrency slot until the stream is exhausted or closed.
+
+        Yields:
+            Dict[str, Any]: Snapshots of the response, as in `stream_query`.
+        """
+        context = QueryContext(user_query)
+        response = None
+        try:
+            async with self._slots():
+                with question_context(user_query):
+                    response = await self._aresolve(context, interpret=False)
+                if 'error' in response or not response['aql_result']:
+                    yield response
+                    return
+
+                response['interpretation'] = ""
+                yield dict(response)
+                async for token in self.astream_interpretation(response['aql_result'], user_query):
+                    response['interpretation'] += token
+                    yield dict(response)
+        except (asyncio.CancelledError, GeneratorExit):
+            if response is None:
+                # Requests cancelled while their interpretation streams were already recorded
+                self.metrics.request_seconds.observe(context.elapsed(), outcome='cancelled')
+            self.logger.info(f"Request {context.request_id} cancelled after {context.elapsed():.2f}s")
+            raise
+
+    async def _aresolve(self, context: QueryContext, interpret: bool) -> Dict[str, Any]:
+        match = await asyncio.to_thread(self._recall, context) if self.aql_memory is not None else None
+        if match is not None:
+            interpretation = None
+            if interpret:
+                interpretation = await self.ainterpret_aql_result(context.aql_result, context.question)
+            response = self._recalled_response(context, match, interpretation)
+        elif self.speculative_candidates > 1:
+            # Speculative candidates already run on their own threads
+            response = await asyncio.to_thread(self._run_speculative, context.question, interpret)
+        else:
+            response = await self._arun_attempts(context, interpret)
+        self._remember(context.question, response)
+        self.metrics.observe_request(response, context.elapsed())
+        return response
+
+    async def _arun_attempts(self, context: QueryContext, interpret: bool) -> Dict[str, Any]:
+        full_query = self._generation_input(context.question)
+        while context.attempt_count < MAX_ATTEMPTS:
+            context.attempt_count += 1
+            execution = await self.aexecute_aql(full_query)
+            context.guard_decisions.extend(execution.guard_decisions)
+            if execution.error is not None:
+                error_message = f"Error in attempt {context.attempt_count}: {execution.error}"
+                self.logger.error(truncate(error_message))
+                return {"error": f"An error occurred: {error_message}"}
+            if execution.aql_result:
+                context.aql_query, context.aql_result = execution.aql_query, execution.aql_result
+                break
+            self.logger.debug(f"Request {context.request_id} attempt {context.attempt_count} - No AQL result found.")
+            full_query = f"{FAILURE_MESSAGE} {full_query}"
+        else:
+            self.logger.warning(f"No result found after {MAX_ATTEMPTS} tries.")
+
+        interpretation = None
+        if context.aql_result and interpret:
+            interpretation = await self.ainterpret_aql_result(context.aql_result, context.question)
+        return context.response(interpretation)
+
+    async def aexecute_aql(self, query: str) -> AQLExecution:
+        """Generate AQL for a question and run it, like `execute_aql`, without blocking the event loop."""
+        self.logger.debug(f"Attempting to execute AQL query: {truncate(query)}")
+        with record_decisions() as decisions:
+            try:
+                with self.metrics.stage('aql_generation'):
+                    result = await self.router.arun(
+                        'aql_generation',
+                        lambda model: self._agenerate_and_run(self.qa_chains[model], query),
+                        check=self._check_aql_result
+                    )
+            except Exception as e:
+                error_message = f"Error executing AQL query: {e}"
+                self.logger.error(truncate(error_message))
+                return AQLExecution(error=error_message, guard_decisions=list(decisions))
+        execution = AQLExecution(aql_query=result['aql_query'], aql_result=result['aql_result'] or [],
+                                 guard_decisions=list(decisions))
+        self.logger.debug(f"AQL query returned {len(execution.aql_result)} rows: {truncate(execution.aql_query)}")
+        return execution
+
+    async def _agenerate_and_run(self, chain: ArangoGraphQAChain, question: str) -> Dict[str, Any]:
+        """
+        Generate, run and fix AQL like `_generate_and_run`, with async LLM calls.
+
+        The query itself runs on a pooled handle in a worker thread, which inherits the
+        request's context.
+
+        Raises:
+            ValueError: If the model's response holds no AQL query.
+            AQLQueryExecuteError: If the query still fails after the chain's last fix attempt.
+        """
+        generation = chain.aql_generation_chain
+        output = (await generation.ainvoke({
+            "adb_schema": self.graph.schema,
+            "aql_examples": chain.aql_examples,
+            "user_input": question,
+        }))[generation.output_key]
+        for attempt in range(1, chain.max_aql_generation_attempts + 1):
+            matches = AQL_BLOCK_PATTERN.findall(output)
+            if not matches:
+                raise ValueError(f"Response is Invalid: {output}")
+            aql_query = matches[0]
+            try:
+                aql_result = await asyncio.to_thread(self.graph.query, aql_query, chain.top_k)
+                return {'aql_query': aql_query, 'aql_result': aql_result}
+            except AQLQueryExecuteError as e:
+                if attempt == chain.max_aql_generation_attempts:
+                    raise
+                fix = chain.aql_fix_chain
+                output = (await fix.ainvoke({
+                    "adb_schema": self.graph.schema,
+                    "aql_query": aql_query,
+                    "aql_error": e.error_message,
+                }))[fix.output_key]
+
+    async def ainterpret_aql_result(self, aql_result: List[Dict[str, Any]], question: str = None) -> str:
+        self.logger.debug("Interpreting AQL result")
+        start = time.perf_counter()
+        with get_openai_callback() as usage:
+            try:
+                response = await self.llm.ainvoke(await self._ainterpretation_prompt(aql_result, question))
+            except Exception as e:
+                self._observe_interpretation(start, usage, e)
+                self.logger.error(truncate(f"Error interpreting AQL result: {e}"))
+                return "Error interpreting results."
+        self._observe_interpretation(start, usage)
+        self.logger.debug(f"LLM interpretation: {truncate(response.content)}")
+        return response.content
+
+    async def astream_interpretation(self, aql_result: List[Dict[str, Any]],
+                                     question: str = None) -> AsyncIterator[str]:
+        self.logger.debug("Streaming interpretation of AQL result")
+        start = time.perf_counter()
+        try:
+            async for chunk in self.llm.astream(await self._ainterpretation_prompt(aql_result, question)):
+                if chunk.content:
+                    yield chunk.content
+        except Exception as e:
+            self._observe_interpretation(start, error=e)
+            self.logger.error(truncate(f"Error interpreting AQL result: {e}"))
+            yield "Error interpreting results."
+            return
+        self._observe_interpretation(start)
 
 # Example usage (for testing purposes)
 if __name__ == "__main__":
@@ -0,0 +1,236 @@
+# omics_oracle/query_profiler.py
+
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from arango.database import StandardDatabase
+
+from .aql_cache import normalize_aql
+
+# The user question being answered in the current context, attached to every profile
+_question: ContextVar[Optional[str]] = ContextVar('profiled_question', default=None)
+
+
+@dataclass
+class QueryProfile:
+    """Execution statistics of one AQL query."""
+    timestamp: float
+    source: str
+    query: str
+    bind_vars: Optional[Dict[str, Any]]
+    question: Optional[str]
+    rows: int
+    elapsed: float
+    execution_time: Optional[float] = None
+    scanned_full: Optional[int] = None
+    scanned_index: Optional[int] = None
+    filtered: Optional[int] = None
+    peak_memory_usage: Optional[int] = None
+    phases: Optional[Dict[str, float]] = None
+    nodes: List[Dict[str, Any]] = field(default_factory=list)
+    slow: bool = False
+
+
+@contextmanager
+def question_context(question: str) -> Iterator[None]:
+    """Attribute the queries run in the current context (and contexts copied from it) to a user question."""
+    token = _question.set(question)
+    try:
+        yield
+    finally:
+        _question.reset(token)
+
+
+def current_question() -> Optional[str]:
+    """Return the user question set by the innermost `question_context`, if any."""
+    return _question.get()
+
+
+class QueryProfiler:
+    """
+    Profiles AQL queries and writes the slow ones to a JSON Lines log.
+
+    Queries run with ArangoDB's `profile` option, which returns the scanned and filtered
+    document counts, peak memory, the time spent in each query phase and, at level 2, the
+    calls, items and runtime of every execution node. A query is slow when its server-side
+    execution time (or, if the server does not report one, the wall-clock time) reaches
+    `threshold` seconds. Slow queries are explained once more to label their nodes with
+    the node type, and are logged together with the question they were generated for.
+    """
+
+    def __init__(self, slow_query_log: Optional[str] = None, threshold: float = 1.0, level: int = 2,
+                 explain_slow: bool = True):
+        """
+        Initialize the profiler.
+
+        Args:
+            slow_query_log (str, optional): The JSON Lines file slow queries are appended to.
+                Defaults to None (slow queries are only logged as warnings).
+            threshold (float): Seconds of execution time from which a query counts as slow.
+            level (int): The `profile` option: 1 for statistics and phase timings, 2 to add
+                per-node statistics.
+            explain_slow (bool): Run EXPLAIN on slow queries to add node types and estimates.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.slow_query_log = slow_query_log
+        self.threshold = threshold
+        self.level = level
+        self.explain_slow = explain_slow
+        self.profiled = 0
+        self.slow = 0
+        self._lock = threading.Lock()
+
+    def execution_options(self, **kwargs: Any) -> Dict[str, Any]:
+        """Add the `profile` option to the keyword arguments of `aql.execute`."""
+        options = dict(kwargs)
+        options['profile'] = self.level
+        return options
+
+    def record(self, db: StandardDatabase, query: str, bind_vars: Optional[Dict[str, Any]], cursor: Any,
+               rows: int, elapsed: float, source: str) -> Optional[QueryProfile]:
+        """
+        Build the profile of a finished query and log it if it is slow.
+
+        Profiling never fails the query: errors are logged and None is returned.
+
+        Args:
+            db (StandardDatabase): The handle the query ran on, used to explain slow queries.
+            query (str): The AQL query.
+            bind_vars (Dict[str, Any], optional): The query's bind variables.
+            cursor (Cursor): The query's cursor, after its rows were read.
+            rows (int): The number of rows read.
+            elapsed (float): Wall-clock seconds from execution to the last row read.
+            source (str): What issued the query, e.g. 'graph' for LLM-generated AQL.
+
+        Returns:
+            Optional[QueryProfile]: The profile.
+        """
+        try:
+            stats = cursor.statistics() or {}
+            profile = QueryProfile(
+                timestamp=time.time(),
+                source=source,
+                query=query,
+                bind_vars=bind_vars,
+                question=current_question(),
+                rows=rows,
+                elapsed=elapsed,
+                execution_time=stats.get('execution_time'),
+                scanned_full=stats.get('scanned_full'),
+                scanned_index=stats.get('scanned_index'),
+                filtered=stats.get('filtered'),
+                peak_memory_usage=stats.get('peak_memory_usage'),
+                phases=cursor.profile(),
+                nodes=[dict(node) for node in stats.get('nodes', [])],
+            )
+            duration = profile.execution_time if profile.execution_time is not None else elapsed
+            profile.slow = duration >= self.threshold
+            with self._lock:
+                self.profiled += 1
+                self.slow += profile.slow
+            if profile.slow:
+                if self.explain_slow:
+                    self._label_nodes(db, profile)
+                self._log_slow(profile, duration)
+            return profile
+        except Exception as e:
+            self.logger.warning(f"Failed to profile AQL query: {e}")
+            return None
+
+    def _label_nodes(self, db: StandardDatabase, profile: QueryProfile):
+        """Add the type and estimates of each plan node, matched to the profiled nodes by id."""
+        try:
+            plan = db.aql.explain(profile.query, bind_vars=profile.bind_vars)
+        except Exception as e:
+            self.logger.debug(f"Could not explain slow query: {e}")
+            return
+        planned = {node['id']: node for node in plan.get('nodes', [])}
+        if not profile.nodes:
+            profile.nodes = [{'id': node_id} for node_id in planned]
+        for node in profile.nodes:
+            plan_node = planned.get(node['id'])
+            if plan_node is not None:
+                node['type'] = plan_node.get('type')
+                node['estimatedCost'] = plan_node.get('estimatedCost')
+                node['estimatedNrItems'] = plan_node.get('estimatedNrItems')
+                if 'collection' in plan_node:
+                    node['collection'] = plan_node['collection']
+                if 'indexes' in plan_node:
+                    node['indexes'] = [index.get('type') for index in plan_node['indexes']]
+
+    def _log_slow(self, profile: QueryProfile, duration: float):
+        self.logger.warning(f"Slow AQL query ({duration:.2f}s, {profile.rows} rows, "
+                            f"{profile.scanned_full} full scans, {profile.scanned_index} index reads) "
+                            f"for question {profile.question!r}: {profile.query[:200]}")
+        if self.slow_query_log is None:
+            return
+        line = json.dumps(asdict(profile), default=str)
+        try:
+            with self._lock, open(self.slow_query_log, 'a') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            self.logger.warning(f"Could not write slow query log {self.slow_query_log}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Report how many queries were profiled and how many of them were slow."""
+        with self._lock:
+            return {'profiled': self.profiled, 'slow': self.slow}
+
+
+def summarize_slow_queries(path: str, top: int = 10) -> List[Dict[str, Any]]:
+    """
+    Group a slow query log by normalized query, worst total execution time first.
+
+    Args:
+        path (str): The JSON Lines file written by a QueryProfiler.
+        top (int): The number of groups returned.
+
+    Returns:
+        List[Dict[str, Any]]: For each query, its count, total and maximum seconds, the most
+        documents scanned in full, and the questions it was generated for.
+    """
+    groups: Dict[str, Dict[str, Any]] = defaultdict(
+        lambda: {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'max_scanned_full': 0, 'questions': []})
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            profile = json.loads(line)
+            seconds = profile['execution_time'] if profile.get('execution_time') is not None else profile['elapsed']
+            group = groups[normalize_aql(profile['query'])]
+            group['count'] += 1
+            group['total_seconds'] += seconds
+            group['max_seconds'] = max(group['max_seconds'], seconds)
+            group['max_scanned_full'] = max(group['max_scanned_full'], profile.get('scanned_full') or 0)
+            if profile.get('question') and profile['question'] not in group['questions']:
+                group['questions'].append(profile['question'])
+    ranked = sorted(({'query': query, **group} for query, group in groups.items()),
+                    key=lambda group: group['total_seconds'], reverse=True)
+    return ranked[:top]
+
+
+def main(argv: List[str] = None):
+    """Print the queries with the highest total execution time in a slow query log."""
+    parser = argparse.ArgumentParser(description="Summarize a slow AQL query log.")
+    parser.add_argument('path', help="The slow query log (JSON Lines)")
+    parser.add_argument('--top', type=int, default=10, help="Number of queries to show")
+    args = parser.parse_args(argv)
+
+    for group in summarize_slow_queries(args.path, args.top):
+        print(f"{group['total_seconds']:.2f}s total, {group['count']} runs, {group['max_seconds']:.2f}s max, "
+              f"{group['max_scanned_full']} docs scanned in full")
+        print(f"  {group['query']}")
+        for question in group['questions'][:3]:
+            print(f"  - {question}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+# omics_oracle/rate_limiter.py
+
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+
+from .context_packer import count_tokens
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that hands out reservations.
+
+    A caller that cannot be served immediately still takes its tokens (the bucket goes
+    into debt) and is told how long to wait. Waiting happens outside the lock, so callers
+    are served in arrival order without holding each other up while they sleep.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float): Maximum number of tokens the bucket holds (the allowed burst).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """
+        Take `amount` tokens from the bucket.
+
+        Args:
+            amount (float): The number of tokens needed. Requests above the capacity are clamped to it.
+
+        Returns:
+            float: Seconds the caller must wait before using the reservation.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(amount, self.capacity)
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class RateLimiter:
+    """
+    Client-side limiter for LLM APIs, shareable between wrappers and threads.
+
+    Combines a requests-per-second bucket and a tokens-per-minute bucket, and retries
+    calls rejected with HTTP 429. Retries wait for the server's `Retry-After` when one
+    is sent, and otherwise back off exponentially with jitter. While a retry is pending
+    every caller sharing the limiter is held back, so one 429 does not trigger a burst
+    of further rejected requests.
+    """
+
+    def __init__(self, requests_per_second: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 burst: Optional[float] = None, max_retries: int = 5, base_delay: float = 1.0,
+                 max_delay: float = 60.0):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_second (float, optional): Sustained request rate. Defaults to None (unlimited).
+            tokens_per_minute (float, optional): Sustained token budget. Defaults to None (unlimited).
+            burst (float, optional): Requests allowed at once. Defaults to `requests_per_second`.
+            max_retries (int): Retries after a rate-limited response before giving up.
+            base_delay (float): Backoff for the first retry, in seconds.
+            max_delay (float): Upper bound for any single backoff, in seconds.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.requests = None
+        self.tokens = None
+        if requests_per_second:
+            self.requests = TokenBucket(requests_per_second, burst or max(1.0, requests_per_second))
+        if tokens_per_minute:
+            self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._paused_until = 0.0
+        self._pause_lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        with self._pause_lock:
+            return max(wait, self._paused_until - time.monotonic())
+
+    def acquire(self, tokens: int = 0):
+        """
+        Block until a request costing `tokens` may be sent.
+
+        Args:
+            tokens (int): Estimated tokens the request consumes.
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            self.logger.debug(f"Rate limiter sleeping {wait:.2f}s")
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0):
+        """
+        Wait, without blocking the event loop, until a request costing `tokens` may be sent.
+
+        Args:
+            tokens (int): Estimated tokens the request consumes.
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            self.logger.debug(f"Rate limiter sleeping {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Compute how long to wait before retry number `attempt`.
+
+        Args:
+            attempt (int): Zero-based retry number.
+            retry_after (float, optional): The server-provided delay, which takes precedence.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def _pause(self, delay: float):
+        with self._pause_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def call(self, func: Callable[..., Any], *args: Any, tokens: int = 0, **kwargs: Any) -> Any:
+        """
+        Call `func` within the rate limits, retrying when it is rejected with HTTP 429.
+
+        Args:
+            func (Callable[..., Any]): The function making the API request.
+            *args: Positional arguments for `func`.
+            tokens (int): Estimated tokens the request consumes.
+            **kwargs: Keyword arguments for `func`.
+
+        Returns:
+            Any: The return value of `func`.
+
+        Raises:
+            Exception: Whatever `func` raises, once it is not a rate limit or retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            self.acquire(tokens)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limited(e) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, retry_after_seconds(e))
+                self.logger.warning(f"Rate limited (attempt {attempt + 1}/{self.max_retries}), retrying in {delay:.2f}s")
+                self._pause(delay)
+                attempt += 1
+
+    async def acall(self, func: Callable[..., Awaitable[Any]], *args: Any, tokens: int = 0, **kwargs: Any) -> Any:
+        """
+        Await `func` within the rate limits, retrying when it is rejected with HTTP 429.
+
+        Args:
+            func (Callable[..., Awaitable[Any]]): The coroutine function making the API request.
+            *args: Positional arguments for `func`.
+            tokens (int): Estimated tokens the request consumes.
+            **kwargs: Keyword arguments for `func`.
+
+        Returns:
+            Any: The result of `func`.
+
+        Raises:
+            Exception: Whatever `func` raises, once it is not a rate limit or retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            await self.aacquire(tokens)
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limited(e) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, retry_after_seconds(e))
+                self.logger.warning(f"Rate limited (attempt {attempt + 1}/{self.max_retries}), retrying in {delay:.2f}s")
+                self._pause(delay)
+                attempt += 1
+
+
+class LangChainRateLimiter(BaseCallbackHandler):
+    """
+    Callback that holds LangChain chat models such as ChatOpenAI to a RateLimiter.
+
+    Each request waits for a request slot and its estimated prompt tokens before it is sent.
+    Async models run the callback in a worker thread, so waiting does not block the event
+    loop. Retries after HTTP 429 are left to the model client. The callback runs before the
+    model's cache lookup, so responses served from the LLM cache count against the limits too.
+    """
+
+    def __init__(self, limiter: RateLimiter, model: str = "gpt-4o"):
+        self.limiter = limiter
+        self.model = model
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[BaseMessage]],
+                            **kwargs: Any) -> None:
+        for prompt in messages:
+            self.limiter.acquire(sum(count_tokens(str(message.content), self.model) for message in prompt))
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None)
+    return status
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """
+    Check whether an exception was caused by an HTTP 429 response.
+
+    Works with requests and httpx HTTP errors as well as OpenAI API errors.
+
+    Args:
+        error (Exception): The exception raised by the API call.
+
+    Returns:
+        bool: True if the server rejected the request for exceeding its rate limit.
+    """
+    return _status_code(error) == 429
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Read the server's requested delay from a rate-limited response.
+
+    Args:
+        error (Exception): The exception raised by the API call.
+
+    Returns:
+        Optional[float]: Seconds to wait, from `retry-after-ms` or `Retry-After`, or None if absent.
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
@@ -0,0 +1,113 @@
+# omics_oracle/schema_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from arango.database import StandardDatabase
+
+SCHEMA_CACHE_VERSION = 1
+
+
+@dataclass
+class CachedSchema:
+    """An ArangoGraph schema together with the fingerprint of the database it was generated from."""
+    fingerprint: str
+    schema: Dict[str, Any]
+    created: float
+
+
+def database_fingerprint(db: StandardDatabase) -> str:
+    """
+    Fingerprint everything the generated schema depends on.
+
+    Covers the graph definitions and the name, type, document count and revision of every
+    non-system collection, without reading any documents.
+
+    Args:
+        db (StandardDatabase): A database handle.
+
+    Returns:
+        str: A hex digest that changes whenever the schema may have changed.
+    """
+    graphs = sorted((g['name'], json.dumps(g.get('edge_definitions'), sort_keys=True)) for g in db.graphs())
+    collections = []
+    for collection in db.collections():
+        if collection['system']:
+            continue
+        handle = db.collection(collection['name'])
+        collections.append((collection['name'], collection['type'], handle.count(), handle.revision()))
+    raw = json.dumps([graphs, sorted(collections)], separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class SchemaCache:
+    """
+    On-disk cache of the ArangoGraph schema, shared by every worker and restart.
+
+    The file holds the schema of a single database, identified by `key` (e.g. host and
+    database name). Writes go through a temporary file, so concurrent workers never read a
+    partially written schema.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the cache.
+
+        Args:
+            path (str): The JSON file the schema is stored in.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+
+    def load(self, key: str) -> Optional[CachedSchema]:
+        """
+        Read the cached schema of a database.
+
+        Args:
+            key (str): Identifies the database.
+
+        Returns:
+            Optional[CachedSchema]: The cached schema, or None if there is none for `key` or the
+            file cannot be read.
+        """
+        try:
+            with open(self.path) as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable schema cache {self.path}: {e}")
+            return None
+        if record.get('version') != SCHEMA_CACHE_VERSION or record.get('key') != key:
+            return None
+        return CachedSchema(record['fingerprint'], record['schema'], record['created'])
+
+    def save(self, key: str, fingerprint: str, schema: Dict[str, Any]):
+        """
+        Store the schema of a database, replacing whatever the file held.
+
+        Args:
+            key (str): Identifies the database.
+            fingerprint (str): The database fingerprint the schema was generated from.
+            schema (Dict[str, Any]): The generated schema.
+        """
+        record = {
+            'version': SCHEMA_CACHE_VERSION,
+            'key': key,
+            'fingerprint': fingerprint,
+            'created': time.time(),
+            'schema': schema,
+        }
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(record, f, default=str)
+            os.replace(temp_path, self.path)
+            self.logger.info(f"Saved ArangoDB schema to {self.path}")
+        except OSError as e:
+            self.logger.warning(f"Could not save schema cache {self.path}: {e}")
@@ -1,50 +1,73 @@
 # omics_oracle/spoke_wrapper.py
 
-import os
-from dotenv import load_dotenv
-from pyArango.connection import Connection
-from typing import Dict, Any, List
+import asyncio
+import itertools
+import time
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 import logging
+from .arango_session import RECONNECT_ERRORS, ArangoSession
+from .aql_cache import AQLResultCache
+from .graph_snapshot import GraphSnapshot
+from .query_profiler import QueryProfiler
+from .logger import DEBUG_PREVIEW_LENGTH, capped_repr
+
+DEFAULT_BATCH_SIZE = 1000
+# Keys per bulk document read in get_entities
+DEFAULT_ENTITY_CHUNK_SIZE = 1000
+# A path limit for bounded traversals from hub vertices; traversals are unbounded unless asked
+DEFAULT_TRAVERSAL_LIMIT = 1000
+UNIQUE_VERTICES_OPTIONS = ('none', 'path', 'global')
+TRAVERSAL_ORDERS = ('bfs', 'dfs')
 
 class SpokeWrapper:
-    def __init__(self):
+    def __init__(self, session: ArangoSession = None, pool_size: int = None, pool_timeout: float = 30.0,
+                 result_cache: AQLResultCache = None, graph_snapshot: GraphSnapshot = None,
+                 profiler: QueryProfiler = None):
+        """
+        Initialize the wrapper on a shared ArangoDB session.
+
+        Args:
+            session (ArangoSession, optional): The session to use. Defaults to a new session
+                configured from the .env file.
+            pool_size (int, optional): Maximum number of open connections for a new session.
+                Defaults to the ARANGO_POOL_SIZE environment variable, or 4.
+            pool_timeout (float): Seconds a request waits for a free connection.
+            result_cache (AQLResultCache, optional): Cache for `execute_aql` results. Unless it has its
+                own revision source, it is cleared whenever the database revision changes.
+            graph_snapshot (GraphSnapshot, optional): Local copy of the Edges collection that serves
+                global-uniqueness traversals while it matches the collection's revision.
+            profiler (QueryProfiler, optional): Profiles every query and logs the slow ones.
+        """
         self.logger = logging.getLogger(__name__)
-        self._load_environment()
-        self._connect_to_database()
+        self.session = session or ArangoSession.from_env(pool_size=pool_size, pool_timeout=pool_timeout)
+        self.pool = self.session.pool
+        self.db_name = self.session.db_name
+        self.result_cache = result_cache
+        if result_cache is not None and result_cache.revision is None:
+            result_cache.revision = self.session.revision
+        self.profiler = profiler
+        self.graph_snapshot = graph_snapshot
+        if graph_snapshot is not None and graph_snapshot.revision is None:
+            graph_snapshot.revision = lambda: self.session.collection_revision(graph_snapshot.edge_collection)
+        self._db = None
         self.logger.info("SpokeWrapper initialized successfully")
 
-    def _load_environment(self):
-        """Load environment variables from .env file."""
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        dotenv_path = os.path.join(current_dir, '..', '.env')
-        self.logger.info(f"Looking for .env file at: {dotenv_path}")
-        
-        if load_dotenv(dotenv_path):
-            self.logger.info("Successfully loaded .env file")
-        else:
-            self.logger.error("Failed to load .env file")
-            raise ValueError("Failed to load .env file")
-
-        self.host = os.getenv('ARANGO_HOST')
-        self.db_name = os.getenv('ARANGO_DB')
-        self.username = os.getenv('ARANGO_USERNAME')
-        self.password = os.getenv('ARANGO_PASSWORD')
+    @property
+    def db(self):
+        """
+        A database handle for single-threaded use such as notebooks.
 
-        if not all([self.host, self.db_name, self.username, self.password]):
-            self.logger.error("Missing required environment variables")
-            raise ValueError("ARANGO_HOST, ARANGO_DB, ARANGO_USERNAME, and ARANGO_PASSWORD must be set in the .env file")
-        else:
-            self.logger.info("All required environment variables loaded successfully")
+        The handle is opened on first use and kept outside the pool, so it is never handed
+        to another thread at the same time.
+        """
+        if self._db is None:
+            self._db = self.session.open_database()
+        return self._db
 
-    def _connect_to_database(self):
-        """Connect to the ArangoDB database."""
-        try:
-            self.conn = Connection(arangoURL=self.host, username=self.username, password=self.password)
-            self.db = self.conn[self.db_name]
-            self.logger.info(f"Connected to database: {self.db_name}")
-        except Exception as e:
-            self.logger.error(f"Failed to connect to database: {e}")
-            raise
+    def close(self):
+        """Close the pooled database connections and the handle behind `db`."""
+        self.session.close()
+        self._db = None
 
     def list_collections(self) -> List[str]:
         """
@@ -53,31 +76,124 @@ class SpokeWrapper:
         Returns:
             List[str]: A list of collection names.
         """
-        collections = list(self.db.collections.keys())
+        with self.pool.connection() as db:
+            collections = [collection['name'] for collection in db.collections()]
         self.logger.debug(f"Retrieved {len(collections)} collections")
         return collections
 
-    def execute_aql(self, query: str, bind_vars: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    def iter_aql(self, query: str, bind_vars: Dict[str, Any] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 ttl: float = None, stream: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Execute an AQL query and yield its rows as each cursor batch arrives.
+
+        Only one batch is held in memory at a time. Stopping early (breaking out of the loop
+        or closing the generator) deletes the server-side cursor. The pooled connection stays
+        checked out until the generator is exhausted or closed.
+
+        Args:
+            query (str): The AQL query to execute.
+            bind_vars (Dict[str, Any], optional): Bind variables for the query. Defaults to None.
+            batch_size (int): Rows fetched from the server per round trip.
+            ttl (float, optional): Seconds the server keeps an idle cursor alive. Defaults to the server setting.
+            stream (bool): Let the server produce results lazily instead of materializing them up front.
+
+        Yields:
+            Dict[str, Any]: The query results, one row at a time.
+
+        Raises:
+            Exception: Whatever the driver raises; connection errors before the first row are retried once.
+        """
+        for attempt in range(2):
+            started = False
+            try:
+                with self.pool.connection() as db:
+                    options = {'bind_vars': bind_vars, 'batch_size': batch_size, 'ttl': ttl, 'stream': stream}
+                    if self.profiler is not None:
+                        options = self.profiler.execution_options(**options)
+                    start = time.perf_counter()
+                    cursor = db.aql.execute(query, **options)
+                    rows = 0
+                    try:
+                        for row in cursor:
+                            started = True
+                            rows += 1
+                            yield row
+                    finally:
+                        self._close_cursor(cursor)
+                        if self.profiler is not None:
+                            self.profiler.record(db, query, bind_vars, cursor, rows,
+                                                 time.perf_counter() - start, source='spoke')
+                return
+            except RECONNECT_ERRORS as e:
+                if started or attempt:
+                    raise
+                # The pool has dropped the broken connection, so the retry gets a new one
+                self.logger.warning(f"Database connection failed, retrying on a fresh connection: {e}")
+
+    def _close_cursor(self, cursor):
+        """Delete a cursor that still has rows on the server; exhausted cursors are freed by the server."""
+        try:
+            if cursor.has_more():
+                cursor.close(ignore_missing=True)
+                self.logger.debug("Closed AQL cursor before it was exhausted")
+        except Exception as e:
+            self.logger.warning(f"Failed to close AQL cursor: {e}")
+
+    def execute_aql(self, query: str, bind_vars: Dict[str, Any] = None, max_rows: int = None) -> List[Dict[str, Any]]:
         """
         Execute an AQL query against the Spoke knowledge graph.
 
         Args:
             query (str): The AQL query to execute.
             bind_vars (Dict[str, Any], optional): Bind variables for the query. Defaults to None.
+            max_rows (int, optional): Stop after this many rows and close the cursor. Defaults to None (all rows).
 
         Returns:
             List[Dict[str, Any]]: The query results as a list of dictionaries.
         """
-        self.logger.info(f"Executing AQL query: {query}")
-        self.logger.debug(f"Bind variables: {bind_vars}")
+        self.logger.info(f"Executing AQL query: {capped_repr(query, DEBUG_PREVIEW_LENGTH)}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Bind variables: {capped_repr(bind_vars, DEBUG_PREVIEW_LENGTH)}")
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self.result_cache.make_key(query, bind_vars, max_rows=max_rows)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info(f"AQL query served from cache. Retrieved {len(cached)} results.")
+                return cached
+
+        batch_size = min(DEFAULT_BATCH_SIZE, max_rows) if max_rows else DEFAULT_BATCH_SIZE
+        rows = self.iter_aql(query, bind_vars=bind_vars, batch_size=batch_size)
         try:
-            results = list(self.db.AQLQuery(query, bindVars=bind_vars, rawResults=True))
-            self.logger.info(f"AQL query executed successfully. Retrieved {len(results)} results.")
-            self.logger.debug(f"Query results: {results}")
-            return results
+            results = list(itertools.islice(rows, max_rows))
         except Exception as e:
             self.logger.error(f"Error executing AQL query: {e}")
             return []
+        finally:
+            rows.close()
+        self.logger.info(f"AQL query executed successfully. Retrieved {len(results)} results.")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Query results: {capped_repr(results, DEBUG_PREVIEW_LENGTH)}")
+        if cache_key is not None:
+            self.result_cache.set(cache_key, results)
+        return results
+
+    async def aexecute_aql(self, query: str, bind_vars: Dict[str, Any] = None,
+                           max_rows: int = None) -> List[Dict[str, Any]]:
+        """
+        Execute an AQL query without blocking the event loop.
+
+        The driver is synchronous, so the query runs in a worker thread on a pooled connection.
+
+        Args:
+            query (str): The AQL query to execute.
+            bind_vars (Dict[str, Any], optional): Bind variables for the query. Defaults to None.
+            max_rows (int, optional): Stop after this many rows and close the cursor. Defaults to None (all rows).
+
+        Returns:
+            List[Dict[str, Any]]: The query results as a list of dictionaries.
+        """
+        return await asyncio.to_thread(self.execute_aql, query, bind_vars, max_rows)
 
     def get_entity(self, collection: str, key: str) -> Dict[str, Any]:
         """
@@ -92,14 +208,54 @@ class SpokeWrapper:
         """
         self.logger.info(f"Retrieving entity from collection: {collection}, key: {key}")
         try:
-            entity = self.db[collection][key]
+            with self.pool.connection() as db:
+                entity = db.collection(collection).get(key)
+            if entity is None:
+                self.logger.warning(f"No entity with key {key} in collection: {collection}")
+                return None
             self.logger.info(f"Successfully retrieved entity from collection: {collection}")
-            self.logger.debug(f"Retrieved entity: {entity}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"Retrieved entity: {capped_repr(entity, DEBUG_PREVIEW_LENGTH)}")
             return entity
         except Exception as e:
             self.logger.error(f"Failed to retrieve entity: {e}")
             return None
 
+    def get_entities(self, collection: str, keys: Sequence[str],
+                     chunk_size: int = DEFAULT_ENTITY_CHUNK_SIZE) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Retrieve many entities from a collection with one bulk read per chunk of keys.
+
+        Args:
+            collection (str): The name of the collection.
+            keys (Sequence[str]): The keys of the entities to retrieve. Duplicates are fetched once.
+            chunk_size (int): The number of keys sent in each request.
+
+        Returns:
+            Dict[str, Optional[Dict[str, Any]]]: Each requested key mapped to its entity, or to None
+            if the collection has no document with that key. Empty if retrieval failed.
+        """
+        unique_keys = list(dict.fromkeys(keys))
+        self.logger.info(f"Retrieving {len(unique_keys)} entities from collection: {collection}")
+        entities: Dict[str, Optional[Dict[str, Any]]] = dict.fromkeys(unique_keys)
+        try:
+            with self.pool.connection() as db:
+                documents = db.collection(collection)
+                for start in range(0, len(unique_keys), chunk_size):
+                    for entity in documents.get_many(unique_keys[start:start + chunk_size]):
+                        entities[entity['_key']] = entity
+        except Exception as e:
+            self.logger.error(f"Failed to retrieve entities: {e}")
+            return {}
+
+        missing = [key for key, entity in entities.items() if entity is None]
+        if missing:
+            self.logger.warning(f"{len(missing)} of {len(unique_keys)} keys not found in collection: "
+                                f"{collection}: {capped_repr(missing)}")
+        self.logger.info(f"Successfully retrieved {len(unique_keys) - len(missing)} entities "
+                         f"from collection: {collection}")
+        return entities
+
     def get_connected_entities(self, start_id: str, edge_label: str = None) -> List[Dict[str, Any]]:
         """
         Retrieve entities connected to a given entity, optionally filtered by edge label.
@@ -109,12 +265,12 @@ class SpokeWrapper:
             edge_label (str, optional): The label of the edges to traverse. Defaults to None.
 
         Returns:
-            List[Dict[str, Any]]: A list of connected entities.
+            List[Dict[str, Any]]: A list of connected entities, with their full documents.
         """
         self.logger.info(f"Getting connected entities for start_id: {start_id}, edge_label: {edge_label}")
         query = """
         FOR v, e IN 1..1 OUTBOUND @start_id @@edge_collection
-        FILTER e.label == @edge_label
+        FILTER @edge_label == null OR e.label == @edge_label
         RETURN {entity: v, edge: e}
         """
         bind_vars = {
@@ -124,31 +280,308 @@ class SpokeWrapper:
         }
         return self.execute_aql(query, bind_vars=bind_vars)
 
-    def traverse_graph(self, start_id: str, max_depth: int = 2, edge_label: str = None) -> List[Dict[str, Any]]:
+    def traverse_graph(self, start_id: str, max_depth: int = 2, edge_label: str = None,
+                       edge_labels: Iterable[str] = None, unique_vertices: str = 'none', order: str = None,
+                       max_fanout: Union[int, Sequence[int]] = None,
+                       max_results: Optional[int] = None) -> "TraversalResult":
         """
         Traverse the graph starting from a given entity, up to a specified depth.
 
+        By default every path is returned, as with ArangoDB's default traversal options. Hub
+        vertices (popular genes, common diseases) make such traversals explode; to bound them,
+        pass unique_vertices='global' (each vertex is visited once, in breadth-first order),
+        `max_fanout` and `max_results` (e.g. DEFAULT_TRAVERSAL_LIMIT). Edges outside
+        `edge_labels` are always pruned rather than filtered afterwards. Global-uniqueness
+        traversals are served from the graph snapshot while it is fresh.
+
         Args:
             start_id (str): The ID of the entity to start from.
             max_depth (int, optional): The maximum depth to traverse. Defaults to 2.
             edge_label (str, optional): The label of the edges to traverse. Defaults to None.
+            edge_labels (Iterable[str], optional): Only follow edges with one of these labels;
+                takes precedence over `edge_label`. Defaults to None (all edges).
+            unique_vertices (str, optional): ArangoDB's uniqueVertices option: 'global', 'path'
+                or 'none'. Defaults to 'none'; 'global' requires 'bfs' order.
+            order (str, optional): 'bfs' or 'dfs'. Defaults to 'bfs' for global uniqueness and
+                'dfs' otherwise.
+            max_fanout (Union[int, Sequence[int]], optional): The maximum number of neighbors
+                followed from each vertex; a sequence gives the cap per depth, starting with the
+                start entity. Requires unique_vertices='global'. Capped traversals run one query
+                per depth. Defaults to None (no cap).
+            max_results (int, optional): The maximum number of paths returned. Defaults to None
+                (every path).
 
         Returns:
-            List[Dict[str, Any]]: A list of traversed paths.
+            TraversalResult: A list of traversed paths, with truncation metadata.
+
+        Raises:
+            ValueError: If the uniqueness, order or fan-out options are invalid.
         """
         self.logger.info(f"Traversing graph from start_id: {start_id}, max_depth: {max_depth}, edge_label: {edge_label}")
-        query = """
-        FOR v, e, p IN 1..@max_depth OUTBOUND @start_id @@edge_collection
-        FILTER @edge_label == null OR e.label == @edge_label
-        RETURN {
-            vertices: p.vertices[*]._key,
-            edges: p.edges[*].label
-        }
+        if edge_labels is None and edge_label is not None:
+            edge_labels = [edge_label]
+        order = order or self._default_order(unique_vertices)
+        self._check_traversal_options(unique_vertices, order, max_fanout)
+        snapshot = self._fresh_snapshot() if unique_vertices == 'global' else None
+        if max_fanout is not None or snapshot is not None:
+            result = self._breadth_first_traversal([start_id], max_depth, edge_labels, max_fanout, max_results,
+                                                   snapshot)[start_id]
+        else:
+            query, bind_vars = self._traversal_query('@start_id', edge_labels, unique_vertices, order, max_results)
+            bind_vars.update(start_id=start_id, max_depth=max_depth)
+            result = self._bounded_paths(self.execute_aql(query, bind_vars=bind_vars), max_results)
+        if result.truncated:
+            self.logger.warning(f"Traversal from {start_id} truncated at {max_results} paths")
+        return result
+
+    def get_connected_entities_batch(self, start_ids: Sequence[str], edge_labels: Iterable[str] = None,
+                                     limit_per_source: int = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Retrieve the entities connected to many start entities in a single AQL query.
+
+        Args:
+            start_ids (Sequence[str]): The IDs of the entities to start from.
+            edge_labels (Iterable[str], optional): Only follow edges with one of these labels.
+                Defaults to None (all edges).
+            limit_per_source (int, optional): The maximum number of neighbors returned per
+                start entity. Defaults to None (no limit).
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: Each start ID mapped to its connected entities, in the
+            `{entity, edge}` form returned by `get_connected_entities`.
+        """
+        self.logger.info(f"Getting connected entities for {len(start_ids)} start ids, edge_labels: {edge_labels}")
+        query = f"""
+        FOR s IN @start_ids
+            LET neighbors = (
+                FOR v, e IN 1..1 OUTBOUND s @@edge_collection
+                FILTER @edge_labels == null OR e.label IN @edge_labels
+                {'LIMIT @limit' if limit_per_source is not None else ''}
+                RETURN {{entity: v, edge: e}}
+            )
+            RETURN {{source: s, results: neighbors}}
         """
         bind_vars = {
-            'start_id': start_id,
             '@edge_collection': 'Edges',
-            'max_depth': max_depth,
-            'edge_label': edge_label
+            'edge_labels': list(edge_labels) if edge_labels is not None else None,
         }
-        return self.execute_aql(query, bind_vars=bind_vars)
\ No newline at end of file
+        if limit_per_source is not None:
+            bind_vars['limit'] = limit_per_source
+        return self._run_per_source(query, start_ids, bind_vars)
+
+    def traverse_graph_batch(self, start_ids: Sequence[str], max_depth: int = 2, edge_labels: Iterable[str] = None,
+                             limit_per_source: Optional[int] = None, unique_vertices: str = 'none',
+                             order: str = None,
+                             max_fanout: Union[int, Sequence[int]] = None) -> Dict[str, "TraversalResult"]:
+        """
+        Traverse the graph from many start entities in a single AQL query.
+
+        Each start entity gets its own traversal, bounded as in `traverse_graph`.
+
+        Args:
+            start_ids (Sequence[str]): The IDs of the entities to start from.
+            max_depth (int, optional): The maximum depth to traverse. Defaults to 2.
+            edge_labels (Iterable[str], optional): Only follow edges with one of these labels.
+                Defaults to None (all edges).
+            limit_per_source (int, optional): The maximum number of paths returned per start
+                entity. Defaults to None (every path).
+            unique_vertices (str, optional): ArangoDB's uniqueVertices option. Defaults to 'none'.
+            order (str, optional): 'bfs' or 'dfs'. Defaults as in `traverse_graph`.
+            max_fanout (Union[int, Sequence[int]], optional): Fan-out cap, as in `traverse_graph`.
+
+        Returns:
+            Dict[str, TraversalResult]: Each start ID mapped to its paths, in the
+            `{vertices, edges}` form returned by `traverse_graph`.
+
+        Raises:
+            ValueError: If the uniqueness, order or fan-out options are invalid.
+        """
+        self.logger.info(f"Traversing graph from {len(start_ids)} start ids, max_depth: {max_depth}, "
+                         f"edge_labels: {edge_labels}")
+        order = order or self._default_order(unique_vertices)
+        self._check_traversal_options(unique_vertices, order, max_fanout)
+        snapshot = self._fresh_snapshot() if unique_vertices == 'global' else None
+        if max_fanout is not None or snapshot is not None:
+            results = self._breadth_first_traversal(start_ids, max_depth, edge_labels, max_fanout, limit_per_source,
+                                                    snapshot)
+        else:
+            traversal, bind_vars = self._traversal_query('s', edge_labels, unique_vertices, order, limit_per_source)
+            bind_vars['max_depth'] = max_depth
+            query = f"""
+            FOR s IN @start_ids
+                LET paths = ({traversal})
+                RETURN {{source: s, results: paths}}
+            """
+            grouped = self._run_per_source(query, start_ids, bind_vars)
+            results = {source: self._bounded_paths(paths, limit_per_source) for source, paths in grouped.items()}
+        truncated = [source for source, paths in results.items() if paths.truncated]
+        if truncated:
+            self.logger.warning(f"Traversals from {len(truncated)} of {len(results)} start ids truncated "
+                                f"at {limit_per_source} paths")
+        return results
+
+    def _run_per_source(self, query: str, start_ids: Sequence[str],
+                        bind_vars: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """Run a query that returns one `{source, results}` row per start ID and group its results."""
+        unique_ids = list(dict.fromkeys(start_ids))
+        grouped: Dict[str, List[Dict[str, Any]]] = {start_id: [] for start_id in unique_ids}
+        if not unique_ids:
+            return grouped
+        for row in self.execute_aql(query, bind_vars=dict(bind_vars, start_ids=unique_ids)):
+            grouped[row['source']] = row['results']
+        return grouped
+
+    @staticmethod
+    def _default_order(unique_vertices: str) -> str:
+        """Return the traversal order to use when the caller gives none."""
+        return 'bfs' if unique_vertices == 'global' else 'dfs'
+
+    @staticmethod
+    def _check_traversal_options(unique_vertices: str, order: str, max_fanout: Optional[Union[int, Sequence[int]]]):
+        """Reject option combinations ArangoDB (or the fan-out traversal) does not support."""
+        if unique_vertices not in UNIQUE_VERTICES_OPTIONS:
+            raise ValueError(f"unique_vertices must be one of {UNIQUE_VERTICES_OPTIONS}")
+        if order not in TRAVERSAL_ORDERS:
+            raise ValueError(f"order must be one of {TRAVERSAL_ORDERS}")
+        if unique_vertices == 'global' and order != 'bfs':
+            raise ValueError("unique_vertices='global' requires order='bfs'")
+        if max_fanout is not None and unique_vertices != 'global':
+            raise ValueError("max_fanout requires unique_vertices='global'")
+        if max_fanout is not None and not isinstance(max_fanout, int) and not list(max_fanout):
+            raise ValueError("max_fanout must be an int or a non-empty sequence")
+
+    @staticmethod
+    def _traversal_query(start: str, edge_labels: Optional[Iterable[str]], unique_vertices: str, order: str,
+                         max_results: Optional[int]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build a bounded traversal from `start`, a bind parameter or variable name.
+
+        Returns:
+            Tuple[str, Dict[str, Any]]: The AQL and its bind variables, except @max_depth.
+        """
+        bind_vars: Dict[str, Any] = {'@edge_collection': 'Edges'}
+        prune, label_filter, limit = '', '', ''
+        if edge_labels is not None:
+            bind_vars['edge_labels'] = sorted(set(edge_labels))
+            # PRUNE stops expanding past other edges; the path FILTER drops the pruned vertices
+            # and is applied by ArangoDB while expanding, before they count as visited
+            prune = 'PRUNE e != null AND e.label NOT IN @edge_labels'
+            label_filter = 'FILTER p.edges[*].label ALL IN @edge_labels'
+        if max_results is not None:
+            # One extra path tells a full result apart from a truncated one
+            bind_vars['limit'] = max_results + 1
+            limit = 'LIMIT @limit'
+
+        query = f"""
+            FOR v, e, p IN 1..@max_depth OUTBOUND {start} @@edge_collection
+                {prune}
+                OPTIONS {{uniqueVertices: "{unique_vertices}", order: "{order}"}}
+                {label_filter}
+                {limit}
+                RETURN {{
+                    vertices: p.vertices[*]._key,
+                    edges: p.edges[*].label
+                }}
+        """
+        return query, bind_vars
+
+    def _fresh_snapshot(self) -> Optional[GraphSnapshot]:
+        """Return the graph snapshot if one is configured and still matches the Edges collection."""
+        if self.graph_snapshot is not None and self.graph_snapshot.is_fresh():
+            return self.graph_snapshot
+        return None
+
+    def _breadth_first_traversal(self, start_ids: Sequence[str], max_depth: int,
+                                 edge_labels: Optional[Iterable[str]],
+                                 max_fanout: Optional[Union[int, Sequence[int]]], max_results: Optional[int],
+                                 snapshot: GraphSnapshot = None) -> Dict[str, "TraversalResult"]:
+        """
+        Traverse breadth-first one depth at a time, following at most the fan-out cap of neighbors per vertex.
+
+        Neighbors come from the graph snapshot when one is given. Otherwise each depth is a
+        batched AQL query over the whole frontier, since AQL traversals cannot limit neighbors
+        per vertex. Vertices are visited once per start entity, as with uniqueVertices 'global'.
+        """
+        caps = None
+        if max_fanout is not None:
+            caps = [max_fanout] if isinstance(max_fanout, int) else list(max_fanout)
+            caps += caps[-1:] * (max_depth - len(caps))
+        labels = sorted(set(edge_labels)) if edge_labels is not None else None
+        unique_ids = list(dict.fromkeys(start_ids))
+        results = {start_id: TraversalResult() for start_id in unique_ids}
+        # Per start entity, the first path that reached each vertex id
+        reached = {start_id: {start_id: {'vertices': [start_id.split('/')[-1]], 'edges': []}}
+                   for start_id in unique_ids}
+        frontier = {start_id: [start_id] for start_id in unique_ids}
+        query = """
+        FOR s IN @start_ids
+            LET neighbors = (
+                FOR v, e IN 1..1 OUTBOUND s @@edge_collection
+                    FILTER @edge_labels == null OR e.label IN @edge_labels
+                    LIMIT @fanout_probe
+                    RETURN {id: v._id, key: v._key, label: e.label}
+            )
+            RETURN {source: s, results: neighbors}
+        """
+
+        for depth in range(max_depth):
+            vertex_ids = [vertex_id for vertices in frontier.values() for vertex_id in vertices]
+            if not vertex_ids:
+                break
+            cap = caps[depth] if caps is not None else None
+            # One neighbor past the cap tells a capped vertex apart from one with exactly `cap` neighbors
+            probe = cap + 1 if cap is not None else None
+            if snapshot is not None:
+                neighbors = snapshot.neighbor_lists(vertex_ids, labels, probe)
+            else:
+                neighbors = self._run_per_source(query, vertex_ids, {
+                    '@edge_collection': 'Edges',
+                    'edge_labels': labels,
+                    'fanout_probe': probe,
+                })
+            for start_id, vertices in frontier.items():
+                result, paths = results[start_id], reached[start_id]
+                frontier[start_id] = []
+                for vertex_id in vertices:
+                    followed = neighbors.get(vertex_id, [])
+                    if cap is not None and len(followed) > cap:
+                        followed = followed[:cap]
+                        result.capped_vertices.append(paths[vertex_id]['vertices'][-1])
+                    for neighbor in followed:
+                        if neighbor['id'] in paths:
+                            continue
+                        if max_results is not None and len(result) >= max_results:
+                            result.truncated = True
+                            break
+                        path = {'vertices': paths[vertex_id]['vertices'] + [neighbor['key']],
+                                'edges': paths[vertex_id]['edges'] + [neighbor['label']]}
+                        paths[neighbor['id']] = path
+                        result.append(path)
+                        frontier[start_id].append(neighbor['id'])
+                    if result.truncated:
+                        frontier[start_id] = []
+                        break
+        return results
+
+    @staticmethod
+    def _bounded_paths(rows: List[Dict[str, Any]], max_results: Optional[int]) -> "TraversalResult":
+        """Cut traversal rows down to `max_results`, recording whether anything was dropped."""
+        truncated = max_results is not None and len(rows) > max_results
+        return TraversalResult(rows[:max_results] if truncated else rows, truncated=truncated)
+
+
+class TraversalResult(list):
+    """
+    Paths returned by a traversal, with metadata on how the traversal was bounded.
+
+    Attributes:
+        truncated (bool): More paths matched than the result cap allowed.
+        capped_vertices (List[str]): Keys of vertices that had more neighbors than the fan-out
+            cap, so only some of their neighbors were followed.
+    """
+
+    def __init__(self, paths: Iterable[Dict[str, Any]] = (), truncated: bool = False,
+                 capped_vertices: List[str] = None):
+        super().__init__(paths)
+        self.truncated = truncated
+        self.capped_vertices = capped_vertices or []
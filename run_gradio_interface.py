@@ -1,4 +1,5 @@
 import logging
+import os
 import sys
 import traceback
 from dotenv import load_dotenv
@@ -6,6 +7,16 @@ from omics_oracle.spoke_wrapper import SpokeWrapper
 from omics_oracle.query_manager import QueryManager
 from omics_oracle.gradio_interface import create_styled_interface
 from omics_oracle.openai_wrapper import OpenAIWrapper
+from omics_oracle.llm_cache import LLMCache
+from omics_oracle.rate_limiter import RateLimiter
+from omics_oracle.model_router import ModelRouter
+from omics_oracle.aql_cache import AQLResultCache
+from omics_oracle.graph_snapshot import GraphSnapshot
+from omics_oracle.schema_cache import SchemaCache
+from omics_oracle.aql_guard import AQLGuard
+from omics_oracle.aql_memory import AQLMemory
+from omics_oracle.query_profiler import QueryProfiler
+from omics_oracle.metrics import MetricsServer, QueryMetrics
 
 # Configure logging to file and console
 logging.basicConfig(level=logging.DEBUG,
@@ -36,22 +47,115 @@ def main():
         logger.error(f"Failed to load environment variables: {e}\n\n{traceback.format_exc()}")
         sys.exit(1)
 
+    result_cache = None
+    cache_max_bytes = int(os.getenv('AQL_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    if cache_max_bytes > 0:
+        cache_ttl = os.getenv('AQL_CACHE_TTL')
+        result_cache = AQLResultCache(
+            max_bytes=cache_max_bytes,
+            ttl=float(cache_ttl) if cache_ttl else None,
+            revision_check_interval=float(os.getenv('AQL_CACHE_REVISION_INTERVAL', '60'))
+        )
+
+    graph_snapshot = None
+    if os.getenv('GRAPH_SNAPSHOT_PATH'):
+        try:
+            graph_snapshot = GraphSnapshot.load(os.getenv('GRAPH_SNAPSHOT_PATH'))
+        except FileNotFoundError:
+            logger.warning(f"No graph snapshot at {os.getenv('GRAPH_SNAPSHOT_PATH')}, using ArangoDB for all queries")
+
+    profiler = None
+    if os.getenv('AQL_PROFILE', '').lower() in ('1', 'true', 'yes'):
+        profiler = QueryProfiler(
+            slow_query_log=os.getenv('AQL_SLOW_QUERY_LOG', 'slow_queries.jsonl'),
+            threshold=float(os.getenv('AQL_SLOW_QUERY_SECONDS', '1.0'))
+        )
+
     try:
-        spoke_wrapper = SpokeWrapper()
+        spoke_wrapper = SpokeWrapper(result_cache=result_cache, graph_snapshot=graph_snapshot, profiler=profiler)
         logger.info("SpokeWrapper initialized successfully.")
     except Exception as e:
         logger.error(f"Failed to initialize SpokeWrapper: {e}\n\n{traceback.format_exc()}")
         sys.exit(1)
 
     try:
-        openai_wrapper = OpenAIWrapper()
+        ttl = os.getenv('LLM_CACHE_TTL')
+        llm_cache = LLMCache(path=os.getenv('LLM_CACHE_PATH', 'llm_cache.sqlite3'),
+                             ttl=float(ttl) if ttl else None)
+        logger.info("LLM response cache initialized successfully.")
+    except Exception as e:
+        logger.error(f"Failed to initialize LLM response cache: {e}\n\n{traceback.format_exc()}")
+        sys.exit(1)
+
+    rate_limiter = None
+    requests_per_second = os.getenv('OPENAI_REQUESTS_PER_SECOND')
+    tokens_per_minute = os.getenv('OPENAI_TOKENS_PER_MINUTE')
+    if requests_per_second or tokens_per_minute:
+        rate_limiter = RateLimiter(
+            requests_per_second=float(requests_per_second) if requests_per_second else None,
+            tokens_per_minute=float(tokens_per_minute) if tokens_per_minute else None
+        )
+        logger.info("OpenAI rate limiter initialized successfully.")
+
+    cascades = {}
+    if os.getenv('AQL_GENERATION_MODELS'):
+        cascades['aql_generation'] = [m.strip() for m in os.getenv('AQL_GENERATION_MODELS').split(',') if m.strip()]
+    if os.getenv('INTERPRETATION_MODEL'):
+        cascades['interpretation'] = [os.getenv('INTERPRETATION_MODEL')]
+    metrics = QueryMetrics()
+    model_router = ModelRouter(cascades, metrics=metrics)
+    if os.getenv('METRICS_PORT'):
+        MetricsServer(metrics.registry, int(os.getenv('METRICS_PORT')),
+                      host=os.getenv('METRICS_HOST', '127.0.0.1')).start()
+
+    try:
+        openai_wrapper = OpenAIWrapper(cache=llm_cache, rate_limiter=rate_limiter,
+                                       model=model_router.primary_model('interpretation'))
         logger.info("OpenAIWrapper initialized successfully.")
     except Exception as e:
         logger.error(f"Failed to initialize OpenAIWrapper: {e}\n\n{traceback.format_exc()}")
         sys.exit(1)
 
+    cap_limit = int(os.getenv('AQL_CAP_LIMIT', '1000'))
+    aql_guard = AQLGuard(
+        max_cost=float(os.getenv('AQL_MAX_COST', '1e7')),
+        max_items=int(float(os.getenv('AQL_MAX_ITEMS', '1e6'))),
+        cap_limit=cap_limit if cap_limit > 0 else None,
+        max_runtime=float(os.getenv('AQL_MAX_RUNTIME', '60')),
+        memory_limit=int(os.getenv('AQL_MEMORY_LIMIT', str(1024 ** 3)))
+    )
+
+    aql_memory = None
+    if os.getenv('AQL_MEMORY_PATH', 'aql_memory.sqlite3'):
+        try:
+            aql_memory = AQLMemory(
+                path=os.getenv('AQL_MEMORY_PATH', 'aql_memory.sqlite3'),
+                reuse_threshold=float(os.getenv('AQL_MEMORY_REUSE_SIMILARITY', '0.95')),
+                parametrize_threshold=float(os.getenv('AQL_MEMORY_PARAMETRIZE_SIMILARITY', '0.6')),
+                example_threshold=float(os.getenv('AQL_MEMORY_EXAMPLE_SIMILARITY', '0.4'))
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize AQL memory: {e}\n\n{traceback.format_exc()}")
+            sys.exit(1)
+
+    chunk_tokens = os.getenv('INTERPRETATION_CHUNK_TOKENS')
+
     try:
-        query_manager = QueryManager(spoke_wrapper, openai_wrapper)
+        query_manager = QueryManager(
+            spoke_wrapper, openai_wrapper, llm_cache=llm_cache, model_router=model_router,
+            speculative_candidates=int(os.getenv('SPECULATIVE_AQL_CANDIDATES', '1')),
+            speculative_time_budget=float(os.getenv('SPECULATIVE_TIME_BUDGET', '60')),
+            schema_cache=SchemaCache(os.getenv('SCHEMA_CACHE_PATH', 'arango_schema_cache.json')),
+            aql_guard=aql_guard,
+            max_concurrent_queries=int(os.getenv('MAX_CONCURRENT_QUERIES', '8')),
+            metrics=metrics,
+            aql_memory=aql_memory,
+            aql_top_k=int(os.getenv('AQL_TOP_K', '10')),
+            interpretation_chunk_tokens=int(chunk_tokens) if chunk_tokens else None,
+            interpretation_max_concurrency=int(os.getenv('INTERPRETATION_MAX_CONCURRENCY', '4')),
+            interpretation_token_budget=int(os.getenv('INTERPRETATION_TOKEN_BUDGET', '24000')),
+            rate_limiter=rate_limiter
+        )
         logger.info("QueryManager initialized successfully.")
     except Exception as e:
         logger.error(f"Failed to initialize QueryManager: {e}\n\n{traceback.format_exc()}")
@@ -70,6 +174,11 @@ def main():
         interface.launch(share=True, debug=True)
     except KeyboardInterrupt:
         logger.info("Gracefully shutting down the server...")
+        logger.info(f"Model routing summary: {model_router.summary()}")
+        if result_cache is not None:
+            logger.info(f"AQL result cache: {result_cache.stats()}")
+        if profiler is not None:
+            logger.info(f"AQL profiler: {profiler.stats()}")
         interface.close()
         sys.exit(0)
     except Exception as e:
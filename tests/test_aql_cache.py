@@ -0,0 +1,90 @@
+from unittest.mock import Mock, patch
+from omics_oracle.aql_cache import AQLResultCache, is_read_only, normalize_aql
+
+def test_normalize_ignores_whitespace_case_and_comments():
+    a = "FOR v IN Genes\n  FILTER v.name == @name // by name\n  RETURN v"
+    b = "for v in Genes filter v.name==@name /* by\nname */ return v"
+
+    assert normalize_aql(a) == normalize_aql(b) == "FOR v IN Genes FILTER v.name==@name RETURN v"
+
+def test_normalize_keeps_names_and_strings():
+    assert normalize_aql("for g in genes return g") != normalize_aql("for g in Genes return g")
+    assert normalize_aql("RETURN 'A  b'") != normalize_aql("RETURN 'a b'")
+    assert normalize_aql("RETURN length(g.Return)") == "RETURN LENGTH(g.Return)"
+
+def test_make_key_canonicalizes_bind_vars():
+    key = AQLResultCache.make_key("RETURN [@a, @b]", {'a': 1, 'b': {'y': 2, 'x': 3}})
+
+    assert key == AQLResultCache.make_key("return  [@a,@b]", {'b': {'x': 3, 'y': 2}, 'a': 1})
+    assert key != AQLResultCache.make_key("RETURN [@a, @b]", {'a': 1, 'b': {'y': 2, 'x': 4}})
+    assert key != AQLResultCache.make_key("RETURN [@a, @b]", {'a': 1, 'b': {'y': 2, 'x': 3}}, max_rows=5)
+
+def test_write_queries_are_not_cached():
+    assert not is_read_only("FOR g IN Genes UPDATE g WITH {seen: true} IN Genes")
+    assert is_read_only("FOR g IN Genes FILTER g.status == 'UPDATE' RETURN g")
+    assert AQLResultCache.make_key("INSERT {a: 1} INTO Genes") is None
+
+def test_get_returns_copies():
+    cache = AQLResultCache()
+    key = cache.make_key("RETURN 1")
+    cache.set(key, [{'a': [1]}])
+
+    first = cache.get(key)
+    first[0]['a'].append(2)
+
+    assert cache.get(key) == [{'a': [1]}]
+    assert cache.stats()['hits'] == 2
+
+def test_evicts_least_recently_used_by_size():
+    cache = AQLResultCache(max_bytes=30, max_entry_bytes=30)
+    keys = [cache.make_key(f"RETURN {n}") for n in range(3)]
+    cache.set(keys[0], ['x' * 8])
+    cache.set(keys[1], ['y' * 8])
+    cache.get(keys[0])
+    cache.set(keys[2], ['z' * 8])
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == ['x' * 8]
+    assert cache.get(keys[2]) == ['z' * 8]
+    assert cache.stats()['bytes'] <= 30
+
+def test_skips_oversized_results():
+    cache = AQLResultCache(max_bytes=100)
+    key = cache.make_key("RETURN 1")
+    cache.set(key, ['x' * 50])
+
+    assert cache.get(key) is None
+    assert cache.stats()['entries'] == 0
+
+def test_entries_expire_after_ttl():
+    cache = AQLResultCache(ttl=10)
+    key = cache.make_key("RETURN 1")
+    with patch('omics_oracle.aql_cache.time.monotonic', return_value=100.0):
+        cache.set(key, [1])
+    with patch('omics_oracle.aql_cache.time.monotonic', return_value=105.0):
+        assert cache.get(key) == [1]
+    with patch('omics_oracle.aql_cache.time.monotonic', return_value=111.0):
+        assert cache.get(key) is None
+
+def test_revision_change_clears_cache():
+    revision = Mock(return_value=('Genes', '1', 'rev1'))
+    cache = AQLResultCache(revision=revision, revision_check_interval=60)
+    key = cache.make_key("RETURN 1")
+    with patch('omics_oracle.aql_cache.time.monotonic', return_value=0.0):
+        cache.set(key, [1])
+        assert cache.get(key) == [1]
+    revision.return_value = ('Genes', '1', 'rev2')
+    with patch('omics_oracle.aql_cache.time.monotonic', return_value=30.0):
+        assert cache.get(key) == [1]
+    with patch('omics_oracle.aql_cache.time.monotonic', return_value=61.0):
+        assert cache.get(key) is None
+
+    assert revision.call_count == 2
+    assert cache.stats()['invalidations'] == 1
+
+def test_revision_errors_keep_cache():
+    cache = AQLResultCache(revision=Mock(side_effect=Exception("connection refused")))
+    key = cache.make_key("RETURN 1")
+    cache.set(key, [1])
+
+    assert cache.get(key) == [1]
@@ -0,0 +1,94 @@
+from unittest.mock import MagicMock
+from arango import AQLQueryExecuteError
+from omics_oracle.aql_guard import AQLGuard, AQLGuardError, GuardDecision, inject_limit, record_decisions
+
+def make_db(*estimates):
+    db = MagicMock()
+    db.aql.explain.side_effect = [{'estimatedCost': cost, 'estimatedNrItems': items} for cost, items in estimates]
+    return db
+
+def test_inject_limit_before_top_level_return():
+    query = "FOR g IN Genes\n  LET d = (FOR x IN Diseases RETURN x)\n  RETURN {g, d}"
+
+    assert inject_limit(query, 50) == "FOR g IN Genes\n  LET d = (FOR x IN Diseases RETURN x)\n  LIMIT 50\nRETURN {g, d}"
+    assert inject_limit("for g in Genes return g", 5) == "for g in Genes LIMIT 5\nreturn g"
+    assert inject_limit("RETURN LENGTH(FOR g IN Genes RETURN g)", 5) is None
+    assert inject_limit("FOR g IN Genes FILTER g.name == 'RETURN' RETURN g", 5).endswith("LIMIT 5\nRETURN g")
+
+def test_review_allows_cheap_query():
+    decision = AQLGuard(max_cost=100, max_items=10).review(make_db((50, 5)), "FOR g IN Genes RETURN g")
+
+    assert decision == GuardDecision('allowed', "FOR g IN Genes RETURN g", estimated_cost=50, estimated_items=5)
+
+def test_review_caps_expensive_query():
+    guard = AQLGuard(max_cost=100, max_items=10, cap_limit=10)
+
+    decision = guard.review(make_db((5000, 5000), (80, 10)), "FOR g IN Genes RETURN g")
+
+    assert decision.action == 'capped'
+    assert decision.query == "FOR g IN Genes LIMIT 10\nRETURN g"
+    assert (decision.estimated_cost, decision.capped_cost) == (5000, 80)
+
+def test_review_rejects_when_capping_does_not_help():
+    guard = AQLGuard(max_cost=100, max_items=10, cap_limit=10)
+
+    decision = guard.review(make_db((5000, 5), (4000, 5)), "FOR g IN Genes SORT g.score RETURN g")
+
+    assert decision.action == 'rejected'
+    assert "estimated cost 5000 exceeds the budget of 100" in decision.reason
+
+def test_review_rejects_without_cap_limit():
+    decision = AQLGuard(max_items=10, cap_limit=None).review(make_db((1, 500)), "FOR g IN Genes RETURN g")
+
+    assert decision.action == 'rejected'
+    assert "estimated 500 result rows" in decision.reason
+
+def test_review_rejects_writes():
+    db = make_db()
+
+    decision = AQLGuard().review(db, "FOR g IN Genes REMOVE g IN Genes")
+
+    assert decision.action == 'rejected'
+    db.aql.explain.assert_not_called()
+
+def test_review_rejects_when_capped_query_fails_to_explain():
+    db = MagicMock()
+    db.aql.explain.side_effect = [{'estimatedCost': 5000, 'estimatedNrItems': 5000}, Exception("connection reset")]
+
+    decision = AQLGuard(max_cost=100, max_items=10, cap_limit=10).review(db, "FOR g IN Genes RETURN g")
+
+    assert decision.action == 'rejected'
+    assert decision.query == "FOR g IN Genes RETURN g"
+    assert "estimated cost 5000 exceeds the budget of 100" in decision.reason
+    assert "connection reset" in decision.reason
+
+def test_review_lets_unexplainable_query_run():
+    db = MagicMock()
+    db.aql.explain.side_effect = Exception("syntax error")
+
+    decision = AQLGuard().review(db, "FOR g IN")
+
+    assert decision.action == 'allowed'
+    assert "syntax error" in decision.reason
+
+def test_execution_options():
+    guard = AQLGuard(max_runtime=60, memory_limit=1024)
+
+    assert guard.execution_options(batch_size=10) == {'batch_size': 10, 'max_runtime': 60, 'memory_limit': 1024}
+    assert guard.execution_options(max_runtime=5)['max_runtime'] == 5
+    assert guard.execution_options(max_runtime=500)['max_runtime'] == 60
+
+def test_decisions_are_recorded():
+    guard = AQLGuard()
+    guard.review(make_db((1, 1)), "RETURN 1")
+
+    with record_decisions() as decisions:
+        guard.review(make_db((1, 1)), "FOR g IN Genes RETURN g")
+
+    assert [d.query for d in decisions] == ["FOR g IN Genes RETURN g"]
+
+def test_guard_error_looks_like_an_execution_error():
+    error = AQLGuardError(GuardDecision('rejected', "FOR g IN Genes RETURN g", reason="too expensive"))
+
+    assert isinstance(error, AQLQueryExecuteError)
+    assert error.error_message == "Query rejected before execution: too expensive"
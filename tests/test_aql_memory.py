@@ -0,0 +1,119 @@
+from omics_oracle.aql_memory import AQLMemory, char_ngrams, normalize_question, parametrize
+
+DIABETES = "Which genes are associated with Type 2 Diabetes?"
+DIABETES_AQL = "FOR d IN Disease FILTER d.name == 'Type 2 Diabetes' FOR g IN 1 INBOUND d ASSOCIATES_DaG RETURN g.name"
+BRCA1 = "What pathways does BRCA1 participate in?"
+BRCA1_AQL = "FOR g IN Gene FILTER g.name == 'BRCA1' FOR p IN 1 OUTBOUND g PARTICIPATES_GpPW RETURN p.name"
+
+
+def make_memory(**kwargs):
+    memory = AQLMemory(**kwargs)
+    memory.record(DIABETES, DIABETES_AQL, 5)
+    memory.record(BRCA1, BRCA1_AQL, 3)
+    memory.record("List compounds that treat asthma", "FOR c IN Compound RETURN c", 3)
+    return memory
+
+
+def test_char_ngrams_pad_words():
+    counts = char_ngrams("tp53 gene", (3, 3))
+    assert counts[" tp"] == 1 and counts["53 "] == 1
+    assert "3 g" not in counts
+
+
+def test_only_queries_with_rows_are_recorded():
+    memory = AQLMemory()
+    memory.record(DIABETES, DIABETES_AQL, 0)
+    memory.record(DIABETES, "  ", 4)
+    assert len(memory) == 0
+    memory.record(DIABETES, DIABETES_AQL, 4)
+    memory.record(DIABETES.upper(), DIABETES_AQL, 4)
+    assert len(memory) == 1
+
+
+def test_search_ranks_by_similarity():
+    matches = make_memory().search("which genes are associated with type 2 diabetes", k=3)
+    assert matches[0][0].question == DIABETES
+    assert matches[0][1] > 0.99
+    assert all(similarity < 0.2 for _, similarity in matches[1:])
+    assert AQLMemory().search(DIABETES) == []
+
+
+def test_repeated_question_reuses_aql():
+    match = make_memory().match("  which genes are associated with type 2 diabetes? ")
+    assert match.aql_query == DIABETES_AQL
+    assert not match.parametrized
+
+
+def test_near_duplicate_is_parametrized():
+    match = make_memory().match("What pathways does TP53 participate in?")
+    assert match.question == BRCA1
+    assert match.parametrized
+    assert match.aql_query == BRCA1_AQL.replace("'BRCA1'", "'TP53'")
+
+
+def test_parametrize_escapes_quotes():
+    aql = parametrize(DIABETES, "Which genes are associated with Crohn's disease?", DIABETES_AQL)
+    assert "'Crohn\\'s disease'" in aql
+    assert parametrize(DIABETES, "Which genes are linked to Type 2 Diabetes?", DIABETES_AQL) is None
+
+
+def test_parametrize_replaces_whole_words_only():
+    old, new = "Which genes are associated with type 2 diabetes?", "Which genes are associated with type 1 diabetes?"
+    assert parametrize(old, new, "FOR d IN Disease FILTER d.name == 'type 2 diabetes' RETURN d") == \
+        "FOR d IN Disease FILTER d.name == 'type 1 diabetes' RETURN d"
+    assert parametrize(old, new, "FOR d IN Disease FILTER d.identifier == 'DOID:9352' RETURN d") is None
+    assert parametrize(old, new, "FOR d IN Disease FILTER d.name == 'type 2 diabetes' "
+                                 "AND d.identifier == 'DOID:9352' RETURN d") is None
+    assert make_memory().match("Which genes are associated with Type 1 Diabetes?").aql_query == \
+        DIABETES_AQL.replace("Type 2", "Type 1")
+
+
+def test_aql_filtering_on_a_dropped_word_is_not_reused_unchanged():
+    memory = make_memory(reuse_threshold=0.5)
+    # 'BRCA1' is missing from the question and the AQL filters on it, but the questions
+    # differ in more than one place, so it cannot be parametrized either
+    assert memory.match("What pathways does TP53 take part in?") is None
+    # Dropping a word the AQL does not depend on keeps it reusable
+    assert memory.match("Which genes associated with Type 2 Diabetes?").aql_query == DIABETES_AQL
+
+
+def test_added_words_are_not_reused_unchanged():
+    memory = AQLMemory()
+    memory.record("Which genes are associated with asthma?", "FOR d IN Disease FILTER d.name == 'asthma' RETURN d", 3)
+    for question in ("Which genes are not associated with asthma?",
+                     "Which genes are associated with asthma in children?"):
+        assert memory.search(question, k=1)[0][1] < 0.95
+        assert memory.match(question) is None
+
+
+def test_moderate_matches_become_examples():
+    memory = make_memory()
+    question = "Which genes are linked to Type 2 Diabetes?"
+    assert memory.match(question) is None
+    examples = memory.examples(question)
+    assert [example.question for example in examples] == [DIABETES]
+    text = AQLMemory.format_examples(examples)
+    assert f"Question: {DIABETES}" in text and f"AQL: {DIABETES_AQL}" in text
+    assert memory.examples("What drugs target EGFR?") == []
+
+
+def test_entries_survive_restart(tmp_path):
+    path = str(tmp_path / "memory.sqlite3")
+    memory = make_memory(path=path)
+    memory.forget(BRCA1)
+    memory.mark_used(DIABETES)
+    reopened = AQLMemory(path=path)
+    assert len(reopened) == 2
+    assert reopened.match(DIABETES).aql_query == DIABETES_AQL
+    assert reopened.search(DIABETES, k=1)[0][0].hits == 1
+
+
+def test_least_used_entries_are_evicted():
+    memory = AQLMemory(max_entries=2)
+    memory.record(DIABETES, DIABETES_AQL, 5)
+    memory.record(BRCA1, BRCA1_AQL, 3)
+    memory.mark_used(DIABETES)
+    memory.record("List compounds that treat asthma", "FOR c IN Compound RETURN c", 3)
+    assert len(memory) == 2
+    assert memory.match(BRCA1) is None
+    assert normalize_question(memory.search(DIABETES, k=1)[0][0].question) == normalize_question(DIABETES)
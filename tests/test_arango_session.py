@@ -0,0 +1,217 @@
+import pytest
+import requests
+from unittest.mock import MagicMock, Mock, patch
+from arango.database import StandardDatabase
+from omics_oracle.aql_cache import AQLResultCache
+from omics_oracle.aql_guard import AQLGuard, AQLGuardError
+from omics_oracle.arango_session import ArangoSession, PooledArangoGraph
+from omics_oracle.metrics import QueryMetrics
+from omics_oracle.query_profiler import QueryProfiler
+from omics_oracle.schema_cache import SchemaCache
+
+@pytest.fixture
+def mock_arango_client():
+    with patch('omics_oracle.arango_session.ArangoClient') as mock_client:
+        mock_client.return_value.db.side_effect = lambda *args, **kwargs: MagicMock(spec=StandardDatabase)
+        yield mock_client
+
+@pytest.fixture
+def session(mock_arango_client):
+    return ArangoSession('http://arango:8529', 'spoke', 'user', 'secret', pool_size=2)
+
+def test_session_opens_one_handle_at_startup(session, mock_arango_client):
+    mock_arango_client.assert_called_once()
+    mock_arango_client.return_value.db.assert_called_once_with('spoke', username='user', password='secret')
+    assert session.pool.stats()['idle'] == 1
+
+def test_session_fails_fast_on_bad_credentials(mock_arango_client):
+    # Opening a handle makes no request; the first request is what fails
+    db = MagicMock(spec=StandardDatabase)
+    db.version.side_effect = Exception("401 not authorized")
+    mock_arango_client.return_value.db.side_effect = None
+    mock_arango_client.return_value.db.return_value = db
+
+    with pytest.raises(Exception, match="not authorized"):
+        ArangoSession('http://arango:8529', 'spoke', 'user', 'wrong')
+    db.version.assert_called_once()
+
+def test_from_env_reads_pool_size(mock_arango_client):
+    with patch('omics_oracle.arango_session.load_dotenv', return_value=True), \
+         patch.dict('os.environ', {'ARANGO_HOST': 'h', 'ARANGO_DB': 'd', 'ARANGO_USERNAME': 'u',
+                                   'ARANGO_PASSWORD': 'p', 'ARANGO_POOL_SIZE': '7'}):
+        session = ArangoSession.from_env()
+
+    assert session.pool.size == 7
+    assert session.db_name == 'd'
+
+def test_graph_generates_schema_once(session):
+    with patch.object(PooledArangoGraph, 'generate_schema', return_value={'Graph Schema': [], 'Collection Schema': []}) as generate:
+        graph = PooledArangoGraph(session)
+
+    generate.assert_called_once()
+    assert graph.schema == {'Graph Schema': [], 'Collection Schema': []}
+
+def test_graph_queries_run_on_pooled_handles(session):
+    with patch.object(PooledArangoGraph, 'generate_schema', return_value={}):
+        graph = PooledArangoGraph(session)
+    with session.connection() as pooled_db:
+        cursor = MagicMock()
+        cursor.__iter__.return_value = iter([{'n': 1}, {'n': 2}, {'n': 3}])
+        cursor.has_more.return_value = True
+        pooled_db.aql.execute.return_value = cursor
+
+    assert graph.query("FOR n IN 1..3 RETURN {n}", top_k=2) == [{'n': 1}, {'n': 2}]
+    pooled_db.aql.execute.assert_called_once_with("FOR n IN 1..3 RETURN {n}", batch_size=2)
+    cursor.close.assert_called_once_with(ignore_missing=True)
+    graph.db.aql.execute.assert_not_called()
+
+def test_revision_fingerprints_user_collections(session):
+    with session.connection() as db:
+        db.collections.return_value = [
+            {'name': 'Genes', 'id': '12', 'system': False},
+            {'name': '_users', 'id': '3', 'system': True},
+            {'name': 'Compounds', 'id': '10', 'system': False},
+        ]
+        db.collection.side_effect = lambda name: Mock(revision=Mock(return_value=f"{name}-rev"))
+
+    assert session.revision() == (('Compounds', '10', 'Compounds-rev'), ('Genes', '12', 'Genes-rev'))
+
+def test_graph_queries_use_result_cache(session):
+    with patch.object(PooledArangoGraph, 'generate_schema', return_value={}):
+        graph = PooledArangoGraph(session, result_cache=AQLResultCache())
+    with session.connection() as pooled_db:
+        pooled_db.aql.execute.side_effect = lambda *args, **kwargs: MagicMock(
+            __iter__=Mock(return_value=iter([{'n': 1}])), has_more=Mock(return_value=False))
+
+    assert graph.query("RETURN {n: 1}", top_k=10) == [{'n': 1}]
+    assert graph.query("return {n:1}", top_k=10) == [{'n': 1}]
+    assert graph.query("RETURN {n: 1}", top_k=5) == [{'n': 1}]
+    assert pooled_db.aql.execute.call_count == 2
+
+def test_graph_cache_key_ignores_execution_options(session):
+    with patch.object(PooledArangoGraph, 'generate_schema', return_value={}):
+        graph = PooledArangoGraph(session, result_cache=AQLResultCache())
+    with session.connection() as pooled_db:
+        pooled_db.aql.execute.side_effect = lambda *args, **kwargs: MagicMock(
+            __iter__=Mock(return_value=iter([{'n': 1}])), has_more=Mock(return_value=False))
+
+    assert graph.query("RETURN {n: 1}", top_k=10, max_runtime=12.5) == [{'n': 1}]
+    assert graph.query("RETURN {n: 1}", top_k=10, max_runtime=7.25, memory_limit=1024) == [{'n': 1}]
+    assert graph.query("RETURN {n: 1}", top_k=10, full_count=True) == [{'n': 1}]
+    assert pooled_db.aql.execute.call_count == 2
+
+def test_graph_cold_start_saves_schema(session, tmp_path):
+    schema_cache = SchemaCache(str(tmp_path / "schema.json"))
+    with patch('omics_oracle.arango_session.database_fingerprint', return_value="fp1"), \
+         patch.object(PooledArangoGraph, 'generate_schema', return_value={'Collection Schema': ['genes']}) as generate:
+        graph = PooledArangoGraph(session, schema_cache=schema_cache)
+
+    generate.assert_called_once()
+    assert graph.schema_refresh is None
+    assert schema_cache.load("http://arango:8529/spoke").fingerprint == "fp1"
+
+def test_graph_warm_start_uses_cached_schema(session, tmp_path):
+    schema_cache = SchemaCache(str(tmp_path / "schema.json"))
+    schema_cache.save("http://arango:8529/spoke", "fp1", {'Collection Schema': ['cached']})
+    with patch('omics_oracle.arango_session.database_fingerprint', return_value="fp1"), \
+         patch.object(PooledArangoGraph, 'generate_schema') as generate:
+        graph = PooledArangoGraph(session, schema_cache=schema_cache)
+        graph.schema_refresh.join()
+
+    generate.assert_not_called()
+    assert graph.schema == {'Collection Schema': ['cached']}
+
+def test_graph_refreshes_schema_when_fingerprint_changes(session, tmp_path):
+    schema_cache = SchemaCache(str(tmp_path / "schema.json"))
+    schema_cache.save("http://arango:8529/spoke", "fp1", {'Collection Schema': ['cached']})
+    with patch('omics_oracle.arango_session.database_fingerprint', return_value="fp2"), \
+         patch.object(PooledArangoGraph, 'generate_schema', return_value={'Collection Schema': ['fresh']}):
+        graph = PooledArangoGraph(session, schema_cache=schema_cache)
+        graph.schema_refresh.join()
+
+    assert graph.schema == {'Collection Schema': ['fresh']}
+    cached = schema_cache.load("http://arango:8529/spoke")
+    assert (cached.fingerprint, cached.schema) == ("fp2", {'Collection Schema': ['fresh']})
+
+def test_graph_guard_caps_and_limits_queries(session):
+    with patch.object(PooledArangoGraph, 'generate_schema', return_value={}):
+        graph = PooledArangoGraph(session, guard=AQLGuard(max_items=10, cap_limit=10, max_runtime=30,
+                                                          memory_limit=2048))
+    with session.connection() as pooled_db:
+        pooled_db.aql.explain.side_effect = [{'estimatedCost': 1, 'estimatedNrItems': 1000},
+                                             {'estimatedCost': 1, 'estimatedNrItems': 10}]
+        pooled_db.aql.execute.return_value = MagicMock(__iter__=Mock(return_value=iter([{'n': 1}])),
+                                                       has_more=Mock(return_value=False))
+
+    assert graph.query("FOR n IN Nodes RETURN n", top_k=10) == [{'n': 1}]
+    pooled_db.aql.execute.assert_called_once_with("FOR n IN Nodes LIMIT 10\nRETURN n", batch_size=10,
+                                                  max_runtime=30, memory_limit=2048)
+
+def test_graph_guard_rejects_queries(session):
+    with patch.object(PooledArangoGraph, 'generate_schema', return_value={}):
+        graph = PooledArangoGraph(session, guard=AQLGuard())
+    with session.connection() as pooled_db:
+        pass
+
+    with pytest.raises(AQLGuardError, match="data-modification"):
+        graph.query("FOR n IN Nodes REMOVE n IN Nodes")
+    pooled_db.aql.execute.assert_not_called()
+
+def test_graph_profiles_queries(session):
+    profiler = MagicMock(spec=QueryProfiler)
+    profiler.execution_options.side_effect = lambda **kwargs: {**kwargs, 'profile': 2}
+    with patch.object(PooledArangoGraph, 'generate_schema', return_value={}):
+        graph = PooledArangoGraph(session, profiler=profiler)
+    with session.connection() as pooled_db:
+        cursor = MagicMock(__iter__=Mock(return_value=iter([{'n': 1}])), has_more=Mock(return_value=False))
+        pooled_db.aql.execute.return_value = cursor
+
+    graph.query("FOR n IN Nodes RETURN n", bind_vars={'a': 1})
+
+    pooled_db.aql.execute.assert_called_once_with("FOR n IN Nodes RETURN n", bind_vars={'a': 1}, profile=2)
+    args, kwargs = profiler.record.call_args
+    assert args[:5] == (pooled_db, "FOR n IN Nodes RETURN n", {'a': 1}, cursor, 1)
+    assert kwargs == {'source': 'graph'}
+
+def test_graph_records_execution_metrics(session):
+    metrics = QueryMetrics()
+    with patch.object(PooledArangoGraph, 'generate_schema', return_value={}):
+        graph = PooledArangoGraph(session, guard=AQLGuard(), metrics=metrics)
+    with session.connection() as pooled_db:
+        pooled_db.aql.explain.return_value = {'estimatedCost': 1, 'estimatedNrItems': 2}
+        pooled_db.aql.execute.return_value = MagicMock(__iter__=Mock(return_value=iter([{'n': 1}, {'n': 2}])),
+                                                       has_more=Mock(return_value=False))
+
+    graph.query("FOR n IN Nodes RETURN n")
+    with pytest.raises(AQLGuardError):
+        graph.query("FOR n IN Nodes REMOVE n IN Nodes")
+
+    assert metrics.stage_seconds.count(stage='aql_execution', outcome='ok') == 1
+    assert metrics.stage_errors.value(stage='aql_execution', error='AQLGuardError') == 1
+    assert metrics.result_rows.count() == 1
+
+def test_pooled_handles_have_their_own_http_sessions():
+    # Real python-arango clients: opening a handle makes no request, and version() is stubbed
+    with patch.object(StandardDatabase, 'version', return_value='3.11.0'):
+        session = ArangoSession('http://arango:8529', 'spoke', 'user', 'secret', pool_size=2)
+        with session.connection() as a, session.connection() as b:
+            assert a.conn._sessions[0] is not b.conn._sessions[0]
+        session.close()
+
+    assert session._clients == {}
+
+def test_connection_errors_replace_the_http_session():
+    with patch.object(StandardDatabase, 'version', return_value='3.11.0') as version:
+        session = ArangoSession('http://arango:8529', 'spoke', 'user', 'secret', pool_size=1)
+        with session.connection() as db:
+            broken = db.conn._sessions[0]
+        version.side_effect = requests.ConnectionError("connection reset")
+        with pytest.raises(requests.ConnectionError):
+            with session.connection() as db:
+                db.version()
+        version.side_effect = None
+
+        with session.connection() as db:
+            assert db.conn._sessions[0] is not broken
+        assert session.pool.discarded == 1
+        session.close()
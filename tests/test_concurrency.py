@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+import threading
+from omics_oracle.concurrency import close_on_loop, gather_bounded, run_sync
+
+def test_gather_bounded_preserves_order():
+    async def delayed(value, delay):
+        await asyncio.sleep(delay)
+        return value
+
+    factories = [lambda v=v: delayed(v, 0.02 - v * 0.005) for v in range(4)]
+
+    assert asyncio.run(gather_bounded(factories, max_concurrency=4)) == [0, 1, 2, 3]
+
+def test_gather_bounded_limits_in_flight():
+    in_flight = 0
+    peak = 0
+
+    async def work():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.005)
+        in_flight -= 1
+
+    asyncio.run(gather_bounded([work for _ in range(12)], max_concurrency=4))
+
+    assert peak == 4
+
+def test_gather_bounded_cancels_remaining_on_failure():
+    finished = []
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def slow():
+        await asyncio.sleep(1)
+        finished.append(True)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(gather_bounded([fail, slow, slow], max_concurrency=3))
+
+    assert finished == []
+
+def test_gather_bounded_return_exceptions():
+    async def fail():
+        raise ValueError("bad")
+
+    async def ok():
+        return "ok"
+
+    results = asyncio.run(gather_bounded([ok, fail], max_concurrency=2, return_exceptions=True))
+
+    assert results[0] == "ok"
+    assert isinstance(results[1], ValueError)
+
+def test_gather_bounded_rejects_invalid_limit():
+    with pytest.raises(ValueError, match="max_concurrency must be at least 1"):
+        asyncio.run(gather_bounded([], max_concurrency=0))
+
+def test_run_sync_inside_running_loop():
+    async def inner():
+        return 1
+
+    async def outer():
+        return run_sync(inner())
+
+    with pytest.raises(RuntimeError, match="running event loop"):
+        asyncio.run(outer())
+
+def test_close_on_loop_runs_close_on_the_owning_loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    closed_on = []
+
+    async def close():
+        closed_on.append(asyncio.get_running_loop())
+
+    try:
+        assert close_on_loop(close, loop)
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), loop).result(timeout=5)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+    assert closed_on == [loop]
+    assert not close_on_loop(close, loop)
+    assert not close_on_loop(close, None)
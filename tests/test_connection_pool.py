@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import Mock
+from omics_oracle.connection_pool import ConnectionPool, PoolTimeoutError
+
+def counter_factory():
+    count = iter(range(1000))
+    return lambda: f"conn{next(count)}"
+
+def test_connections_are_created_lazily_and_reused():
+    pool = ConnectionPool(counter_factory(), size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first == second == "conn0"
+    assert pool.stats() == {'open': 1, 'idle': 1, 'in_use': 0, 'created': 1, 'discarded': 0}
+
+def test_acquire_times_out_when_pool_is_exhausted():
+    pool = ConnectionPool(counter_factory(), size=1, timeout=0.05)
+    pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+def test_waiting_caller_gets_released_connection():
+    pool = ConnectionPool(counter_factory(), size=1, timeout=5)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+
+    assert pool.acquire() == conn
+
+def test_waiting_caller_reconnects_when_connection_is_discarded():
+    pool = ConnectionPool(counter_factory(), size=1, timeout=5)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(conn,), kwargs={'discard': True}).start()
+
+    assert pool.acquire() == "conn1"
+
+def test_stale_connection_failing_health_check_is_replaced():
+    close = Mock()
+    pool = ConnectionPool(counter_factory(), size=1, check_interval=0,
+                          health_check=lambda conn: conn != "conn0", close=close)
+    pool.release(pool.acquire())
+
+    assert pool.acquire() == "conn1"
+    close.assert_called_once_with("conn0")
+
+def test_broken_connection_is_dropped_after_error():
+    broken = set()
+    pool = ConnectionPool(counter_factory(), size=1, health_check=lambda conn: conn not in broken)
+
+    with pytest.raises(ConnectionError):
+        with pool.connection() as conn:
+            broken.add(conn)
+            raise ConnectionError("connection reset")
+    with pool.connection() as conn:
+        assert conn == "conn1"
+
+def test_healthy_connection_is_kept_after_error():
+    pool = ConnectionPool(counter_factory(), size=1, health_check=lambda conn: True)
+
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("bad query")
+
+    assert pool.stats()['idle'] == 1
+
+def test_query_errors_skip_the_health_check():
+    health_check = Mock(return_value=True)
+    pool = ConnectionPool(counter_factory(), size=1, health_check=health_check)
+
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("bad query")
+
+    def rows():
+        with pool.connection():
+            yield 1
+            yield 2
+    generator = rows()
+    next(generator)
+    generator.close()
+
+    health_check.assert_not_called()
+    assert pool.stats() == {'open': 1, 'idle': 1, 'in_use': 0, 'created': 1, 'discarded': 0}
+
+def test_failed_connect_frees_slot():
+    factory = Mock(side_effect=[OSError("refused"), "conn"])
+    pool = ConnectionPool(factory, size=1)
+
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.acquire() == "conn"
+
+def test_async_connection_does_not_block_event_loop():
+    pool = ConnectionPool(counter_factory(), size=1, timeout=5)
+    held = pool.acquire()
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.ensure_future(ticker())
+        asyncio.get_running_loop().call_later(0.1, pool.release, held)
+        async with pool.aconnection() as conn:
+            task.cancel()
+            return conn, ticks
+
+    conn, ticks = asyncio.run(main())
+    assert conn == held
+    assert ticks > 3
+
+def test_closed_pool_rejects_acquire():
+    close = Mock()
+    pool = ConnectionPool(counter_factory(), size=1, close=close)
+    pool.release(pool.acquire())
+    pool.close()
+
+    close.assert_called_once_with("conn0")
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        ConnectionPool(counter_factory(), size=0)
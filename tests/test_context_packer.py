@@ -0,0 +1,95 @@
+import pytest
+from unittest.mock import patch
+from omics_oracle.context_packer import ContextPacker
+
+def word_count_encoder(text):
+    return text.split()
+
+@pytest.fixture(autouse=True)
+def fake_tokenizer():
+    # Count whitespace-separated words so budgets are deterministic and no BPE download is needed
+    with patch('omics_oracle.context_packer._load_encoder', return_value=word_count_encoder):
+        yield
+
+def make_row(gene_key, name, disease_key="5"):
+    return {
+        "entity": {"_id": f"Gene/{gene_key}", "_key": gene_key, "_rev": "_abc", "name": name, "description": ""},
+        "edge": {"_id": f"Edges/{gene_key}", "_key": gene_key, "_rev": "_def",
+                 "_from": f"Disease/{disease_key}", "_to": f"Gene/{gene_key}", "label": "ASSOCIATES_DaG"}
+    }
+
+def test_documents_are_deduplicated_and_referenced_by_alias():
+    packer = ContextPacker(max_tokens=1000)
+    node = {"_id": "Gene/1", "name": "TP53"}
+    rows = [{"source": node, "target": {"_id": "Gene/2", "name": "MDM2"}},
+            {"source": node, "target": {"_id": "Gene/3", "name": "ATM"}}]
+
+    packed = packer.pack(rows)
+
+    assert packed.count('"TP53"') == 1
+    assert '{"source":"n1","target":"n2"}' in packed
+    assert '{"source":"n1","target":"n3"}' in packed
+
+def test_bookkeeping_and_empty_fields_are_dropped():
+    packed = ContextPacker(max_tokens=1000).pack([make_row("1", "TP53")])
+
+    assert "_rev" not in packed
+    assert "_key" not in packed
+    assert "description" not in packed
+    assert '"_to":"n1"' in packed
+
+def test_identical_rows_are_collapsed():
+    packed = ContextPacker(max_tokens=1000).pack([{"gene": "TP53"}] * 5)
+
+    assert packed == '{"gene":"TP53"}'
+
+def test_budget_limits_output_and_reports_omissions():
+    rows = [{"gene": f"GENE{i}", "score": i} for i in range(100)]
+    packer = ContextPacker(max_tokens=10)
+
+    packed = packer.pack(rows)
+
+    kept = [line for line in packed.splitlines() if line.startswith("{")]
+    assert sum(packer.count_tokens(line) for line in kept) <= 10
+    assert packed.endswith(f"({100 - len(kept)} of 100 distinct rows omitted to fit the context budget)")
+
+def test_rows_are_ranked_by_question_relevance():
+    rows = [make_row(str(i), f"GENE{i}") for i in range(20)] + [make_row("99", "INSULIN")]
+    packer = ContextPacker(max_tokens=3)
+
+    packed = packer.pack(rows, query="How does insulin relate to diabetes?")
+
+    assert "INSULIN" in packed
+    assert "GENE0" not in packed
+
+def test_non_list_results_are_packed():
+    assert ContextPacker().pack({"gene": "TP53"}) == '{"gene":"TP53"}'
+    assert ContextPacker().pack([]) == "[]"
+
+def test_token_count_falls_back_without_tiktoken_data():
+    with patch('omics_oracle.context_packer._load_encoder', return_value=None):
+        assert ContextPacker().count_tokens("x" * 40) == 11
+
+def test_chunks_carry_their_own_documents():
+    packer = ContextPacker()
+    rows = [{"gene": {"_id": f"Gene/{i}", "name": f"G{i}"}} for i in range(6)]
+
+    chunks = packer.chunk(rows, chunk_tokens=4)
+
+    # Each row costs one token and its gene document another
+    assert len(chunks) == 3
+    assert all(chunk.startswith("Documents:\n") for chunk in chunks)
+    assert 'n3={"name":"G2"}' in chunks[1]
+    assert 'n1=' not in chunks[1]
+
+def test_chunks_respect_max_chunks_and_report_omissions():
+    packer = ContextPacker()
+    rows = [{"gene": f"GENE{i}"} for i in range(10)]
+
+    chunks = packer.chunk(rows, query="What about gene9?", chunk_tokens=3, max_chunks=2)
+
+    assert len(chunks) == 2
+    assert chunks[0].splitlines()[0] == '{"gene":"GENE9"}'
+    assert chunks[-1].endswith("(4 of 10 distinct rows omitted to fit the context budget)")
+    assert (chunks.omitted, chunks.total) == (4, 10)
+    assert packer.chunk([]) == []
@@ -1,6 +1,10 @@
+import asyncio
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, AsyncMock, patch
 from omics_oracle.gemini_wrapper import GeminiWrapper
+from omics_oracle.llm_cache import LLMCache
+from omics_oracle.rate_limiter import RateLimiter
+import requests
 
 @pytest.fixture
 def gemini_wrapper():
@@ -12,7 +16,7 @@ def gemini_wrapper():
             return GeminiWrapper()
 
 def test_send_query(gemini_wrapper):
-    with patch('omics_oracle.gemini_wrapper.requests.post') as mock_post:
+    with patch.object(gemini_wrapper.session, 'post') as mock_post:
         mock_response = Mock()
         mock_response.json.return_value = {"choices": [{"message": {"content": "Test response"}}]}
         mock_response.status_code = 200
@@ -23,6 +27,64 @@ def test_send_query(gemini_wrapper):
         
         assert response == {"choices": [{"message": {"content": "Test response"}}]}
         mock_post.assert_called_once()
+        assert mock_post.call_args[0][0] == 'https://test.api.com'
+        assert mock_post.call_args[1]['timeout'] == (5.0, 60.0)
+
+def test_session_is_pooled_and_reused(gemini_wrapper):
+    adapter = gemini_wrapper.session.get_adapter('https://test.api.com')
+    assert adapter._pool_maxsize == 10
+    assert gemini_wrapper.session.headers['Authorization'] == 'test_key'
+
+    with patch.object(gemini_wrapper.session, 'post') as mock_post:
+        mock_post.return_value.json.return_value = {"choices": [{"message": {"content": "ok"}}]}
+        gemini_wrapper.send_query("First query")
+        gemini_wrapper.send_query("Second query")
+
+    assert mock_post.call_count == 2
+
+def test_custom_timeouts_and_pool_size():
+    with patch('omics_oracle.gemini_wrapper.load_dotenv', return_value=True):
+        with patch.dict('os.environ', {
+            'GEMINI_AUTH': 'test_key',
+            'GEMINI_URL': 'https://test.api.com'
+        }):
+            wrapper = GeminiWrapper(connect_timeout=1.5, read_timeout=30.0, pool_maxsize=4)
+
+    assert wrapper.timeout == (1.5, 30.0)
+    assert wrapper.session.get_adapter('https://test.api.com')._pool_maxsize == 4
+
+def test_close_releases_session(gemini_wrapper):
+    with patch.object(gemini_wrapper.session, 'close') as mock_close:
+        with gemini_wrapper:
+            pass
+    mock_close.assert_called_once()
+
+def test_send_query_uses_cache(gemini_wrapper):
+    gemini_wrapper.cache = LLMCache()
+    with patch.object(gemini_wrapper.session, 'post') as mock_post:
+        mock_post.return_value.json.return_value = {"choices": [{"message": {"content": "Test response"}}]}
+
+        first = gemini_wrapper.send_query("Test query")
+        second = gemini_wrapper.send_query("Test query")
+        gemini_wrapper.send_query("Test query", context="biomedical")
+
+    assert first == second
+    assert mock_post.call_count == 2
+
+def test_send_query_retries_rate_limited_requests(gemini_wrapper):
+    gemini_wrapper.rate_limiter = RateLimiter(requests_per_second=100, max_retries=2)
+    limited = Mock(status_code=429, headers={'retry-after': '1'})
+    limited.raise_for_status.side_effect = requests.HTTPError(response=limited)
+    ok = Mock(status_code=200, headers={})
+    ok.json.return_value = {"choices": [{"message": {"content": "Test response"}}]}
+
+    with patch.object(gemini_wrapper.session, 'post', side_effect=[limited, ok]) as mock_post, \
+         patch('omics_oracle.rate_limiter.time.sleep') as mock_sleep:
+        response = gemini_wrapper.send_query("Test query")
+
+    assert response == {"choices": [{"message": {"content": "Test response"}}]}
+    assert mock_post.call_count == 2
+    assert mock_sleep.call_args[0][0] == pytest.approx(1.0, abs=0.05)
 
 def test_interpret_response(gemini_wrapper):
     response = {"choices": [{"message": {"content": "Test content"}}]}
@@ -47,13 +109,64 @@ def test_interpret_spoke_results(gemini_wrapper):
         assert interpretation == "Interpretation of results"
         mock_send_query.assert_called_once()
 
+def test_interpret_spoke_results_packs_results(gemini_wrapper):
+    gemini_wrapper.context_packer = Mock()
+    gemini_wrapper.context_packer.pack.return_value = "PACKED RESULTS"
+    with patch.object(gemini_wrapper, 'send_query') as mock_send_query:
+        mock_send_query.return_value = {"choices": [{"message": {"content": "Interpretation"}}]}
+
+        gemini_wrapper.interpret_spoke_results([{"result": "data"}], "Original query")
+
+    gemini_wrapper.context_packer.pack.assert_called_once_with([{"result": "data"}], query="Original query")
+    assert "PACKED RESULTS" in mock_send_query.call_args[0][0]
+
 def test_error_handling(gemini_wrapper):
-    with patch('omics_oracle.gemini_wrapper.requests.post') as mock_post:
+    with patch.object(gemini_wrapper.session, 'post') as mock_post:
         mock_post.side_effect = Exception("API Error")
         
         with pytest.raises(Exception):
             gemini_wrapper.send_query("Test query")
 
+def test_asend_query(gemini_wrapper):
+    mock_response = Mock()
+    mock_response.json.return_value = {"choices": [{"message": {"content": "Async response"}}]}
+    mock_client = Mock()
+    mock_client.post = AsyncMock(return_value=mock_response)
+
+    with patch.object(gemini_wrapper, '_get_async_client', return_value=mock_client):
+        response = asyncio.run(gemini_wrapper.asend_query("Test query", context="general"))
+
+    assert response == {"choices": [{"message": {"content": "Async response"}}]}
+    assert mock_client.post.call_args[0][0] == 'https://test.api.com'
+
+def test_agenerate_aql_query(gemini_wrapper):
+    with patch.object(gemini_wrapper, 'asend_query', new_callable=AsyncMock) as mock_asend_query:
+        mock_asend_query.return_value = {"choices": [{"message": {"content": "AQL: FOR doc IN collection RETURN doc"}}]}
+
+        aql_query = asyncio.run(gemini_wrapper.agenerate_aql_query("Find all documents"))
+
+    assert aql_query == "FOR doc IN collection RETURN doc"
+    mock_asend_query.assert_awaited_once_with("Find all documents", context="aql_generation")
+
+def test_ainterpret_spoke_results(gemini_wrapper):
+    with patch.object(gemini_wrapper, 'asend_query', new_callable=AsyncMock) as mock_asend_query:
+        mock_asend_query.return_value = {"choices": [{"message": {"content": "Interpretation of results"}}]}
+
+        interpretation = asyncio.run(gemini_wrapper.ainterpret_spoke_results([{"result": "data"}], "Original query"))
+
+    assert interpretation == "Interpretation of results"
+    assert mock_asend_query.call_args[1] == {"context": "biomedical"}
+
+def test_send_queries_keeps_order(gemini_wrapper):
+    async def fake_asend_query(query, context="general"):
+        await asyncio.sleep(0.01 if query.endswith("0") else 0)
+        return {"choices": [{"message": {"content": query}}]}
+
+    with patch.object(gemini_wrapper, 'asend_query', side_effect=fake_asend_query):
+        responses = gemini_wrapper.send_queries(["query 0", "query 1", "query 2"], max_concurrency=2)
+
+    assert [gemini_wrapper.interpret_response(r) for r in responses] == ["query 0", "query 1", "query 2"]
+
 def test_load_environment_failure():
     with patch('omics_oracle.gemini_wrapper.load_dotenv', return_value=False):
         with pytest.raises(ValueError, match="Failed to load .env file"):
@@ -65,4 +178,26 @@ def test_missing_environment_variables():
             with pytest.raises(ValueError, match="GEMINI_AUTH and GEMINI_URL must be set in the .env file"):
                 GeminiWrapper()
 
-# Add more tests as needed to cover edge cases and error scenarios
\ No newline at end of file
+# Add more tests as needed to cover edge cases and error scenarios
+def test_async_client_of_a_running_loop_is_closed_when_replaced(gemini_wrapper):
+    import threading
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def get_client():
+        return gemini_wrapper._get_async_client()
+
+    try:
+        old_client = asyncio.run_coroutine_threadsafe(get_client(), loop).result(timeout=5)
+        new_client = asyncio.run(get_client())
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), loop).result(timeout=5)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+    assert new_client is not old_client
+    assert old_client.is_closed
+    assert not new_client.is_closed
+    asyncio.run(new_client.aclose())
@@ -1,6 +1,7 @@
+import asyncio
 import unittest
 from unittest.mock import patch, MagicMock, call
-from omics_oracle.gradio_interface import create_styled_interface, process_query, format_response
+from omics_oracle.gradio_interface import create_styled_interface, process_query, aprocess_query, format_response
 from omics_oracle.query_manager import QueryManager
 
 class TestGradioInterface(unittest.TestCase):
@@ -21,34 +22,46 @@ class TestGradioInterface(unittest.TestCase):
     @patch('omics_oracle.gradio_interface.logger')
     def test_process_query(self, mock_logger):
         mock_query_manager = MagicMock(spec=QueryManager)
-        mock_query_manager.process_query.return_value = {
+        final_response = {
             "original_query": "Test query",
             "aql_query": "FOR doc IN collection RETURN doc",
             "spoke_results": [{"result": "data"}],
             "interpretation": "Test interpretation"
         }
+        partial_response = dict(final_response, interpretation="Test")
+        mock_query_manager.stream_query.return_value = iter([partial_response, final_response])
 
-        result = process_query("Test query", mock_query_manager)
+        results = list(process_query("Test query", mock_query_manager))
 
-        expected_result = format_response(mock_query_manager.process_query.return_value)
-        self.assertEqual(result, expected_result)
+        expected_result = format_response(final_response)
+        self.assertEqual(results[-1], expected_result)
+        self.assertEqual(results[0], "Generating and executing the AQL query...")
+        self.assertIn("Interpretation: Test\n\n", results[1])
 
-        # Updated expected log messages to match the new logging calls
         expected_calls = [
             call("Received query: Test query"),
             call("Starting to process the query with QueryManager..."),
-            call(f"QueryManager returned response: {mock_query_manager.process_query.return_value}"),
-            call(f"Formatting response: {mock_query_manager.process_query.return_value}"),
+            call(f"QueryManager returned response: {final_response}"),
+            call(f"Formatting response: {final_response}"),
             call(f"Formatted response: {expected_result}")
         ]
         mock_logger.debug.assert_has_calls(expected_calls, any_order=False)
 
+    @patch('omics_oracle.gradio_interface.logger')
+    def test_process_query_empty(self, mock_logger):
+        mock_query_manager = MagicMock(spec=QueryManager)
+
+        results = list(process_query("   ", mock_query_manager))
+
+        self.assertEqual(results, ["Error: Query cannot be empty. Please enter a valid query."])
+        mock_query_manager.stream_query.assert_not_called()
+
     @patch('omics_oracle.gradio_interface.logger')
     def test_process_query_unexpected_error(self, mock_logger):
         mock_query_manager = MagicMock(spec=QueryManager)
-        mock_query_manager.process_query.side_effect = Exception("Unexpected error")
+        mock_query_manager.stream_query.side_effect = Exception("Unexpected error")
 
-        result = process_query("Query causing unexpected error", mock_query_manager)
+        result = list(process_query("Query causing unexpected error", mock_query_manager))[-1]
 
         self.assertTrue(result.startswith("An unexpected error occurred. Please try again later. If the problem persists, contact support. Details: Unexpected error"))
 
@@ -61,9 +74,9 @@ class TestGradioInterface(unittest.TestCase):
     @patch('omics_oracle.gradio_interface.logger')
     def test_process_query_value_error(self, mock_logger):
         mock_query_manager = MagicMock(spec=QueryManager)
-        mock_query_manager.process_query.side_effect = ValueError("Invalid query format")
+        mock_query_manager.stream_query.side_effect = ValueError("Invalid query format")
 
-        result = process_query("Invalid query", mock_query_manager)
+        result = list(process_query("Invalid query", mock_query_manager))[-1]
 
         expected_result = "An error occurred: Invalid query format"
         self.assertEqual(result, expected_result)
@@ -74,6 +87,30 @@ class TestGradioInterface(unittest.TestCase):
         self.assertIn("ValueError while processing query: Invalid query format", error_log)
         self.assertIn("Traceback", error_log)
 
+    @patch('omics_oracle.gradio_interface.logger')
+    def test_aprocess_query(self, mock_logger):
+        mock_query_manager = MagicMock(spec=QueryManager)
+        final_response = {
+            "original_query": "Test query",
+            "aql_query": "FOR doc IN collection RETURN doc",
+            "interpretation": "Test interpretation"
+        }
+
+        async def stream(query):
+            yield dict(final_response, interpretation="Test")
+            yield final_response
+
+        mock_query_manager.astream_query = stream
+
+        async def collect():
+            return [update async for update in aprocess_query("Test query", mock_query_manager)]
+
+        results = asyncio.run(collect())
+
+        self.assertEqual(results[0], "Generating and executing the AQL query...")
+        self.assertIn("Interpretation: Test\n\n", results[1])
+        self.assertEqual(results[-1], format_response(final_response))
+
     def test_format_response(self):
         test_response = {
             "original_query": "Test query",
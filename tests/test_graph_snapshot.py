@@ -0,0 +1,89 @@
+import json
+import os
+import pytest
+import numpy as np
+from contextlib import contextmanager
+from unittest.mock import MagicMock, Mock, patch
+from omics_oracle.graph_snapshot import GraphSnapshot, main
+
+EDGES = [
+    ["Gene/1", "Gene/2", "INTERACTS"],
+    ["Gene/1", "Disease/9", "ASSOCIATES"],
+    ["Gene/2", "Gene/3", "INTERACTS"],
+    ["Gene/1", "Gene/3", "INTERACTS"],
+    ["Compound/7", "Gene/1", None],
+]
+
+class FakeSession:
+    def __init__(self, edges, revision="rev1"):
+        self.db = MagicMock()
+        self.db.aql.execute.return_value = iter(edges)
+        self.collection_revision = Mock(return_value=revision)
+
+    @contextmanager
+    def connection(self):
+        yield self.db
+
+@pytest.fixture
+def snapshot(tmp_path):
+    return GraphSnapshot.build(FakeSession(EDGES), str(tmp_path))
+
+def test_build_writes_csr_arrays(snapshot, tmp_path):
+    assert snapshot.vertices.tolist() == [b"Compound/7", b"Disease/9", b"Gene/1", b"Gene/2", b"Gene/3"]
+    assert snapshot.offsets.tolist() == [0, 1, 1, 4, 5, 5]
+    assert isinstance(snapshot.targets, np.memmap)
+    with open(os.path.join(tmp_path, "metadata.json")) as f:
+        metadata = json.load(f)
+    assert metadata['revision'] == "rev1"
+    assert metadata['edge_count'] == 5
+    assert metadata['label_names'] == ["ASSOCIATES", "INTERACTS", None]
+
+def test_neighbors_keep_export_order(snapshot):
+    assert snapshot.neighbors("Gene/1") == [
+        {'id': "Gene/2", 'key': "2", 'label': "INTERACTS"},
+        {'id': "Disease/9", 'key': "9", 'label': "ASSOCIATES"},
+        {'id': "Gene/3", 'key': "3", 'label': "INTERACTS"},
+    ]
+
+def test_neighbors_filter_and_limit(snapshot):
+    assert [n['id'] for n in snapshot.neighbors("Gene/1", ["INTERACTS"])] == ["Gene/2", "Gene/3"]
+    assert [n['id'] for n in snapshot.neighbors("Gene/1", limit=1)] == ["Gene/2"]
+    assert snapshot.neighbors("Gene/1", ["UNKNOWN"]) == []
+    assert snapshot.neighbors("Gene/404") == []
+    assert snapshot.neighbors("Gene/3") == []
+
+def test_load_missing_snapshot(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        GraphSnapshot.load(str(tmp_path))
+
+def test_stale_when_revision_changes(snapshot):
+    revision = Mock(return_value="rev1")
+    snapshot.revision, snapshot.check_interval = revision, 60
+    with patch('omics_oracle.graph_snapshot.time.monotonic', return_value=0.0):
+        assert snapshot.is_fresh()
+    revision.return_value = "rev2"
+    with patch('omics_oracle.graph_snapshot.time.monotonic', return_value=30.0):
+        assert snapshot.is_fresh()
+    with patch('omics_oracle.graph_snapshot.time.monotonic', return_value=61.0):
+        assert not snapshot.is_fresh()
+    assert revision.call_count == 2
+
+def test_revision_errors_keep_last_answer(snapshot):
+    snapshot.revision = Mock(side_effect=Exception("connection refused"))
+
+    assert snapshot.is_fresh()
+
+def test_stale_after_max_age(tmp_path):
+    GraphSnapshot.build(FakeSession(EDGES), str(tmp_path))
+
+    assert not GraphSnapshot.load(str(tmp_path), max_age=-1).is_fresh()
+    assert GraphSnapshot.load(str(tmp_path), max_age=3600).is_fresh()
+
+def test_main_builds_from_env(tmp_path):
+    session = FakeSession(EDGES)
+    session.close = Mock()
+    with patch('omics_oracle.graph_snapshot.ArangoSession.from_env', return_value=session):
+        main([str(tmp_path), "--edge-collection", "Edges"])
+
+    assert GraphSnapshot.load(str(tmp_path)).metadata['edge_count'] == 5
+    session.close.assert_called_once()
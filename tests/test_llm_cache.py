@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import patch
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+from omics_oracle.llm_cache import LLMCache, LangChainLLMCache
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    cache = LLMCache(path=str(tmp_path / "llm_cache.sqlite3"), max_memory_entries=2)
+    yield cache
+    cache.close()
+
+def test_make_key_depends_on_all_components():
+    messages = [{"role": "user", "content": "Which genes?"}]
+    key = LLMCache.make_key("gpt-4o", messages, 0, 256)
+
+    assert key == LLMCache.make_key("gpt-4o", messages, 0, 256)
+    assert key != LLMCache.make_key("gpt-4o-mini", messages, 0, 256)
+    assert key != LLMCache.make_key("gpt-4o", messages, 0.7, 256)
+    assert key != LLMCache.make_key("gpt-4o", messages, 0, 512)
+
+def test_memory_hit_and_miss_counters():
+    cache = LLMCache()
+
+    assert cache.get("key") is None
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["memory_hits"] == 1
+
+def test_memory_tier_is_lru_bounded():
+    memory_only = LLMCache(max_memory_entries=2)
+    memory_only.set("a", 1)
+    memory_only.set("b", 2)
+    memory_only.get("a")
+    memory_only.set("c", 3)
+
+    assert memory_only.get("b") is None
+    assert memory_only.get("a") == 1
+    assert memory_only.get("c") == 3
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    first = LLMCache(path=path)
+    first.set("key", {"choices": [{"message": {"content": "cached"}}]})
+    first.close()
+
+    second = LLMCache(path=path)
+    assert second.get("key") == {"choices": [{"message": {"content": "cached"}}]}
+    assert second.stats()["disk_hits"] == 1
+    second.close()
+
+def test_ttl_expires_entries(disk_cache):
+    disk_cache.ttl = 10
+    with patch('omics_oracle.llm_cache.time.time', return_value=1000.0):
+        disk_cache.set("key", "value")
+    with patch('omics_oracle.llm_cache.time.time', return_value=1005.0):
+        assert disk_cache.get("key") == "value"
+    with patch('omics_oracle.llm_cache.time.time', return_value=1011.0):
+        assert disk_cache.get("key") is None
+
+def test_disk_size_eviction_drops_least_recently_used(tmp_path):
+    cache = LLMCache(path=str(tmp_path / "llm_cache.sqlite3"), max_memory_entries=1, max_disk_bytes=25)
+    with patch('omics_oracle.llm_cache.time.time', side_effect=[1.0, 2.0, 3.0, 4.0]):
+        cache.set("old", "x" * 8)
+        cache.set("new", "y" * 8)
+        cache.set("newest", "z" * 8)
+
+    cache._memory.clear()
+    assert cache.get("old") is None
+    assert cache.get("new") == "y" * 8
+    assert cache.get("newest") == "z" * 8
+    cache.close()
+
+def test_bypass_skips_reads_and_writes():
+    cache = LLMCache()
+    cache.set("key", "value")
+    cache.bypass = True
+
+    assert cache.get("key") is None
+    cache.set("other", "value")
+    cache.bypass = False
+    assert cache.get("other") is None
+
+def test_langchain_adapter_round_trip(disk_cache):
+    adapter = LangChainLLMCache(disk_cache)
+    generations = [ChatGeneration(message=AIMessage(content="Scientific story"))]
+
+    adapter.update("prompt", "llm-config", generations)
+    disk_cache._memory.clear()
+
+    cached = adapter.lookup("prompt", "llm-config")
+    assert cached[0].message.content == "Scientific story"
+    assert adapter.lookup("prompt", "other-config") is None
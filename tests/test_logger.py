@@ -0,0 +1,52 @@
+import logging
+import os
+import pytest
+from unittest.mock import patch
+from omics_oracle.logger import capped_repr, setup_logger
+
+def truncate(text, max_length=100):
+    return text[:max_length] + "..." if len(text) > max_length else text
+
+@pytest.mark.parametrize("value", [
+    "plain text",
+    "x" * 500,
+    [1, 2.5, None, True, "two"],
+    (1,),
+    {'a': [{'b': "it's"}, 'say "hi"'], 'c': ()},
+    [{'_id': f"Gene/{i}", 'name': f"gene {i}", 'quote': "it's \"both\"\t"} for i in range(50)],
+])
+@pytest.mark.parametrize("max_length", [0, 10, 100, 1000])
+def test_capped_repr_matches_truncated_str(value, max_length):
+    assert capped_repr(value, max_length) == truncate(str(value), max_length)
+
+def test_capped_repr_handles_recursive_structures():
+    value = [1]
+    value.append(value)
+    assert capped_repr(value) == str(value)
+
+def test_capped_repr_stops_rendering_once_capped():
+    class Exploding:
+        def __repr__(self):
+            raise AssertionError("rendered past the cap")
+
+    assert capped_repr(["x" * 20, Exploding()], 10) == "['xxxxxxxx..."
+
+def test_setup_logger_reads_level_from_environment():
+    with patch.dict('os.environ', {'OMICS_ORACLE_LOG_LEVEL': 'warning'}), \
+         patch('omics_oracle.logger.logging.FileHandler', return_value=logging.NullHandler()):
+        logger = setup_logger('omics_oracle.test_env_level')
+    assert logger.level == logging.WARNING
+
+def test_setup_logger_defaults_to_info():
+    with patch.dict('os.environ'), \
+         patch('omics_oracle.logger.logging.FileHandler', return_value=logging.NullHandler()):
+        os.environ.pop('OMICS_ORACLE_LOG_LEVEL', None)
+        logger = setup_logger('omics_oracle.test_default_level')
+    assert logger.level == logging.INFO
+    assert not logger.isEnabledFor(logging.DEBUG)
+
+def test_setup_logger_attaches_handlers_once():
+    with patch('omics_oracle.logger.logging.FileHandler', side_effect=lambda _: logging.NullHandler()):
+        logger = setup_logger('omics_oracle.test_handlers_once')
+        setup_logger('omics_oracle.test_handlers_once')
+    assert len(logger.handlers) == 2
@@ -0,0 +1,97 @@
+import urllib.error
+import urllib.request
+import pytest
+from unittest.mock import patch
+from omics_oracle.metrics import Counter, Histogram, MetricsRegistry, MetricsServer, QueryMetrics
+
+def test_counter():
+    counter = Counter('errors_total', "Errors.", ('stage',))
+    counter.inc(stage='aql')
+    counter.inc(2, stage='aql')
+
+    assert counter.value(stage='aql') == 3
+    assert counter.render() == ['# HELP errors_total Errors.', '# TYPE errors_total counter',
+                                'errors_total{stage="aql"} 3.0']
+    with pytest.raises(ValueError):
+        counter.inc(-1, stage='aql')
+    with pytest.raises(ValueError):
+        counter.inc(model='gpt-4o')
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('latency_seconds', "Latency.", ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value, stage='a"b')
+
+    assert histogram.count(stage='a"b') == 4
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{stage="a\\"b",le="0.1"} 1',
+        'latency_seconds_bucket{stage="a\\"b",le="1.0"} 3',
+        'latency_seconds_bucket{stage="a\\"b",le="+Inf"} 4',
+        'latency_seconds_sum{stage="a\\"b"} 6.25',
+        'latency_seconds_count{stage="a\\"b"} 4',
+    ]
+
+def test_registry_reuses_metrics():
+    registry = MetricsRegistry()
+    counter = registry.counter('requests_total', "Requests.")
+
+    assert registry.counter('requests_total', "Requests.") is counter
+    with pytest.raises(ValueError):
+        registry.histogram('requests_total', "Requests.")
+
+def test_nested_stages_are_excluded():
+    metrics = QueryMetrics()
+    # outer starts at 0, inner runs from 1 to 3, outer ends at 10
+    with patch('omics_oracle.metrics.time.perf_counter', side_effect=[0.0, 1.0, 3.0, 10.0]):
+        with metrics.stage('aql_generation'):
+            with metrics.stage('aql_execution'):
+                pass
+
+    rendered = metrics.registry.render()
+    assert 'omics_oracle_stage_duration_seconds_sum{stage="aql_execution",outcome="ok"} 2.0' in rendered
+    assert 'omics_oracle_stage_duration_seconds_sum{stage="aql_generation",outcome="ok"} 8.0' in rendered
+
+def test_stage_errors_are_counted():
+    metrics = QueryMetrics()
+
+    with pytest.raises(KeyError):
+        with metrics.stage('interpretation'):
+            raise KeyError("boom")
+
+    assert metrics.stage_errors.value(stage='interpretation', error='KeyError') == 1
+    assert metrics.stage_seconds.count(stage='interpretation', outcome='error') == 1
+
+def test_observe_request():
+    metrics = QueryMetrics()
+
+    metrics.observe_request({'aql_result': [1], 'attempt_count': 2}, 1.5)
+    metrics.observe_request({'aql_result': [], 'attempt_count': 3}, 2.0)
+    metrics.observe_request({'error': "boom"}, 0.1)
+
+    assert [metrics.request_seconds.count(outcome=o) for o in ('ok', 'empty', 'error')] == [1, 1, 1]
+    assert metrics.attempts.count() == 2
+
+def test_observe_llm_call():
+    metrics = QueryMetrics()
+
+    metrics.observe_llm_call('interpretation', 'gpt-4o', 1.2, 'accepted', 100, 20, 0.0008)
+
+    assert metrics.llm_tokens.value(stage='interpretation', model='gpt-4o', type='prompt') == 100
+    assert metrics.llm_tokens.value(stage='interpretation', model='gpt-4o', type='completion') == 20
+    assert metrics.llm_cost.value(stage='interpretation', model='gpt-4o') == pytest.approx(0.0008)
+
+def test_metrics_server():
+    registry = MetricsRegistry()
+    registry.counter('requests_total', "Requests.").inc()
+    server = MetricsServer(registry, port=0).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            body = response.read().decode()
+            content_type = response.headers['Content-Type']
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other")
+    finally:
+        server.stop()
+
+    assert content_type.startswith('text/plain; version=0.0.4')
+    assert 'requests_total 1.0' in body
@@ -0,0 +1,117 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import Mock
+from omics_oracle.metrics import QueryMetrics
+from omics_oracle.model_router import ModelRouter, model_cost
+
+@pytest.fixture
+def router():
+    return ModelRouter({'aql_generation': ['cheap', 'large']})
+
+def test_accepts_cheap_model_result(router):
+    call = Mock(return_value=[1])
+
+    result = router.run('aql_generation', call, check=lambda r: None if r else "empty")
+
+    assert result == [1]
+    call.assert_called_once_with('cheap')
+    assert [(d.model, d.outcome) for d in router.decisions] == [('cheap', 'accepted')]
+
+def test_escalates_on_rejected_result(router):
+    call = Mock(side_effect=[[], [1]])
+
+    result = router.run('aql_generation', call, check=lambda r: None if r else "empty")
+
+    assert result == [1]
+    assert [c.args[0] for c in call.call_args_list] == ['cheap', 'large']
+    assert [(d.model, d.outcome, d.reason) for d in router.decisions] == [
+        ('cheap', 'rejected', 'empty'), ('large', 'accepted', None)]
+
+def test_escalates_on_error(router):
+    call = Mock(side_effect=[ValueError("invalid AQL"), [1]])
+
+    assert router.run('aql_generation', call) == [1]
+    assert router.decisions[0].outcome == 'error'
+    assert router.decisions[0].reason == "invalid AQL"
+
+def test_last_model_error_is_raised(router):
+    call = Mock(side_effect=ValueError("invalid AQL"))
+
+    with pytest.raises(ValueError, match="invalid AQL"):
+        router.run('aql_generation', call)
+    assert len(router.decisions) == 2
+
+def test_last_model_result_returned_even_if_rejected(router):
+    assert router.run('aql_generation', Mock(return_value=[]), check=lambda r: "empty") == []
+
+def test_default_cascades(router):
+    assert router.primary_model('interpretation') == 'gpt-4o'
+    assert ModelRouter().models('aql_generation') == ['gpt-4o-mini', 'gpt-4o']
+
+def test_model_cost():
+    assert model_cost('gpt-4o', 1_000_000, 0) == pytest.approx(5.0)
+    assert model_cost('unknown-model', 1000, 1000) == 0.0
+
+def test_summary_reports_savings():
+    router = ModelRouter({'aql_generation': ['gpt-4o-mini', 'gpt-4o']})
+    router.run('aql_generation', Mock(return_value=[1]))
+    router.run('aql_generation', Mock(side_effect=[ValueError("bad"), [1]]))
+    router.decisions[0].prompt_tokens = 1000
+    router.decisions[0].cost = model_cost('gpt-4o-mini', 1000, 0)
+
+    summary = router.summary()['aql_generation']
+
+    assert summary['requests'] == 2
+    assert summary['resolved_without_escalation'] == 1
+    assert summary['escalations'] == 1
+    assert summary['cost_saved'] == pytest.approx(model_cost('gpt-4o', 1000, 0) - model_cost('gpt-4o-mini', 1000, 0))
+    assert summary['latency_saved'] is not None
+
+def test_arun_escalates_on_rejected_result(router):
+    async def call(model):
+        return [1] if model == 'large' else []
+
+    result = asyncio.run(router.arun('aql_generation', call, check=lambda r: None if r else "empty"))
+
+    assert result == [1]
+    assert [(d.model, d.outcome) for d in router.decisions] == [('cheap', 'rejected'), ('large', 'accepted')]
+
+def test_calls_are_recorded_in_metrics():
+    metrics = QueryMetrics()
+    router = ModelRouter({'aql_generation': ['cheap', 'large']}, metrics=metrics)
+
+    router.run('aql_generation', Mock(side_effect=[ValueError("invalid AQL"), [1]]))
+
+    assert metrics.llm_seconds.count(stage='aql_generation', model='cheap', outcome='error') == 1
+    assert metrics.llm_seconds.count(stage='aql_generation', model='large', outcome='accepted') == 1
+
+def test_latency_excludes_nested_stages():
+    metrics = QueryMetrics()
+    router = ModelRouter({'aql_generation': ['cheap', 'large']}, metrics=metrics)
+
+    def call(model):
+        with metrics.stage('aql_execution'):
+            time.sleep(0.05)
+        return [1]
+
+    with metrics.stage('aql_generation'):
+        router.run('aql_generation', call)
+
+    assert router.decisions[0].latency < 0.04
+    assert metrics.stage_seconds.count(stage='aql_execution', outcome='ok') == 1
+
+def test_arun_latency_excludes_nested_stages():
+    metrics = QueryMetrics()
+    router = ModelRouter({'aql_generation': ['cheap', 'large']}, metrics=metrics)
+
+    async def call(model):
+        def execute():
+            with metrics.stage('aql_execution'):
+                time.sleep(0.05)
+            return [1]
+        return await asyncio.to_thread(execute)
+
+    asyncio.run(router.arun('aql_generation', call))
+
+    assert router.decisions[0].latency < 0.04
@@ -1,6 +1,8 @@
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock, call
+from unittest.mock import patch, MagicMock, AsyncMock, call
 from omics_oracle.openai_wrapper import OpenAIWrapper
+from omics_oracle.llm_cache import LLMCache
 
 # Mock base prompt
 mock_base_prompt = "Mocked base prompt for testing"
@@ -75,6 +77,15 @@ class TestOpenAIWrapper:
             call("OpenAI response received: Test response")
         ])
 
+    def test_send_query_skips_debug_payloads_when_debug_is_disabled(self):
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "Test response"
+        self.wrapper.client.chat.completions.create.return_value = mock_response
+        self.mock_logger.isEnabledFor.return_value = False
+
+        assert self.wrapper.send_query("x" * 10000) == "Test response"
+        self.mock_logger.debug.assert_not_called()
+
     def test_send_query_error(self):
         self.wrapper.client.chat.completions.create.side_effect = Exception("API Error")
 
@@ -112,5 +123,125 @@ class TestOpenAIWrapper:
         assert "Error generating AQL: AQL Generation Error" in error_log
         assert "Traceback" in error_log
 
+    def test_send_query_uses_cache(self):
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "Cached response"
+        self.wrapper.client.chat.completions.create.return_value = mock_response
+        self.wrapper.cache = LLMCache()
+
+        first = self.wrapper.send_query("Test query")
+        second = self.wrapper.send_query("Test query")
+
+        assert first == second == "Cached response"
+        self.wrapper.client.chat.completions.create.assert_called_once()
+        assert self.wrapper.cache.stats()["hits"] == 1
+
+    def test_send_query_does_not_cache_errors(self):
+        self.wrapper.client.chat.completions.create.side_effect = Exception("API Error")
+        self.wrapper.cache = LLMCache()
+
+        self.wrapper.send_query("Test query")
+        self.wrapper.send_query("Test query")
+
+        assert self.wrapper.client.chat.completions.create.call_count == 2
+
+    def test_send_query_with_rate_limiter(self):
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "Limited response"
+        self.wrapper.client.chat.completions.create.return_value = mock_response
+        self.wrapper.rate_limiter = MagicMock()
+        self.wrapper.rate_limiter.call.side_effect = lambda func, tokens, **kwargs: func(**kwargs)
+
+        response = self.wrapper.send_query("Test query")
+
+        assert response == "Limited response"
+        assert self.wrapper.rate_limiter.call.call_args[1]["tokens"] > 0
+        self.wrapper.client.chat.completions.create.assert_called_once()
+
+    def test_stream_query(self):
+        chunks = []
+        for text in ["Hel", None, "lo"]:
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = text
+            chunks.append(chunk)
+        self.wrapper.client.chat.completions.create.return_value = iter(chunks)
+        self.wrapper.cache = LLMCache()
+
+        streamed = list(self.wrapper.stream_query("Test query"))
+
+        assert streamed == ["Hel", "lo"]
+        assert self.wrapper.client.chat.completions.create.call_args[1]["stream"] is True
+        assert list(self.wrapper.stream_query("Test query")) == ["Hello"]
+
+    def test_stream_query_error(self):
+        self.wrapper.client.chat.completions.create.side_effect = Exception("API Error")
+
+        with pytest.raises(Exception, match="API Error"):
+            list(self.wrapper.stream_query("Test query"))
+        assert "Error in OpenAI streaming API call: API Error" in self.mock_logger.error.call_args[0][0]
+
+    def test_stream_query_error_mid_stream(self):
+        def chunks():
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = "Partial"
+            yield chunk
+            raise ConnectionError("Stream dropped")
+        self.wrapper.client.chat.completions.create.return_value = chunks()
+        self.wrapper.cache = LLMCache()
+        streamed = []
+
+        with pytest.raises(ConnectionError, match="Stream dropped"):
+            for text in self.wrapper.stream_query("Test query"):
+                streamed.append(text)
+
+        assert streamed == ["Partial"]
+        assert self.wrapper._cache_lookup(self.wrapper._build_messages("Test query")) is None
+
+    def test_asend_query(self):
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "Async response"
+        with patch('omics_oracle.openai_wrapper.AsyncOpenAI') as mock_async_openai:
+            mock_async_openai.return_value.chat.completions.create = AsyncMock(return_value=mock_response)
+            response = asyncio.run(self.wrapper.asend_query("Test query"))
+
+        assert response == "Async response"
+        mock_async_openai.assert_called_once_with(api_key=self.wrapper.api_key)
+        mock_async_openai.return_value.chat.completions.create.assert_awaited_once_with(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": mock_base_prompt},
+                {"role": "user", "content": "Test query"}
+            ]
+        )
+
+    def test_asend_query_error(self):
+        with patch('omics_oracle.openai_wrapper.AsyncOpenAI') as mock_async_openai:
+            mock_async_openai.return_value.chat.completions.create = AsyncMock(side_effect=Exception("API Error"))
+            response = asyncio.run(self.wrapper.asend_query("Test query"))
+
+        assert response is None
+        error_log = self.mock_logger.error.call_args[0][0]
+        assert "Error in async OpenAI API call: API Error" in error_log
+
+    def test_send_queries_keeps_order_and_bounds_concurrency(self):
+        in_flight = 0
+        peak = 0
+
+        async def fake_asend_query(query):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return query.upper()
+
+        self.wrapper.asend_query = fake_asend_query
+        queries = [f"query {i}" for i in range(10)]
+
+        responses = self.wrapper.send_queries(queries, max_concurrency=3)
+
+        assert responses == [q.upper() for q in queries]
+        assert peak == 3
+
 if __name__ == '__main__':
     pytest.main()
\ No newline at end of file
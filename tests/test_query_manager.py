@@ -1,6 +1,7 @@
+import asyncio
 import pytest
-from unittest.mock import Mock, patch, MagicMock, call
-from omics_oracle.query_manager import QueryManager
+from unittest.mock import AsyncMock, Mock, patch, MagicMock, call
+from omics_oracle.query_manager import AQLExecution, QueryManager
 from omics_oracle.openai_wrapper import OpenAIWrapper
 from omics_oracle.prompts import base_prompt
 
@@ -22,17 +23,28 @@ def query_manager(mock_openai):
     mock_spoke_wrapper = Mock()
     mock_openai_wrapper = Mock(spec=OpenAIWrapper)
     mock_openai_wrapper.api_key = "test_api_key"
-    with patch('omics_oracle.query_manager.ArangoClient'), \
-         patch('omics_oracle.query_manager.ArangoGraph'), \
+    with patch('omics_oracle.query_manager.PooledArangoGraph'), \
          patch('omics_oracle.query_manager.ArangoGraphQAChain'), \
          patch('omics_oracle.query_manager.setup_logger') as mock_setup_logger:
         mock_logger = Mock()
         mock_setup_logger.return_value = mock_logger
         return QueryManager(spoke_wrapper=mock_spoke_wrapper, openai_wrapper=mock_openai_wrapper)
 
+def _qa_chain(query_manager, chain=None, generated="```aql\nFOR g IN Genes RETURN g\n```"):
+    chain = chain or query_manager.qa_chain
+    chain.aql_examples = ""
+    chain.top_k = 10
+    chain.max_aql_generation_attempts = 3
+    chain.aql_generation_chain.output_key = "text"
+    chain.aql_generation_chain.invoke.return_value = {"text": generated}
+    chain.aql_generation_chain.ainvoke = AsyncMock(return_value={"text": generated})
+    chain.aql_fix_chain.output_key = "text"
+    query_manager.llm.ainvoke = AsyncMock(return_value=Mock(content="Async story"))
+    return chain
+
 def test_process_query(query_manager):
-    query_manager.spoke.execute_aql.return_value = [{"result": "data"}]
-    query_manager.qa_chain.invoke.return_value = {"result": "mocked AQL result"}
+    _qa_chain(query_manager, generated="```FOR g IN Genes RETURN g```")
+    query_manager.graph.query.return_value = []
 
     result = query_manager.process_query("Test biomedical query")
 
@@ -47,18 +59,17 @@ def test_process_query(query_manager):
         call("Attempt 1: Executing query..."),
         call(f"Starting sequential chain for query: {truncate(full_query)}"),
         call(f"Attempting to execute AQL query: {truncate(full_query)}"),
-        call("AQL query execution output: {'result': 'mocked AQL result'}"),
-        call("Extracting AQL result from captured output"),
-        call("No AQL result found in captured output"),
+        call("AQL query returned 0 rows: FOR g IN Genes RETURN g"),
         call("Attempt - No AQL result found."),
-        call("Sequential chain completed. Final response: {'aql_result': []}"),
+        call("Sequential chain completed. Final response: {'aql_result': [], 'aql_query': 'FOR g IN Genes RETURN g'}"),
         call("Attempt 1 - AQL Result: []"),
         call("Attempt 1 - No AQL result found."),
     ]
     query_manager.logger.debug.assert_has_calls(expected_calls, any_order=True)
 
 def test_process_query_no_result(query_manager):
-    query_manager.qa_chain.invoke.return_value = {"result": ""}
+    _qa_chain(query_manager, generated="```FOR g IN Genes RETURN g```")
+    query_manager.graph.query.return_value = []
 
     result = query_manager.process_query("Invalid biomedical query")
 
@@ -75,7 +86,7 @@ def test_process_query_no_result(query_manager):
         call(f"Starting sequential chain for query: {truncate(full_query)}"),
         call(f"Attempting to execute AQL query: {truncate(full_query)}"),
         call("Attempt - No AQL result found."),
-        call("Sequential chain completed. Final response: {'aql_result': []}"),
+        call("Sequential chain completed. Final response: {'aql_result': [], 'aql_query': 'FOR g IN Genes RETURN g'}"),
         call("Attempt 1 - AQL Result: []"),
         call("Attempt 1 - No AQL result found."),
         call(f"Refined query for next attempt: {truncate(failure_message + ' ' + full_query)}"),
@@ -83,7 +94,7 @@ def test_process_query_no_result(query_manager):
         call(f"Starting sequential chain for query: {truncate(failure_message + ' ' + full_query)}"),
         call(f"Attempting to execute AQL query: {truncate(failure_message + ' ' + full_query)}"),
         call("Attempt - No AQL result found."),
-        call("Sequential chain completed. Final response: {'aql_result': []}"),
+        call("Sequential chain completed. Final response: {'aql_result': [], 'aql_query': 'FOR g IN Genes RETURN g'}"),
         call("Attempt 2 - AQL Result: []"),
         call("Attempt 2 - No AQL result found."),
         call(f"Refined query for next attempt: {truncate(failure_message + ' ' + failure_message + ' ' + full_query)}"),
@@ -91,14 +102,14 @@ def test_process_query_no_result(query_manager):
         call(f"Starting sequential chain for query: {truncate(failure_message + ' ' + failure_message + ' ' + full_query)}"),
         call(f"Attempting to execute AQL query: {truncate(failure_message + ' ' + failure_message + ' ' + full_query)}"),
         call("Attempt - No AQL result found."),
-        call("Sequential chain completed. Final response: {'aql_result': []}"),
+        call("Sequential chain completed. Final response: {'aql_result': [], 'aql_query': 'FOR g IN Genes RETURN g'}"),
         call("Attempt 3 - AQL Result: []"),
         call("Attempt 3 - No AQL result found."),
     ]
     query_manager.logger.debug.assert_has_calls(expected_calls, any_order=True)
 
 def test_error_handling(query_manager):
-    query_manager.qa_chain.invoke.side_effect = Exception("Test error")
+    _qa_chain(query_manager).aql_generation_chain.invoke.side_effect = Exception("Test error")
 
     result = query_manager.process_query("Test query")
 
@@ -108,19 +119,116 @@ def test_error_handling(query_manager):
     query_manager.logger.error.assert_called_with("Error in attempt 1: Error executing AQL query: Test error")
 
 def test_execute_aql(query_manager):
-    mock_result = {"result": "mocked AQL result"}
-    query_manager.qa_chain.invoke.return_value = mock_result
-
-    result = query_manager.execute_aql("Test AQL query")
+    rows = [{"gene": "GENE1", "name": "Crohn's disease"}]
+    chain = _qa_chain(query_manager, generated="```FOR g IN Genes RETURN g```")
+    query_manager.graph.query.return_value = rows
 
-    assert "captured_output" in result
-    assert str(mock_result) in result["captured_output"]
+    execution = query_manager.execute_aql("Test AQL query")
 
+    assert execution == AQLExecution(aql_query="FOR g IN Genes RETURN g", aql_result=rows)
+    assert chain.aql_generation_chain.invoke.call_args[0][0]["user_input"] == "Test AQL query"
+    query_manager.graph.query.assert_called_once_with("FOR g IN Genes RETURN g", 10)
+    # The chain's own answer step is skipped
+    chain.invoke.assert_not_called()
+    # Rows are passed through as returned by the database, apostrophes and all
+    assert execution.aql_result is rows
     query_manager.logger.debug.assert_has_calls([
         call(f"Attempting to execute AQL query: {truncate('Test AQL query')}"),
-        call(f"AQL query execution output: {str(mock_result)}")
+        call("AQL query returned 1 rows: FOR g IN Genes RETURN g")
     ], any_order=True)
 
+def test_execute_aql_fixes_failing_aql(query_manager):
+    from omics_oracle.aql_guard import AQLGuardError, GuardDecision
+    chain = _qa_chain(query_manager)
+    chain.aql_fix_chain.invoke.return_value = {"text": "```FOR g IN Genes LIMIT 5 RETURN g```"}
+    rejection = AQLGuardError(GuardDecision('rejected', "FOR g IN Genes RETURN g", reason="too expensive"))
+    query_manager.graph.query.side_effect = [rejection, [{"gene": "GENE1"}]]
+
+    execution = query_manager.execute_aql("Which genes?")
+
+    assert execution.aql_query == "FOR g IN Genes LIMIT 5 RETURN g"
+    assert chain.aql_fix_chain.invoke.call_args[0][0]["aql_error"] == rejection.error_message
+
+def test_generate_and_run_matches_arango_graph_qa_chain(query_manager):
+    # _generate_and_run mirrors the chain's own flow; run both on a real chain to catch drift
+    from arango import AQLQueryExecuteError
+    from langchain.chains import ArangoGraphQAChain
+    from langchain_community.graphs import ArangoGraph
+    from langchain_core.callbacks import BaseCallbackHandler
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    class PromptRecorder(BaseCallbackHandler):
+        def __init__(self):
+            self.prompts = []
+
+        def on_chat_model_start(self, serialized, messages, **kwargs):
+            self.prompts.append(messages[0][0].content)
+
+    def run(generate):
+        error = AQLQueryExecuteError(Mock(error_message="AQL: collection not found", error_code=1203,
+                                          status_code=404, status_text="Not Found", url="", method="post",
+                                          headers={}, body="", raw_body=""), Mock())
+        graph = MagicMock(spec=ArangoGraph)
+        graph.schema = {"Graph Schema": [], "Collection Schema": []}
+        graph.query.side_effect = [error, [{"gene": "GENE1"}]]
+        recorder = PromptRecorder()
+        llm = FakeListChatModel(responses=["```aql\nFOR g IN Gene RETURN g\n```",
+                                           "```aql\nFOR g IN Genes RETURN g\n```", "answer"],
+                                callbacks=[recorder])
+        chain = ArangoGraphQAChain.from_llm(llm, graph=graph, return_aql_query=True, return_aql_result=True,
+                                            aql_examples="EXAMPLES", top_k=25)
+        query_manager.graph = graph
+        result = generate(chain)
+        return result, graph.query.call_args_list, recorder.prompts
+
+    ours, our_queries, our_prompts = run(lambda chain: query_manager._generate_and_run(chain, "Which genes?"))
+    theirs, their_queries, their_prompts = run(lambda chain: chain.invoke({chain.input_key: "Which genes?"}))
+
+    assert ours == {'aql_query': theirs['aql_query'], 'aql_result': theirs['aql_result']}
+    assert our_queries == their_queries
+    # The same generation and fix prompts; only the chain's answer step is skipped
+    assert our_prompts == their_prompts[:2]
+    assert len(their_prompts) == 3
+
+def test_qa_chains_keep_aql_top_k_rows(mock_openai):
+    mock_openai_wrapper = Mock(spec=OpenAIWrapper)
+    mock_openai_wrapper.api_key = "test_api_key"
+    with patch('omics_oracle.query_manager.PooledArangoGraph'), \
+         patch('omics_oracle.query_manager.ArangoGraphQAChain') as mock_chain, \
+         patch('omics_oracle.query_manager.setup_logger'):
+        QueryManager(spoke_wrapper=Mock(), openai_wrapper=mock_openai_wrapper, aql_top_k=1000)
+
+    assert mock_chain.from_llm.call_args_list
+    assert all(c[1]['top_k'] == 1000 for c in mock_chain.from_llm.call_args_list)
+
+def test_sequential_chain_returns_structured_result(query_manager):
+    rows = [{"gene": "GENE1", "name": "Crohn's disease"}]
+    _qa_chain(query_manager, generated="```FOR g IN Genes RETURN g```")
+    query_manager.graph.query.return_value = rows
+
+    result = query_manager.process_query("Which genes?")
+
+    assert result["aql_result"] == rows
+    assert result["aql_query"] == "FOR g IN Genes RETURN g"
+    assert result["interpretation"] == "Mocked response"
+
+def test_execute_aql_reports_guard_decisions(query_manager):
+    db = MagicMock()
+    db.aql.explain.side_effect = [{'estimatedCost': 1, 'estimatedNrItems': 10 ** 7},
+                                  {'estimatedCost': 1, 'estimatedNrItems': 1000}]
+
+    def query(aql_query, top_k):
+        query_manager.aql_guard.review(db, aql_query)
+        return [1]
+
+    _qa_chain(query_manager)
+    query_manager.graph.query.side_effect = query
+
+    execution = query_manager.execute_aql("Test AQL query")
+
+    assert [d.action for d in execution.guard_decisions] == ['capped']
+    assert execution.guard_decisions[0].estimated_items == 10 ** 7
+
 def test_interpret_aql_result(query_manager):
     aql_result = [{"gene": "GENE1", "pathway": "PATHWAY1"}]
     interpretation = query_manager.interpret_aql_result(aql_result)
@@ -133,4 +241,380 @@ def test_interpret_aql_result(query_manager):
         call(f"LLM interpretation: {truncate(interpretation)}")
     ], any_order=True)
 
-# Add more tests as needed to cover edge cases and error scenarios
\ No newline at end of file
+# Add more tests as needed to cover edge cases and error scenarios
+def test_llm_cache_is_passed_to_chat_model(mock_openai):
+    from omics_oracle.llm_cache import LLMCache, LangChainLLMCache
+    mock_openai_wrapper = Mock(spec=OpenAIWrapper)
+    mock_openai_wrapper.api_key = "test_api_key"
+    llm_cache = LLMCache()
+    with patch('omics_oracle.query_manager.PooledArangoGraph'), \
+         patch('omics_oracle.query_manager.ArangoGraphQAChain'), \
+         patch('omics_oracle.query_manager.setup_logger'):
+        QueryManager(spoke_wrapper=Mock(), openai_wrapper=mock_openai_wrapper, llm_cache=llm_cache)
+
+    cache_adapter = mock_openai.call_args[1]['cache']
+    assert isinstance(cache_adapter, LangChainLLMCache)
+    assert cache_adapter.cache is llm_cache
+
+def test_rate_limiter_is_passed_to_chat_model(mock_openai):
+    from omics_oracle.rate_limiter import LangChainRateLimiter, RateLimiter
+    mock_openai_wrapper = Mock(spec=OpenAIWrapper)
+    mock_openai_wrapper.api_key = "test_api_key"
+    rate_limiter = RateLimiter(requests_per_second=5)
+    with patch('omics_oracle.query_manager.PooledArangoGraph'), \
+         patch('omics_oracle.query_manager.ArangoGraphQAChain'), \
+         patch('omics_oracle.query_manager.setup_logger'):
+        QueryManager(spoke_wrapper=Mock(), openai_wrapper=mock_openai_wrapper, rate_limiter=rate_limiter)
+
+    for c in mock_openai.call_args_list:
+        [callback] = c[1]['callbacks']
+        assert isinstance(callback, LangChainRateLimiter)
+        assert callback.limiter is rate_limiter and callback.model == c[1]['model']
+
+def test_stream_query(query_manager):
+    aql_result = [{"gene": "GENE1", "pathway": "PATHWAY1"}]
+    _qa_chain(query_manager)
+    query_manager.graph.query.return_value = aql_result
+    query_manager.llm.stream.return_value = iter([Mock(content="Genes "), Mock(content=""), Mock(content="matter")])
+
+    snapshots = list(query_manager.stream_query("Test biomedical query"))
+
+    assert [s["interpretation"] for s in snapshots] == ["", "Genes ", "Genes matter"]
+    assert snapshots[-1]["aql_result"] == aql_result
+    assert snapshots[-1]["attempt_count"] == 1
+    query_manager.llm.invoke.assert_not_called()
+
+def test_stream_query_no_result(query_manager):
+    _qa_chain(query_manager)
+    query_manager.graph.query.return_value = []
+
+    snapshots = list(query_manager.stream_query("Invalid biomedical query"))
+
+    assert len(snapshots) == 1
+    assert snapshots[0]["interpretation"] == "No interpretation available."
+    query_manager.llm.stream.assert_not_called()
+
+def test_interpret_aql_result_packs_results_for_question(query_manager):
+    aql_result = [{"gene": f"GENE{i}"} for i in range(1000)]
+    query_manager.context_packer = Mock()
+    query_manager.context_packer.pack.return_value = "PACKED RESULTS"
+
+    query_manager.interpret_aql_result(aql_result, "Which genes?")
+
+    query_manager.context_packer.pack.assert_called_once_with(aql_result, query="Which genes?")
+    assert "PACKED RESULTS" in query_manager.llm.invoke.call_args[0][0]
+
+def test_aql_generation_escalates_to_primary_model(query_manager):
+    cheap_chain, primary_chain = _qa_chain(query_manager, Mock()), _qa_chain(query_manager, Mock())
+    query_manager.graph.query.side_effect = [[], [{"gene": "GENE1"}]]
+    query_manager.qa_chains = {'gpt-4o-mini': cheap_chain, 'gpt-4o': primary_chain}
+    query_manager.qa_chain = primary_chain
+
+    execution = query_manager.execute_aql("Test AQL query")
+
+    assert execution.aql_result == [{"gene": "GENE1"}]
+    cheap_chain.aql_generation_chain.invoke.assert_called_once()
+    primary_chain.aql_generation_chain.invoke.assert_called_once()
+    assert [d.outcome for d in query_manager.router.decisions] == ['rejected', 'accepted']
+
+def test_aql_generation_stays_on_cheap_model(query_manager):
+    cheap_chain, primary_chain = _qa_chain(query_manager, Mock()), _qa_chain(query_manager, Mock())
+    query_manager.graph.query.return_value = [{"gene": "GENE1"}]
+    query_manager.qa_chains = {'gpt-4o-mini': cheap_chain, 'gpt-4o': primary_chain}
+
+    query_manager.execute_aql("Test AQL query")
+
+    primary_chain.aql_generation_chain.invoke.assert_not_called()
+
+def _generations(*texts):
+    result = Mock()
+    result.generations = [[Mock(text=text) for text in texts]]
+    return result
+
+def test_generate_aql_candidates_dedupes(query_manager, mock_openai):
+    mock_openai.return_value.generate_prompt.return_value = _generations(
+        "```aql\nFOR g IN Gene RETURN g\n```", "```aql\nFOR g IN Gene\nRETURN g```", "no code block",
+        "```FOR p IN Pathway RETURN p```")
+
+    candidates = query_manager.generate_aql_candidates("Which genes?", 4)
+
+    assert candidates == ["FOR g IN Gene RETURN g", "FOR p IN Pathway RETURN p"]
+    assert mock_openai.call_args[1]['n'] == 4
+
+def test_speculative_process_query_returns_first_non_empty(query_manager):
+    import threading
+    query_manager.speculative_candidates = 3
+    query_manager.generate_aql_candidates = Mock(return_value=["EMPTY", "SLOW", "FAST"])
+    release = threading.Event()
+
+    def run_query(aql_query, top_k, max_runtime):
+        assert 0 < max_runtime <= query_manager.speculative_time_budget
+        if aql_query == "SLOW":
+            release.wait(5)
+            return [{"gene": "SLOW"}]
+        return [] if aql_query == "EMPTY" else [{"gene": "FAST"}]
+
+    query_manager.graph.query.side_effect = run_query
+    result = query_manager.process_query("Which genes?")
+    release.set()
+
+    assert result["aql_query"] == "FAST"
+    assert result["aql_result"] == [{"gene": "FAST"}]
+    assert result["interpretation"] == "Mocked response"
+    query_manager.qa_chain.invoke.assert_not_called()
+
+def test_speculative_process_query_respects_time_budget(query_manager):
+    import threading
+    query_manager.speculative_candidates = 2
+    query_manager.speculative_time_budget = 0.1
+    query_manager.generate_aql_candidates = Mock(return_value=["SLOW1", "SLOW2"])
+    release = threading.Event()
+    query_manager.graph.query.side_effect = lambda *args, **kwargs: release.wait(5) and [{"gene": "LATE"}]
+
+    result = query_manager.process_query("Which genes?")
+    release.set()
+
+    assert result["aql_result"] == []
+    assert result["interpretation"] == "No interpretation available."
+    query_manager.logger.warning.assert_called_with("No AQL candidate returned results within 0.1s")
+
+def test_speculative_generation_error(query_manager):
+    query_manager.speculative_candidates = 2
+    query_manager.generate_aql_candidates = Mock(side_effect=Exception("API down"))
+
+    result = query_manager.process_query("Which genes?")
+
+    assert result == {"error": "An error occurred: Error generating AQL candidates: API down"}
+
+def test_graph_shares_spoke_session(mock_openai):
+    mock_spoke_wrapper = Mock()
+    mock_openai_wrapper = Mock(spec=OpenAIWrapper)
+    mock_openai_wrapper.api_key = "test_api_key"
+    with patch('omics_oracle.query_manager.PooledArangoGraph') as mock_graph, \
+         patch('omics_oracle.query_manager.ArangoGraphQAChain'), \
+         patch('omics_oracle.query_manager.setup_logger'):
+        manager = QueryManager(spoke_wrapper=mock_spoke_wrapper, openai_wrapper=mock_openai_wrapper)
+
+    mock_graph.assert_called_once_with(mock_spoke_wrapper.session, result_cache=mock_spoke_wrapper.result_cache,
+                                       schema_cache=None, guard=manager.aql_guard,
+                                       profiler=mock_spoke_wrapper.profiler, metrics=manager.metrics)
+    assert manager.session is mock_spoke_wrapper.session
+
+def test_aprocess_query(query_manager):
+    chain = _qa_chain(query_manager)
+    query_manager.graph.query.return_value = [{"gene": "GENE1"}]
+
+    result = asyncio.run(query_manager.aprocess_query("Which genes?"))
+
+    assert result == {"original_query": "Which genes?", "aql_result": [{"gene": "GENE1"}],
+                      "interpretation": "Async story", "attempt_count": 1,
+                      "aql_query": "\nFOR g IN Genes RETURN g\n"}
+    assert chain.aql_generation_chain.ainvoke.call_args[0][0]["user_input"] == "Which genes?" + base_prompt
+    query_manager.graph.query.assert_called_once_with("\nFOR g IN Genes RETURN g\n", 10)
+    chain.invoke.assert_not_called()
+
+def test_aprocess_query_fixes_failing_aql(query_manager):
+    from omics_oracle.aql_guard import AQLGuardError, GuardDecision
+    chain = _qa_chain(query_manager)
+    chain.aql_fix_chain.ainvoke = AsyncMock(return_value={"text": "```FOR g IN Genes LIMIT 5 RETURN g```"})
+    rejection = AQLGuardError(GuardDecision('rejected', "FOR g IN Genes RETURN g", reason="too expensive"))
+    query_manager.graph.query.side_effect = [rejection, [{"gene": "GENE1"}]]
+
+    result = asyncio.run(query_manager.aprocess_query("Which genes?"))
+
+    assert result["aql_query"] == "FOR g IN Genes LIMIT 5 RETURN g"
+    assert chain.aql_fix_chain.ainvoke.call_args[0][0]["aql_error"] == rejection.error_message
+
+def test_aprocess_query_limits_concurrency(query_manager):
+    chain = _qa_chain(query_manager)
+    query_manager.max_concurrent_queries = 2
+    query_manager.graph.query.return_value = [{"gene": "GENE1"}]
+    running, peak = 0, 0
+
+    async def generate(inputs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"text": "```FOR g IN Genes RETURN g```"}
+
+    chain.aql_generation_chain.ainvoke = generate
+
+    async def main():
+        return await asyncio.gather(*(query_manager.aprocess_query(f"Question {i}") for i in range(6)))
+
+    results = asyncio.run(main())
+
+    assert [r["original_query"] for r in results] == [f"Question {i}" for i in range(6)]
+    assert peak == 2
+
+def test_aprocess_query_cancellation_frees_its_slot(query_manager):
+    chain = _qa_chain(query_manager)
+    query_manager.max_concurrent_queries = 1
+    query_manager.graph.query.return_value = [{"gene": "GENE1"}]
+    started = None
+
+    async def generate(inputs):
+        if inputs["user_input"].startswith("Slow"):
+            started.set()
+            await asyncio.sleep(10)
+        return {"text": "```FOR g IN Genes RETURN g```"}
+
+    chain.aql_generation_chain.ainvoke = generate
+
+    async def main():
+        nonlocal started
+        started = asyncio.Event()
+        slow = asyncio.ensure_future(query_manager.aprocess_query("Slow question"))
+        await started.wait()
+        slow.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await slow
+        return await asyncio.wait_for(query_manager.aprocess_query("Fast question"), 1)
+
+    assert asyncio.run(main())["aql_result"] == [{"gene": "GENE1"}]
+    assert "cancelled" in query_manager.logger.info.call_args[0][0]
+
+def test_astream_query(query_manager):
+    _qa_chain(query_manager)
+    query_manager.graph.query.return_value = [{"gene": "GENE1"}]
+
+    async def chunks(prompt):
+        for text in ("Genes ", "", "matter"):
+            yield Mock(content=text)
+
+    query_manager.llm.astream = chunks
+
+    async def main():
+        return [snapshot async for snapshot in query_manager.astream_query("Which genes?")]
+
+    snapshots = asyncio.run(main())
+
+    assert [s["interpretation"] for s in snapshots] == ["", "Genes ", "Genes matter"]
+    query_manager.llm.ainvoke.assert_not_called()
+
+def test_process_query_records_metrics(query_manager):
+    _qa_chain(query_manager)
+    query_manager.graph.query.return_value = [{"gene": "GENE1"}]
+
+    query_manager.process_query("Which genes?")
+
+    metrics = query_manager.metrics
+    assert metrics.request_seconds.count(outcome='ok') == 1
+    assert metrics.attempts.count() == 1
+    assert metrics.stage_seconds.count(stage='aql_generation', outcome='ok') == 1
+    assert metrics.stage_seconds.count(stage='interpretation', outcome='ok') == 1
+    assert metrics.llm_seconds.count(stage='interpretation', model='gpt-4o', outcome='accepted') == 1
+
+def test_process_query_remembers_and_reuses_aql(query_manager):
+    from omics_oracle.aql_memory import AQLMemory
+    query_manager.aql_memory = AQLMemory()
+    chain = _qa_chain(query_manager, generated="```FOR g IN Gene FILTER g.name == 'BRCA1' RETURN g```")
+    query_manager.graph.query.return_value = [{"gene": "BRCA1"}]
+    query_manager.process_query("What pathways does BRCA1 participate in?")
+    chain.aql_generation_chain.invoke.reset_mock()
+    query_manager.graph.query.reset_mock()
+    query_manager.graph.query.return_value = [{"gene": "TP53"}]
+
+    result = query_manager.process_query("What pathways does TP53 participate in?")
+
+    chain.aql_generation_chain.invoke.assert_not_called()
+    query_manager.graph.query.assert_called_once_with("FOR g IN Gene FILTER g.name == 'TP53' RETURN g", 10)
+    assert result["aql_result"] == [{"gene": "TP53"}]
+    assert result["attempt_count"] == 0
+    assert result["aql_memory"]["question"] == "What pathways does BRCA1 participate in?"
+    assert result["aql_memory"]["parametrized"]
+    assert query_manager.metrics.memory_lookups.value(outcome='reused') == 1
+
+def test_stale_memory_falls_back_to_generation_with_examples(query_manager):
+    from omics_oracle.aql_memory import AQLMemory
+    query_manager.aql_memory = AQLMemory()
+    query_manager.aql_memory.record("Which genes are associated with asthma?", "FOR g IN Gene RETURN g", 3)
+    chain = _qa_chain(query_manager, generated="```FOR d IN Disease RETURN d```")
+    # The remembered query finds nothing, the generated one does
+    query_manager.graph.query.side_effect = [[], [{"disease": "asthma"}]]
+
+    result = query_manager.process_query("Which genes are linked to asthma?")
+
+    assert result["aql_query"] == "FOR d IN Disease RETURN d"
+    assert "aql_memory" not in result
+    user_input = chain.aql_generation_chain.invoke.call_args[0][0]["user_input"]
+    assert "Question: Which genes are associated with asthma?" in user_input
+    assert query_manager.aql_memory.match("Which genes are linked to asthma?").aql_query == "FOR d IN Disease RETURN d"
+
+def test_aprocess_query_reuses_remembered_aql(query_manager):
+    from omics_oracle.aql_memory import AQLMemory
+    chain = _qa_chain(query_manager)
+    query_manager.aql_memory = AQLMemory()
+    query_manager.aql_memory.record("Which genes?", "FOR g IN Genes RETURN g", 1)
+    query_manager.graph.query.return_value = [{"gene": "GENE1"}]
+
+    result = asyncio.run(query_manager.aprocess_query("which genes"))
+
+    chain.aql_generation_chain.ainvoke.assert_not_called()
+    assert result["aql_query"] == "FOR g IN Genes RETURN g"
+    assert result["interpretation"] == "Async story"
+
+def _large_result(rows=400):
+    return [{"gene": f"GENE{i}", "description": "x" * 40} for i in range(rows)]
+
+def test_interpret_large_result_maps_and_reduces(query_manager):
+    from langchain_core.messages import AIMessage
+    query_manager.interpretation_chunk_tokens = 1000
+    query_manager.interpretation_max_concurrency = 3
+    query_manager.interpretation_token_budget = 3000
+    query_manager.llm.batch.return_value = [AIMessage(content="Summary A"), ValueError("rate limited"),
+                                            AIMessage(content="Summary B")]
+
+    story = query_manager.interpret_aql_result(_large_result(), "Which genes?")
+
+    assert story == "Mocked response"
+    prompts = query_manager.llm.batch.call_args[0][0]
+    assert len(prompts) == 3
+    assert all("Which genes?" in prompt for prompt in prompts)
+    assert query_manager.llm.batch.call_args[1]["config"] == {"max_concurrency": 3}
+    reduce_prompt = query_manager.llm.invoke.call_args[0][0]
+    assert "Part 1:\nSummary A\n\nPart 2:\nSummary B" in reduce_prompt
+
+def test_interpret_large_result_reports_rows_beyond_the_budget(query_manager):
+    from langchain_core.messages import AIMessage
+    query_manager.interpretation_chunk_tokens = 1000
+    query_manager.interpretation_token_budget = 2000
+    query_manager.llm.batch.return_value = [AIMessage(content="Summary A"), AIMessage(content="Summary B")]
+
+    query_manager.interpret_aql_result(_large_result(), "Which genes?")
+
+    assert len(query_manager.llm.batch.call_args[0][0]) == 2
+    warning = query_manager.logger.warning.call_args[0][0]
+    assert "of 400 distinct result rows left out" in warning
+    reduce_prompt = query_manager.llm.invoke.call_args[0][0]
+    assert "of the 400 distinct rows, the least relevant ones, did not fit" in reduce_prompt
+    assert "covers only part of the results" in reduce_prompt
+
+def test_interpret_small_result_is_single_pass(query_manager):
+    query_manager.interpretation_chunk_tokens = 1000
+
+    query_manager.interpret_aql_result([{"gene": "GENE1"}], "Which genes?")
+
+    query_manager.llm.batch.assert_not_called()
+    assert "GENE1" in query_manager.llm.invoke.call_args[0][0]
+
+def test_interpret_large_result_fails_when_no_part_is_summarized(query_manager):
+    query_manager.interpretation_chunk_tokens = 1000
+    query_manager.llm.batch.return_value = [ValueError("rate limited")] * 3
+
+    assert query_manager.interpret_aql_result(_large_result(), "Which genes?") == "Error interpreting results."
+    query_manager.llm.invoke.assert_not_called()
+
+def test_ainterpret_large_result_uses_abatch(query_manager):
+    from langchain_core.messages import AIMessage
+    query_manager.interpretation_chunk_tokens = 1000
+    query_manager.llm.abatch = AsyncMock(return_value=[AIMessage(content="Summary A")] * 2)
+    query_manager.llm.ainvoke = AsyncMock(return_value=Mock(content="Async story"))
+
+    story = asyncio.run(query_manager.ainterpret_aql_result(_large_result(), "Which genes?"))
+
+    assert story == "Async story"
+    assert len(query_manager.llm.abatch.call_args[0][0]) > 1
+    assert "Summaries:" in query_manager.llm.ainvoke.call_args[0][0]
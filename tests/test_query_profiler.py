@@ -0,0 +1,90 @@
+import json
+import pytest
+from unittest.mock import MagicMock
+from omics_oracle.query_profiler import QueryProfiler, current_question, question_context, summarize_slow_queries
+
+def make_cursor(execution_time, nodes=()):
+    cursor = MagicMock()
+    cursor.statistics.return_value = {'execution_time': execution_time, 'scanned_full': 5000, 'scanned_index': 10,
+                                      'filtered': 4990, 'peak_memory_usage': 32768, 'nodes': list(nodes)}
+    cursor.profile.return_value = {'parsing': 0.001, 'executing': execution_time}
+    return cursor
+
+def test_question_context():
+    assert current_question() is None
+    with question_context("Which genes?"):
+        assert current_question() == "Which genes?"
+    assert current_question() is None
+
+def test_execution_options():
+    assert QueryProfiler(level=1).execution_options(batch_size=10) == {'batch_size': 10, 'profile': 1}
+
+def test_fast_query_is_not_logged(tmp_path):
+    log = tmp_path / "slow.jsonl"
+    profiler = QueryProfiler(slow_query_log=str(log), threshold=1.0)
+    db = MagicMock()
+
+    profile = profiler.record(db, "FOR g IN Genes RETURN g", None, make_cursor(0.2), 3, 5.0, source='spoke')
+
+    # The server execution time decides, not the time spent consuming a streamed cursor
+    assert not profile.slow
+    assert (profile.scanned_full, profile.filtered, profile.peak_memory_usage) == (5000, 4990, 32768)
+    assert not log.exists()
+    db.aql.explain.assert_not_called()
+    assert profiler.stats() == {'profiled': 1, 'slow': 0}
+
+def test_slow_query_is_logged_with_question_and_plan_nodes(tmp_path):
+    log = tmp_path / "slow.jsonl"
+    profiler = QueryProfiler(slow_query_log=str(log), threshold=1.0)
+    db = MagicMock()
+    db.aql.explain.return_value = {'nodes': [
+        {'id': 1, 'type': 'SingletonNode', 'estimatedCost': 1, 'estimatedNrItems': 1},
+        {'id': 2, 'type': 'EnumerateCollectionNode', 'collection': 'Genes', 'estimatedCost': 5000,
+         'estimatedNrItems': 5000},
+    ]}
+    cursor = make_cursor(2.5, nodes=[{'id': 1, 'calls': 1, 'items': 1, 'runtime': 0.0},
+                                     {'id': 2, 'calls': 5, 'items': 5000, 'runtime': 2.4}])
+
+    with question_context("Which genes are associated with asthma?"):
+        profiler.record(db, "FOR g IN Genes FILTER g.x == @x RETURN g", {'x': 1}, cursor, 10, 2.6, source='graph')
+
+    entry = json.loads(log.read_text())
+    assert entry['question'] == "Which genes are associated with asthma?"
+    assert entry['source'] == 'graph'
+    assert entry['bind_vars'] == {'x': 1}
+    assert entry['nodes'][1] == {'id': 2, 'calls': 5, 'items': 5000, 'runtime': 2.4, 'type': 'EnumerateCollectionNode',
+                                 'estimatedCost': 5000, 'estimatedNrItems': 5000, 'collection': 'Genes'}
+    assert profiler.stats() == {'profiled': 1, 'slow': 1}
+
+def test_elapsed_time_is_used_without_server_statistics():
+    cursor = MagicMock()
+    cursor.statistics.return_value = None
+    cursor.profile.return_value = None
+
+    profile = QueryProfiler(threshold=1.0, explain_slow=False).record(MagicMock(), "RETURN 1", None, cursor, 1, 1.5,
+                                                                       source='spoke')
+
+    assert profile.slow
+
+def test_profiling_errors_do_not_fail_the_query():
+    cursor = MagicMock()
+    cursor.statistics.side_effect = Exception("boom")
+
+    assert QueryProfiler().record(MagicMock(), "RETURN 1", None, cursor, 1, 0.1, source='spoke') is None
+
+def test_summarize_slow_queries(tmp_path):
+    log = tmp_path / "slow.jsonl"
+    entries = [
+        {'query': "FOR g IN Genes RETURN g", 'execution_time': 2.0, 'elapsed': 2.1, 'scanned_full': 100, 'question': "a"},
+        {'query': "for g in Genes  return g", 'execution_time': 3.0, 'elapsed': 3.1, 'scanned_full': 200, 'question': "b"},
+        {'query': "FOR d IN Diseases RETURN d", 'execution_time': None, 'elapsed': 4.0, 'scanned_full': None,
+         'question': None},
+    ]
+    log.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+
+    summary = summarize_slow_queries(str(log))
+
+    assert [group['count'] for group in summary] == [2, 1]
+    assert summary[0]['total_seconds'] == pytest.approx(5.0)
+    assert summary[0]['max_scanned_full'] == 200
+    assert summary[0]['questions'] == ["a", "b"]
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import Mock, patch
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from omics_oracle.rate_limiter import (LangChainRateLimiter, RateLimiter, TokenBucket, is_rate_limited,
+                                       retry_after_seconds)
+
+class RateLimitError(Exception):
+    def __init__(self, headers=None):
+        super().__init__("429 Too Many Requests")
+        self.response = Mock(status_code=429, headers=headers or {})
+
+def test_token_bucket_allows_burst_then_waits():
+    with patch('omics_oracle.rate_limiter.time.monotonic', return_value=100.0):
+        bucket = TokenBucket(rate=2, capacity=2)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.5)
+        assert bucket.reserve() == pytest.approx(1.0)
+
+def test_token_bucket_refills_over_time():
+    with patch('omics_oracle.rate_limiter.time.monotonic', side_effect=[100.0, 100.0, 100.5, 102.0]):
+        bucket = TokenBucket(rate=1, capacity=1)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.5)
+        assert bucket.reserve() == 0
+
+def test_token_bucket_is_thread_safe():
+    bucket = TokenBucket(rate=1e-9, capacity=1000)
+    waits = []
+
+    def worker():
+        for _ in range(100):
+            waits.append(bucket.reserve())
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(1 for wait in waits if wait == 0) == 1000
+
+def test_tokens_per_minute_budget():
+    limiter = RateLimiter(tokens_per_minute=600)
+    with patch('omics_oracle.rate_limiter.time.sleep') as mock_sleep:
+        limiter.acquire(tokens=600)
+        mock_sleep.assert_not_called()
+        limiter.acquire(tokens=60)
+    assert mock_sleep.call_args[0][0] == pytest.approx(6.0, rel=0.01)
+
+def test_call_retries_after_429_using_retry_after():
+    limiter = RateLimiter(max_retries=3)
+    func = Mock(side_effect=[RateLimitError({'retry-after': '2'}), "ok"])
+
+    with patch('omics_oracle.rate_limiter.time.sleep') as mock_sleep:
+        assert limiter.call(func, "prompt", tokens=10) == "ok"
+
+    assert func.call_count == 2
+    func.assert_called_with("prompt")
+    assert mock_sleep.call_args[0][0] == pytest.approx(2.0, abs=0.05)
+
+def test_call_gives_up_after_max_retries():
+    limiter = RateLimiter(max_retries=2, base_delay=0.01)
+    func = Mock(side_effect=RateLimitError())
+
+    with patch('omics_oracle.rate_limiter.time.sleep'):
+        with pytest.raises(RateLimitError):
+            limiter.call(func)
+
+    assert func.call_count == 3
+
+def test_call_does_not_retry_other_errors():
+    limiter = RateLimiter()
+    func = Mock(side_effect=ValueError("bad request"))
+
+    with pytest.raises(ValueError):
+        limiter.call(func)
+
+    func.assert_called_once()
+
+def test_backoff_is_jittered_exponential():
+    limiter = RateLimiter(base_delay=1.0, max_delay=8.0)
+
+    for attempt, ceiling in [(0, 1.0), (1, 2.0), (2, 4.0), (5, 8.0)]:
+        delays = [limiter.backoff_delay(attempt) for _ in range(50)]
+        assert all(ceiling / 2 <= delay <= ceiling for delay in delays)
+        assert len(set(delays)) > 1
+
+    assert limiter.backoff_delay(0, retry_after=30) == 8.0
+
+def test_acall_retries_without_blocking_loop():
+    limiter = RateLimiter(base_delay=0.01, max_delay=0.01)
+    attempts = []
+
+    async def func(value):
+        attempts.append(value)
+        if len(attempts) == 1:
+            raise RateLimitError()
+        return value * 2
+
+    assert asyncio.run(limiter.acall(func, 21)) == 42
+    assert attempts == [21, 21]
+
+def test_retry_after_parsing():
+    assert retry_after_seconds(RateLimitError({'retry-after-ms': '1500'})) == 1.5
+    assert retry_after_seconds(RateLimitError({'retry-after': '3'})) == 3.0
+    assert retry_after_seconds(RateLimitError({'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'})) == 0.0
+    assert retry_after_seconds(RateLimitError()) is None
+    assert retry_after_seconds(ValueError()) is None
+
+def test_is_rate_limited():
+    assert is_rate_limited(RateLimitError())
+    assert is_rate_limited(Mock(spec=['status_code'], status_code=429))
+    assert not is_rate_limited(ValueError())
+
+def test_langchain_adapter_limits_chat_model_calls():
+    limiter = Mock(spec=RateLimiter)
+    llm = FakeListChatModel(responses=["story"] * 3, callbacks=[LangChainRateLimiter(limiter)])
+
+    llm.invoke("Which genes are associated with asthma?")
+    llm.batch(["Which genes?", "Which pathways?"])
+    asyncio.run(llm.ainvoke("Which genes?"))
+
+    assert limiter.acquire.call_count == 4
+    assert all(c[0][0] > 0 for c in limiter.acquire.call_args_list)
@@ -0,0 +1,42 @@
+from unittest.mock import MagicMock
+from omics_oracle.schema_cache import SchemaCache, database_fingerprint
+
+SCHEMA = {'Graph Schema': [], 'Collection Schema': [{'collection_name': 'Genes'}]}
+
+def make_db(count=10, revision="rev1"):
+    db = MagicMock()
+    db.graphs.return_value = [{'name': 'spoke', 'edge_definitions': [{'edge_collection': 'Edges'}]}]
+    db.collections.return_value = [
+        {'name': 'Genes', 'type': 'document', 'system': False},
+        {'name': '_users', 'type': 'document', 'system': True},
+    ]
+    db.collection.return_value.count.return_value = count
+    db.collection.return_value.revision.return_value = revision
+    return db
+
+def test_save_and_load(tmp_path):
+    cache = SchemaCache(str(tmp_path / "schema.json"))
+    cache.save("http://arango/spoke", "abc", SCHEMA)
+
+    cached = cache.load("http://arango/spoke")
+
+    assert cached.fingerprint == "abc"
+    assert cached.schema == SCHEMA
+    assert list(tmp_path.iterdir()) == [tmp_path / "schema.json"]
+
+def test_load_misses(tmp_path):
+    cache = SchemaCache(str(tmp_path / "schema.json"))
+    assert cache.load("http://arango/spoke") is None
+
+    cache.save("http://arango/spoke", "abc", SCHEMA)
+    assert cache.load("http://arango/other") is None
+
+    (tmp_path / "schema.json").write_text("{not json")
+    assert cache.load("http://arango/spoke") is None
+
+def test_fingerprint_tracks_counts_and_revisions():
+    fingerprint = database_fingerprint(make_db())
+
+    assert fingerprint == database_fingerprint(make_db())
+    assert fingerprint != database_fingerprint(make_db(count=11))
+    assert fingerprint != database_fingerprint(make_db(revision="rev2"))
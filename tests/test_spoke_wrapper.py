@@ -1,114 +1,485 @@
+import asyncio
+import threading
+import time
 import pytest
+import requests
 from unittest.mock import Mock, patch, MagicMock
+from omics_oracle.aql_cache import AQLResultCache
+from omics_oracle.graph_snapshot import GraphSnapshot
+from omics_oracle.query_profiler import QueryProfiler
 from omics_oracle.spoke_wrapper import SpokeWrapper
 
+ENV = {
+    'ARANGO_HOST': 'test_host',
+    'ARANGO_DB': 'test_db',
+    'ARANGO_USERNAME': 'test_user',
+    'ARANGO_PASSWORD': 'test_pass'
+}
+
+class FakeCursor:
+    """Cursor over `rows` that reports leftover rows the way python-arango's Cursor does."""
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.remaining = len(rows)
+        self.close = Mock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self.rows)
+        self.remaining -= 1
+        return row
+
+    def has_more(self):
+        return self.remaining > 0
+
 @pytest.fixture
-def mock_pyarango_connection():
-    with patch('omics_oracle.spoke_wrapper.Connection') as mock_connection:
+def mock_arango_client():
+    with patch('omics_oracle.arango_session.ArangoClient') as mock_client:
         mock_db = MagicMock()
-        mock_connection.return_value.__getitem__.return_value = mock_db
-        yield mock_connection
+        mock_client.return_value.db.return_value = mock_db
+        yield mock_client
 
 @pytest.fixture
-def spoke_wrapper(mock_pyarango_connection):
-    with patch('omics_oracle.spoke_wrapper.load_dotenv', return_value=True):
-        with patch.dict('os.environ', {
-            'ARANGO_HOST': 'test_host',
-            'ARANGO_DB': 'test_db',
-            'ARANGO_USERNAME': 'test_user',
-            'ARANGO_PASSWORD': 'test_pass'
-        }):
+def spoke_wrapper(mock_arango_client):
+    with patch('omics_oracle.arango_session.load_dotenv', return_value=True):
+        with patch.dict('os.environ', ENV):
             return SpokeWrapper()
 
+def test_connects_with_env_settings(spoke_wrapper, mock_arango_client):
+    mock_arango_client.assert_called_once()
+    assert mock_arango_client.call_args[1]['hosts'] == 'test_host'
+    mock_arango_client.return_value.db.assert_called_with('test_db', username='test_user', password='test_pass')
+
+def test_db_is_a_dedicated_handle_outside_the_pool(spoke_wrapper, mock_arango_client):
+    db = spoke_wrapper.db
+
+    assert spoke_wrapper.db is db
+    # One client for the pooled startup handle, one for the dedicated handle
+    assert mock_arango_client.call_count == 2
+    assert spoke_wrapper.pool.stats()['open'] == 1
+
 def test_list_collections(spoke_wrapper):
-    spoke_wrapper.db.collections = {"collection1": Mock(), "collection2": Mock()}
+    spoke_wrapper.db.collections.return_value = [{"name": "collection1"}, {"name": "collection2"}]
     
     result = spoke_wrapper.list_collections()
     
     assert result == ["collection1", "collection2"]
 
 def test_execute_aql(spoke_wrapper):
-    mock_aql_query = MagicMock()
-    mock_aql_query.return_value = [{"result": "data"}]
-    spoke_wrapper.db.AQLQuery = mock_aql_query
+    mock_execute = MagicMock()
+    mock_execute.return_value = FakeCursor([{"result": "data"}])
+    spoke_wrapper.db.aql.execute = mock_execute
 
     result = spoke_wrapper.execute_aql("FOR doc IN collection RETURN doc")
 
     assert result == [{"result": "data"}]
-    mock_aql_query.assert_called_once_with("FOR doc IN collection RETURN doc", bindVars=None, rawResults=True)
+    mock_execute.assert_called_once_with("FOR doc IN collection RETURN doc", bind_vars=None,
+                                         batch_size=1000, ttl=None, stream=True)
+
+def test_iter_aql_streams_rows(spoke_wrapper):
+    cursor = FakeCursor([{"n": 1}, {"n": 2}])
+    spoke_wrapper.db.aql.execute.return_value = cursor
+
+    rows = spoke_wrapper.iter_aql("FOR n IN 1..2 RETURN {n}", batch_size=1, ttl=30)
+
+    assert next(rows) == {"n": 1}
+    assert next(rows) == {"n": 2}
+    with pytest.raises(StopIteration):
+        next(rows)
+    spoke_wrapper.db.aql.execute.assert_called_once_with("FOR n IN 1..2 RETURN {n}", bind_vars=None,
+                                                         batch_size=1, ttl=30, stream=True)
+    cursor.close.assert_not_called()
+
+def test_iter_aql_closes_cursor_on_early_exit(spoke_wrapper):
+    cursor = FakeCursor([{"n": n} for n in range(10)])
+    spoke_wrapper.db.aql.execute.return_value = cursor
+
+    for row in spoke_wrapper.iter_aql("FOR n IN 0..9 RETURN {n}"):
+        break
+
+    cursor.close.assert_called_once_with(ignore_missing=True)
+    assert spoke_wrapper.pool.stats()['in_use'] == 0
+
+def test_iter_aql_profiles_queries(spoke_wrapper):
+    cursor = FakeCursor([{"n": 1}, {"n": 2}])
+    spoke_wrapper.db.aql.execute.return_value = cursor
+    spoke_wrapper.profiler = QueryProfiler(level=1)
+    spoke_wrapper.profiler.record = Mock()
+
+    assert spoke_wrapper.execute_aql("FOR n IN 1..2 RETURN {n}") == [{"n": 1}, {"n": 2}]
+
+    assert spoke_wrapper.db.aql.execute.call_args[1]['profile'] == 1
+    args, kwargs = spoke_wrapper.profiler.record.call_args
+    assert args[1:5] == ("FOR n IN 1..2 RETURN {n}", None, cursor, 2)
+    assert kwargs == {'source': 'spoke'}
+
+def test_execute_aql_max_rows(spoke_wrapper):
+    cursor = FakeCursor([{"n": n} for n in range(10)])
+    spoke_wrapper.db.aql.execute.return_value = cursor
+
+    result = spoke_wrapper.execute_aql("FOR n IN 0..9 RETURN {n}", max_rows=3)
+
+    assert result == [{"n": 0}, {"n": 1}, {"n": 2}]
+    assert spoke_wrapper.db.aql.execute.call_args[1]['batch_size'] == 3
+    cursor.close.assert_called_once_with(ignore_missing=True)
 
 def test_get_entity(spoke_wrapper):
     mock_collection = MagicMock()
-    mock_collection.__getitem__.return_value = {"_key": "test_key", "name": "Test Entity"}
-    spoke_wrapper.db.__getitem__ = MagicMock(return_value=mock_collection)
+    mock_collection.get.return_value = {"_key": "test_key", "name": "Test Entity"}
+    spoke_wrapper.db.collection = MagicMock(return_value=mock_collection)
 
     entity = spoke_wrapper.get_entity("test_collection", "test_key")
 
     assert entity == {"_key": "test_key", "name": "Test Entity"}
-    spoke_wrapper.db.__getitem__.assert_called_once_with("test_collection")
-    mock_collection.__getitem__.assert_called_once_with("test_key")
+    spoke_wrapper.db.collection.assert_called_once_with("test_collection")
+    mock_collection.get.assert_called_once_with("test_key")
+
+def test_get_entity_missing(spoke_wrapper):
+    spoke_wrapper.db.collection.return_value.get.return_value = None
+
+    assert spoke_wrapper.get_entity("test_collection", "missing_key") is None
+
+def test_get_entities_in_chunks(spoke_wrapper):
+    stored = {f"k{n}": {"_key": f"k{n}", "_id": f"Gene/k{n}"} for n in range(5)}
+    mock_collection = spoke_wrapper.db.collection.return_value
+    mock_collection.get_many.side_effect = lambda keys: [stored[k] for k in keys if k in stored]
+
+    entities = spoke_wrapper.get_entities("Gene", ["k0", "k1", "missing", "k2", "k1", "k3", "k4"], chunk_size=2)
+
+    assert list(entities) == ["k0", "k1", "missing", "k2", "k3", "k4"]
+    assert entities["missing"] is None
+    assert entities["k3"] == stored["k3"]
+    assert mock_collection.get_many.call_count == 3
+    mock_collection.get_many.assert_any_call(["k0", "k1"])
+
+def test_get_entities_error(spoke_wrapper):
+    spoke_wrapper.db.collection.return_value.get_many.side_effect = Exception("Database error")
+
+    assert spoke_wrapper.get_entities("Gene", ["k0"]) == {}
 
 def test_get_connected_entities(spoke_wrapper):
-    mock_aql_query = MagicMock()
-    mock_aql_query.return_value = [
+    mock_execute = MagicMock()
+    mock_execute.return_value = FakeCursor([
         {"entity": {"id": "connected_id", "name": "Connected Entity"}, "edge": {"label": "TEST_EDGE"}}
-    ]
-    spoke_wrapper.db.AQLQuery = mock_aql_query
+    ])
+    spoke_wrapper.db.aql.execute = mock_execute
 
     connected_entities = spoke_wrapper.get_connected_entities("test_id", edge_label="TEST_EDGE")
 
     assert len(connected_entities) == 1
     assert connected_entities[0]["entity"]["name"] == "Connected Entity"
-    mock_aql_query.assert_called_once()
-    call_args = mock_aql_query.call_args
+    mock_execute.assert_called_once()
+    call_args = mock_execute.call_args
     assert "FOR v, e IN 1..1 OUTBOUND @start_id @@edge_collection" in call_args[0][0]
-    assert call_args[1]['bindVars']['start_id'] == "test_id"
-    assert call_args[1]['bindVars']['edge_label'] == "TEST_EDGE"
+    assert call_args[1]['bind_vars']['start_id'] == "test_id"
+    assert call_args[1]['bind_vars']['edge_label'] == "TEST_EDGE"
 
 def test_traverse_graph(spoke_wrapper):
-    mock_aql_query = MagicMock()
-    mock_aql_query.return_value = [
+    mock_execute = MagicMock()
+    mock_execute.return_value = FakeCursor([
         {"vertices": ["v1", "v2"], "edges": ["e1"]}
-    ]
-    spoke_wrapper.db.AQLQuery = mock_aql_query
+    ])
+    spoke_wrapper.db.aql.execute = mock_execute
 
     traversal_result = spoke_wrapper.traverse_graph("start_id", max_depth=2, edge_label="TEST_EDGE")
 
     assert len(traversal_result) == 1
     assert traversal_result[0]["vertices"] == ["v1", "v2"]
     assert traversal_result[0]["edges"] == ["e1"]
-    mock_aql_query.assert_called_once()
-    call_args = mock_aql_query.call_args
+    mock_execute.assert_called_once()
+    call_args = mock_execute.call_args
     assert "FOR v, e, p IN 1..@max_depth OUTBOUND @start_id @@edge_collection" in call_args[0][0]
-    assert call_args[1]['bindVars']['start_id'] == "start_id"
-    assert call_args[1]['bindVars']['max_depth'] == 2
-    assert call_args[1]['bindVars']['edge_label'] == "TEST_EDGE"
+    # ArangoDB's default traversal: every path, depth-first, no limit
+    assert 'OPTIONS {uniqueVertices: "none", order: "dfs"}' in call_args[0][0]
+    assert "PRUNE e != null AND e.label NOT IN @edge_labels" in call_args[0][0]
+    assert "LIMIT" not in call_args[0][0]
+    assert call_args[1]['bind_vars']['start_id'] == "start_id"
+    assert call_args[1]['bind_vars']['max_depth'] == 2
+    assert call_args[1]['bind_vars']['edge_labels'] == ["TEST_EDGE"]
+    assert not traversal_result.truncated
+
+def test_traverse_graph_reports_truncation(spoke_wrapper):
+    mock_execute = MagicMock()
+    mock_execute.return_value = FakeCursor([
+        {"vertices": ["start", "v1"], "edges": ["e1"]},
+        {"vertices": ["start", "v2"], "edges": ["e1"]},
+        {"vertices": ["start", "v2", "v3"], "edges": ["e1", "e2"]},
+    ])
+    spoke_wrapper.db.aql.execute = mock_execute
+
+    result = spoke_wrapper.traverse_graph("start_id", unique_vertices="global", max_results=2)
+
+    assert result == [{"vertices": ["start", "v1"], "edges": ["e1"]}, {"vertices": ["start", "v2"], "edges": ["e1"]}]
+    assert result.truncated
+    assert 'OPTIONS {uniqueVertices: "global", order: "bfs"}' in mock_execute.call_args[0][0]
+    assert mock_execute.call_args[1]['bind_vars']['limit'] == 3
+
+def test_traverse_graph_with_fanout_cap(spoke_wrapper):
+    graph = {
+        "Gene/hub": [("Gene/a", "a", "E"), ("Gene/b", "b", "E"), ("Gene/c", "c", "E")],
+        "Gene/a": [("Gene/hub", "hub", "E"), ("Gene/d", "d", "E")],
+        "Gene/b": [("Gene/d", "d", "E"), ("Gene/e", "e", "E")],
+    }
+
+    def execute(query, bind_vars=None, **kwargs):
+        probe = bind_vars['fanout_probe']
+        return FakeCursor([
+            {"source": s, "results": [{"id": i, "key": k, "label": label} for i, k, label in graph.get(s, [])][:probe]}
+            for s in bind_vars['start_ids']
+        ])
+    spoke_wrapper.db.aql.execute = MagicMock(side_effect=execute)
+
+    result = spoke_wrapper.traverse_graph("Gene/hub", unique_vertices="global", max_fanout=[2, 5])
+
+    assert result == [
+        {"vertices": ["hub", "a"], "edges": ["E"]},
+        {"vertices": ["hub", "b"], "edges": ["E"]},
+        {"vertices": ["hub", "a", "d"], "edges": ["E", "E"]},
+        {"vertices": ["hub", "b", "e"], "edges": ["E", "E"]},
+    ]
+    assert result.capped_vertices == ["hub"]
+    assert not result.truncated
+    assert spoke_wrapper.db.aql.execute.call_count == 2
+    assert spoke_wrapper.db.aql.execute.call_args_list[0][1]['bind_vars']['fanout_probe'] == 3
+    assert spoke_wrapper.db.aql.execute.call_args_list[1][1]['bind_vars']['start_ids'] == ["Gene/a", "Gene/b"]
+
+def test_traverse_graph_without_limits(spoke_wrapper):
+    spoke_wrapper.db.aql.execute = MagicMock(return_value=FakeCursor([]))
+
+    spoke_wrapper.traverse_graph("start_id", unique_vertices="path")
+
+    query, bind_vars = spoke_wrapper.db.aql.execute.call_args[0][0], spoke_wrapper.db.aql.execute.call_args[1]['bind_vars']
+    assert 'OPTIONS {uniqueVertices: "path", order: "dfs"}' in query
+    assert "PRUNE" not in query
+    assert "LIMIT" not in query
+    assert 'limit' not in bind_vars
+
+def test_traverse_graph_rejects_global_uniqueness_without_bfs(spoke_wrapper):
+    with pytest.raises(ValueError, match="requires order='bfs'"):
+        spoke_wrapper.traverse_graph("start_id", unique_vertices="global", order="dfs")
+
+def test_traverse_graph_rejects_empty_fanout(spoke_wrapper):
+    with pytest.raises(ValueError, match="non-empty"):
+        spoke_wrapper.traverse_graph("start_id", unique_vertices="global", max_fanout=[])
+
+def test_get_connected_entities_batch(spoke_wrapper):
+    mock_execute = MagicMock()
+    mock_execute.return_value = FakeCursor([
+        {"source": "Gene/1", "results": [{"entity": {"name": "A"}, "edge": {"label": "TEST_EDGE"}}]},
+        {"source": "Gene/2", "results": []},
+    ])
+    spoke_wrapper.db.aql.execute = mock_execute
+
+    grouped = spoke_wrapper.get_connected_entities_batch(["Gene/1", "Gene/2", "Gene/1"], edge_labels={"TEST_EDGE"},
+                                                         limit_per_source=5)
+
+    assert grouped == {"Gene/1": [{"entity": {"name": "A"}, "edge": {"label": "TEST_EDGE"}}], "Gene/2": []}
+    mock_execute.assert_called_once()
+    query, bind_vars = mock_execute.call_args[0][0], mock_execute.call_args[1]['bind_vars']
+    assert "FOR s IN @start_ids" in query
+    assert "LIMIT @limit" in query
+    assert bind_vars['start_ids'] == ["Gene/1", "Gene/2"]
+    assert bind_vars['edge_labels'] == ["TEST_EDGE"]
+    assert bind_vars['limit'] == 5
+
+def test_traverse_graph_batch(spoke_wrapper):
+    mock_execute = MagicMock()
+    mock_execute.return_value = FakeCursor([
+        {"source": "Gene/1", "results": [{"vertices": ["1", "2"], "edges": ["e1"]}]},
+    ])
+    spoke_wrapper.db.aql.execute = mock_execute
+
+    grouped = spoke_wrapper.traverse_graph_batch(["Gene/1", "Gene/3"], max_depth=3)
+
+    assert grouped == {"Gene/1": [{"vertices": ["1", "2"], "edges": ["e1"]}], "Gene/3": []}
+    assert not grouped["Gene/1"].truncated
+    query, bind_vars = mock_execute.call_args[0][0], mock_execute.call_args[1]['bind_vars']
+    assert "OUTBOUND s @@edge_collection" in query
+    assert bind_vars['max_depth'] == 3
+    assert 'edge_labels' not in bind_vars
+    assert 'limit' not in bind_vars
+
+def test_batch_queries_skip_empty_input(spoke_wrapper):
+    spoke_wrapper.db.aql.execute = MagicMock()
+
+    assert spoke_wrapper.traverse_graph_batch([]) == {}
+    spoke_wrapper.db.aql.execute.assert_not_called()
 
 def test_error_handling_execute_aql(spoke_wrapper):
-    spoke_wrapper.db.AQLQuery.side_effect = Exception("Database Error")
+    spoke_wrapper.db.aql.execute.side_effect = Exception("Database Error")
 
     result = spoke_wrapper.execute_aql("Invalid query")
 
     assert result == []
-    spoke_wrapper.db.AQLQuery.assert_called_once_with("Invalid query", bindVars=None, rawResults=True)
+    spoke_wrapper.db.aql.execute.assert_called_once()
 
 def test_error_handling_get_entity(spoke_wrapper):
-    spoke_wrapper.db.__getitem__ = MagicMock(side_effect=Exception("Collection not found"))
+    spoke_wrapper.db.collection = MagicMock(side_effect=Exception("Collection not found"))
 
     result = spoke_wrapper.get_entity("non_existent_collection", "test_key")
 
     assert result is None
-    spoke_wrapper.db.__getitem__.assert_called_once_with("non_existent_collection")
+    spoke_wrapper.db.collection.assert_called_once_with("non_existent_collection")
 
 def test_load_environment_failure():
-    with patch('omics_oracle.spoke_wrapper.load_dotenv', return_value=False):
+    with patch('omics_oracle.arango_session.load_dotenv', return_value=False):
         with pytest.raises(ValueError, match="Failed to load .env file"):
             SpokeWrapper()
 
 def test_missing_environment_variables():
-    with patch('omics_oracle.spoke_wrapper.load_dotenv', return_value=True):
+    with patch('omics_oracle.arango_session.load_dotenv', return_value=True):
         with patch.dict('os.environ', {}, clear=True):
             with pytest.raises(ValueError, match="ARANGO_HOST, ARANGO_DB, ARANGO_USERNAME, and ARANGO_PASSWORD must be set in the .env file"):
                 SpokeWrapper()
 
+def test_uses_given_session():
+    session = Mock()
+
+    spoke_wrapper = SpokeWrapper(session=session)
+
+    assert spoke_wrapper.session is session
+    assert spoke_wrapper.pool is session.pool
+
+def test_execute_aql_uses_result_cache(mock_arango_client):
+    cache = AQLResultCache()
+    with patch('omics_oracle.arango_session.load_dotenv', return_value=True), patch.dict('os.environ', ENV):
+        spoke_wrapper = SpokeWrapper(result_cache=cache)
+    spoke_wrapper.db.aql.execute = MagicMock(side_effect=lambda *args, **kwargs: FakeCursor([{"result": "data"}]))
+
+    first = spoke_wrapper.execute_aql("FOR doc IN collection RETURN doc")
+    second = spoke_wrapper.execute_aql("for doc in collection\n  return doc")
+
+    assert first == second == [{"result": "data"}]
+    spoke_wrapper.db.aql.execute.assert_called_once()
+    assert cache.revision == spoke_wrapper.session.revision
+
+class FakeAQL:
+    def __init__(self, database):
+        self.database = database
+
+    def execute(self, query, bind_vars=None, **kwargs):
+        database = self.database
+        if not database.in_use.acquire(blocking=False):
+            raise AssertionError("connection used by two threads at once")
+        try:
+            if database.broken:
+                raise requests.ConnectionError("connection reset by peer")
+            time.sleep(0.001)
+            return FakeCursor([{"thread_value": bind_vars["value"]}])
+        finally:
+            database.in_use.release()
+
+class FakeDatabase:
+    """Stand-in for a python-arango database handle that fails if two threads share it."""
+    instances = []
+
+    def __init__(self):
+        self.broken = False
+        self.in_use = threading.Lock()
+        self.aql = FakeAQL(self)
+        FakeDatabase.instances.append(self)
+
+    def version(self):
+        if self.broken:
+            raise requests.ConnectionError("connection reset by peer")
+        return "3.11.0"
+
+@pytest.fixture
+def pooled_spoke_wrapper():
+    FakeDatabase.instances = []
+    with patch('omics_oracle.arango_session.ArangoClient') as mock_client, \
+         patch('omics_oracle.arango_session.load_dotenv', return_value=True), \
+         patch.dict('os.environ', ENV):
+        mock_client.return_value.db.side_effect = lambda *args, **kwargs: FakeDatabase()
+        yield SpokeWrapper(pool_size=4)
+
+def test_execute_aql_under_concurrent_load(pooled_spoke_wrapper):
+    num_threads, calls_per_thread = 16, 25
+    failures = []
+
+    def hammer(thread_id):
+        for i in range(calls_per_thread):
+            value = f"{thread_id}-{i}"
+            result = pooled_spoke_wrapper.execute_aql("RETURN @value", bind_vars={"value": value})
+            if result != [{"thread_value": value}]:
+                failures.append((value, result))
+
+    threads = [threading.Thread(target=hammer, args=(n,)) for n in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    stats = pooled_spoke_wrapper.pool.stats()
+    assert stats['created'] <= 4
+    assert stats['in_use'] == 0
+
+def test_execute_aql_reconnects_after_connection_failure(pooled_spoke_wrapper):
+    FakeDatabase.instances[0].broken = True
+
+    result = pooled_spoke_wrapper.execute_aql("RETURN @value", bind_vars={"value": "after reconnect"})
+
+    assert result == [{"thread_value": "after reconnect"}]
+    assert pooled_spoke_wrapper.pool.stats()['discarded'] == 1
+
+def test_aexecute_aql_concurrently(pooled_spoke_wrapper):
+    async def main():
+        return await asyncio.gather(*[
+            pooled_spoke_wrapper.aexecute_aql("RETURN @value", bind_vars={"value": n}) for n in range(20)
+        ])
+
+    results = asyncio.run(main())
+
+    assert results == [[{"thread_value": n}] for n in range(20)]
+
+@pytest.fixture
+def graph_snapshot(tmp_path):
+    session = MagicMock()
+    session.collection_revision.return_value = "rev1"
+    session.connection.return_value.__enter__.return_value.aql.execute.return_value = iter([
+        ["Gene/1", "Gene/2", "INTERACTS"],
+        ["Gene/1", "Disease/9", "ASSOCIATES"],
+        ["Gene/2", "Gene/3", "INTERACTS"],
+    ])
+    return GraphSnapshot.build(session, str(tmp_path))
+
+def test_snapshot_serves_traversals_but_not_documents(mock_arango_client, graph_snapshot):
+    with patch('omics_oracle.arango_session.load_dotenv', return_value=True), patch.dict('os.environ', ENV):
+        spoke_wrapper = SpokeWrapper(graph_snapshot=graph_snapshot)
+    spoke_wrapper.session.collection_revision = Mock(return_value="rev1")
+    spoke_wrapper.db.aql.execute = MagicMock()
+
+    paths = spoke_wrapper.traverse_graph("Gene/1", max_depth=2, unique_vertices="global")
+
+    assert paths == [
+        {"vertices": ["1", "2"], "edges": ["INTERACTS"]},
+        {"vertices": ["1", "9"], "edges": ["ASSOCIATES"]},
+        {"vertices": ["1", "2", "3"], "edges": ["INTERACTS", "INTERACTS"]},
+    ]
+    spoke_wrapper.db.aql.execute.assert_not_called()
+
+    # Full documents are only in ArangoDB, so they are read from there even while the snapshot is fresh
+    spoke_wrapper.db.aql.execute.return_value = FakeCursor([{"entity": {"_id": "Gene/2", "name": "B"},
+                                                             "edge": {"label": "INTERACTS"}}])
+    connected = spoke_wrapper.get_connected_entities("Gene/1", edge_label="INTERACTS")
+    assert connected[0]["entity"]["name"] == "B"
+    spoke_wrapper.db.aql.execute.return_value = FakeCursor([{"source": "Gene/1", "results": []}])
+    spoke_wrapper.get_connected_entities_batch(["Gene/1"])
+    assert spoke_wrapper.db.aql.execute.call_count == 2
+
+def test_stale_snapshot_falls_back_to_arango(mock_arango_client, graph_snapshot):
+    with patch('omics_oracle.arango_session.load_dotenv', return_value=True), patch.dict('os.environ', ENV):
+        spoke_wrapper = SpokeWrapper(graph_snapshot=graph_snapshot)
+    spoke_wrapper.session.collection_revision = Mock(return_value="rev2")
+    spoke_wrapper.db.aql.execute = MagicMock(return_value=FakeCursor([{"vertices": ["1", "5"], "edges": ["E"]}]))
+
+    paths = spoke_wrapper.traverse_graph("Gene/1", max_depth=2, unique_vertices="global")
+
+    assert paths == [{"vertices": ["1", "5"], "edges": ["E"]}]
+    spoke_wrapper.db.aql.execute.assert_called_once()
+
 # Add more tests as needed to cover edge cases and error scenarios
\ No newline at end of file